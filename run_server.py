@@ -3,6 +3,9 @@ from store_management.wsgi import application
 
 if __name__ == '__main__':
     print("Serving on http://127.0.0.1:8080")
+
+    # The interrupted report / import jobs and the receipt spooler are started
+    # by the store app on the first request (see store/apps.py)
     
     # Add 'threads=10' (Default is usually 4)
     # This allows 10 simultaneous files to be served at once.
@@ -1,7 +1,10 @@
 from django.contrib import admin
-from .models import Product,Settings,Sale,SaleItem,FinancialBox,Trader,Transaction
+from django.utils import timezone
+from .models import Product,Settings,Sale,SaleItem,CashMovement,BoxCheckpoint,PrintJob,Trader,Transaction
 from django.contrib.auth.models import Group, User
 
+from . import spooler
+
 # Unregister default Django models
 admin.site.unregister(Group)
 admin.site.unregister(User)   
@@ -15,6 +18,45 @@ admin.site.register(Product)
 admin.site.register(Settings)
 admin.site.register(Sale)
 admin.site.register(SaleItem)
-admin.site.register(FinancialBox)
 admin.site.register(Transaction)
 admin.site.register(Trader)
+
+
+@admin.register(CashMovement)
+class CashMovementAdmin(admin.ModelAdmin):
+    """The cash box ledger is append-only: corrections are added as adjustments."""
+    list_display = ('created_at', 'kind', 'amount', 'sale', 'note')
+    list_filter = ('kind',)
+    fields = ('kind', 'amount', 'note')
+
+    def get_changeform_initial_data(self, request):
+        return {'kind': CashMovement.Kind.ADJUSTMENT}
+
+    def has_change_permission(self, request, obj=None):
+        return obj is None
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(BoxCheckpoint)
+class BoxCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'last_movement_id', 'balance')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PrintJob)
+class PrintJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'sale', 'status', 'attempts', 'error', 'created_at', 'printed_at')
+    list_filter = ('status',)
+    actions = ['retry']
+
+    @admin.action(description="Print again")
+    def retry(self, request, queryset):
+        queryset.update(status=PrintJob.Status.PENDING, attempts=0, error='', created_at=timezone.now())
+        spooler.wake()
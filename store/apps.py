@@ -1,6 +1,49 @@
+import os
+import sys
+import threading
+
 from django.apps import AppConfig
+from django.core.signals import request_started
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def _serves_requests():
+    """
+    True in a process serving the store: the WSGI server (run_server.py) or
+    the ``runserver`` process doing the work, not the autoreloader watching
+    the files. Other management commands (migrate, test, shell...) start nothing.
+    """
+    if not sys.argv or os.path.basename(sys.argv[0]) not in ('manage.py', 'django-admin'):
+        return True
+    if sys.argv[1:2] != ['runserver']:
+        return False
+    return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
+
+
+def _start_workers(**kwargs):
+    """
+    Requeue the jobs interrupted by the last shutdown (see jobs.py) and start
+    the receipt spooler (see spooler.py), once, on the first request: both
+    query the database, which Django discourages while the apps are loading.
+    """
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    request_started.disconnect(dispatch_uid='store_start_workers')
+
+    from . import jobs, spooler
+    jobs.resume_pending()
+    spooler.start()
 
 
 class StoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'store'
+
+    def ready(self):
+        if _serves_requests():
+            request_started.connect(_start_workers, dispatch_uid='store_start_workers')
@@ -0,0 +1,79 @@
+"""
+Cash box ledger (``CashMovement`` / ``BoxCheckpoint``).
+
+Every sale, trader payment and manual adjustment appends one movement row,
+so concurrent checkouts never update a shared row. The balance is the last
+checkpoint plus the sum of the movements after it, read in one query on the
+primary key range. A new checkpoint is taken once enough movements have
+piled up after the last one.
+
+Movement ids are allocated before their transaction commits, so a
+checkpoint only covers movements older than ``CHECKPOINT_SETTLE``: a slower
+transaction still open with a smaller id cannot be skipped.
+"""
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import BigIntegerField, Count, Max, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import BoxCheckpoint, CashMovement
+
+CHECKPOINT_EVERY = 1000
+CHECKPOINT_SETTLE = timedelta(minutes=10)
+
+
+def record(kind, amount, sale=None, trader_transaction=None, note=''):
+    """
+    Append a movement of ``amount`` SYP (negative when cash leaves the box).
+    The box counts whole SYP: fractions are rounded half away from zero (a
+    trader payment of 1500.5 takes 1501 out of the box). Nothing for 0.
+    """
+    amount = int(Decimal(str(amount)).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    if not amount:
+        return None
+    return CashMovement.objects.create(
+        kind=kind, amount=amount, sale=sale, trader_transaction=trader_transaction, note=note[:255],
+    )
+
+
+def _latest_checkpoint():
+    return BoxCheckpoint.objects.order_by('-last_movement_id')
+
+
+def balance():
+    """
+    Return ``(balance, pending)``: the box balance and the number of
+    movements after the last checkpoint, in one query.
+    """
+    latest = _latest_checkpoint()
+    totals = CashMovement.objects.filter(
+        id__gt=Coalesce(Subquery(latest.values('last_movement_id')[:1]), Value(0)),
+    ).aggregate(
+        balance=Coalesce(Sum('amount'), Value(0)) + Coalesce(Subquery(latest.values('balance')[:1]), Value(0)),
+        pending=Count('id'),
+    )
+    if totals['pending'] >= CHECKPOINT_EVERY:
+        checkpoint()
+    return int(totals['balance'] or 0), totals['pending']
+
+
+def checkpoint():
+    """Checkpoint the settled movements after the last checkpoint. Returns it, or None if there were none."""
+    with transaction.atomic():
+        latest = _latest_checkpoint().first()
+        last_id = latest.last_movement_id if latest else 0
+        settled = CashMovement.objects.filter(id__gt=last_id, created_at__lt=timezone.now() - CHECKPOINT_SETTLE)
+        upto = settled.aggregate(upto=Max('id'))['upto']
+        if upto is None:
+            return None
+        delta = CashMovement.objects.filter(id__gt=last_id, id__lte=upto).aggregate(
+            total=Coalesce(Sum('amount'), Value(0), output_field=BigIntegerField())
+        )['total']
+        new_checkpoint, _ = BoxCheckpoint.objects.get_or_create(
+            last_movement_id=upto,
+            defaults={'balance': (latest.balance if latest else 0) + delta},
+        )
+        return new_checkpoint
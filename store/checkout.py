@@ -0,0 +1,250 @@
+"""
+Checkout engine used by ``sell_product``.
+
+The whole cart is sold inside one transaction: the products are locked with
+a single ``SELECT ... FOR UPDATE``, stock is validated before anything is
+written, quantities are decremented with one conditional ``UPDATE``, the
+sale lines are bulk inserted, the daily rollup is upserted, and the
+payment and the inventory valuation deltas are appended to their ledgers.
+Any failure rolls everything back, so a cart is either sold entirely or
+not at all.
+
+Submissions carry an idempotency token (``CheckoutToken``): replaying a
+token returns the original result without touching the products again.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+from django.utils import timezone
+
+from . import cashbox, inventory, rollup, settings_cache
+from .models import CashMovement, CheckoutToken, Product, Sale, SaleItem
+
+
+PRICE_QUANTUM = Decimal('0.0001')
+
+
+class CheckoutError(Exception):
+    """The cart cannot be sold. Nothing has been written."""
+
+
+class InsufficientStock(CheckoutError):
+    def __init__(self, product, requested):
+        self.product = product
+        self.requested = requested
+        super().__init__(
+            f"Not enough {product.name}: {requested} requested, {product.quantity} available"
+        )
+
+
+def parse_cart(cart):
+    """
+    Validate the cart sent by cart.js and return a list of
+    ``(product_id, quantity, profit_percentage)`` lines.
+    """
+    if not isinstance(cart, list) or not cart:
+        raise CheckoutError("The cart is empty")
+    lines = []
+    try:
+        for item in cart:
+            product_id = int(item['productId'])
+            quantity = int(item['quantity'])
+            profit_percentage = Decimal(str(item['profitPercentage']))
+            if quantity <= 0:
+                raise CheckoutError(f"Invalid quantity for product {product_id}")
+            lines.append((product_id, quantity, profit_percentage))
+    except (KeyError, TypeError, ValueError, InvalidOperation):
+        raise CheckoutError("Malformed cart")
+    return lines
+
+
+def line_total(unit_price, quantity, is_weight):
+    """Price of a sale line: weight products are priced per kg and counted in grams."""
+    if is_weight:
+        return unit_price * quantity / 1000
+    return unit_price * quantity
+
+
+def receipt_item(name, quantity, is_weight, total_syp):
+    """One line of a receipt snapshot, as printed: kg with 2 decimals for weight products."""
+    return {
+        'product_name': name,
+        'quantity': f"{quantity / 1000:.2f} كغ" if is_weight else str(quantity),
+        'total_price': str(Decimal(total_syp).quantize(Decimal('0.01'))),
+    }
+
+
+def receipt_snapshot(cart_items, total_payable, sold_at=None):
+    """The ``Sale.receipt`` snapshot: what the receipt shows, fixed at the time of the sale."""
+    return {
+        'cart_items': cart_items,
+        'total_payable': total_payable,
+        'date_str': timezone.localtime(sold_at).strftime("%Y-%m-%d %I:%M %p"),
+    }
+
+
+def sale_receipt(sale):
+    """
+    Receipt snapshot of a sale: the stored one, or for sales made before
+    snapshots existed, one rebuilt from its items (current product names).
+    """
+    if sale.receipt is not None:
+        return sale.receipt
+    cart_items = [
+        receipt_item(
+            item.product.name, item.quantity, item.product.is_weight,
+            line_total(item.price_at_sale * item.dollar_rate_at_sale, item.quantity, item.product.is_weight),
+        )
+        for item in SaleItem.objects.filter(sale=sale).select_related('product').order_by('id')
+    ]
+    return receipt_snapshot(cart_items, sale.total_payable_price)
+
+
+def _replayed_result(token):
+    stored = CheckoutToken.objects.filter(key=token).values_list('result', flat=True).first()
+    if stored is None:
+        return None
+    return {
+        'sale_id': stored['sale_id'],
+        'total_price': Decimal(stored['total_price']),
+        'total_syp_price': Decimal(stored['total_syp_price']),
+        'replayed': True,
+    }
+
+
+def checkout(cart, payable_price, token=None):
+    """
+    Sell ``cart`` (the list posted by cart.js) for ``payable_price`` SYP.
+    Returns a dict with the ``sale_id`` and the USD / SYP totals; ``replayed``
+    is True when ``token`` was already used and the original result is returned.
+    Raises ``InsufficientStock`` or ``CheckoutError`` without writing anything.
+    """
+    token = (token or '').strip()[:CheckoutToken._meta.get_field('key').max_length] or None
+    if token:
+        replayed = _replayed_result(token)
+        if replayed is not None:
+            return replayed
+
+    lines = parse_cart(cart)
+    # The box is credited with the payable price, so a sale cannot go through without one
+    try:
+        payable_price = int(payable_price)
+    except (TypeError, ValueError):
+        raise CheckoutError("Invalid payable price")
+
+    # Total quantity per product (the same product may appear on several lines)
+    requested = {}
+    for product_id, quantity, _ in lines:
+        requested[product_id] = requested.get(product_id, 0) + quantity
+
+    try:
+        result = _sell(lines, requested, payable_price, token)
+    except IntegrityError:
+        # The same token was committed by a concurrent request in the meantime
+        replayed = _replayed_result(token) if token else None
+        if replayed is None:
+            raise
+        return replayed
+
+    # Expired tokens are dropped here, one indexed DELETE outside the sale transaction
+    CheckoutToken.objects.filter(created_at__lt=timezone.now() - CheckoutToken.TTL).delete()
+    return result
+
+
+def _sell(lines, requested, payable_price, token):
+    with transaction.atomic():
+        # Lock every product of the cart in one query, always in the same order
+        products = {
+            product.id: product
+            for product in Product.objects.select_for_update().filter(id__in=requested).order_by('id')
+        }
+        for product_id, quantity in requested.items():
+            product = products.get(product_id)
+            if product is None:
+                raise CheckoutError(f"Product {product_id} does not exist")
+            if product.quantity < quantity:
+                raise InsufficientStock(product, quantity)
+
+        # One conditional UPDATE for all the stock; the WHERE clause re-checks the
+        # quantities so a concurrent sale can never push stock below zero.
+        enough_stock = Q()
+        for product_id, quantity in requested.items():
+            enough_stock |= Q(id=product_id, quantity__gte=quantity)
+        updated = Product.objects.filter(enough_stock).update(
+            quantity=Case(
+                *[When(id=product_id, then=F('quantity') - quantity) for product_id, quantity in requested.items()],
+                default=F('quantity'),
+                output_field=PositiveIntegerField(),
+            ),
+            updated_at=timezone.now(),
+        )
+        if updated != len(requested):
+            raise CheckoutError("Stock changed during checkout")
+        stock_deltas = {}
+        for product_id, quantity in requested.items():
+            product = products[product_id]
+            if product.is_active:
+                inventory.add_quantity(stock_deltas, product.classification_id, product.is_weight, product.price, -quantity)
+
+        dollar_rate = settings_cache.dollar_rate()
+
+        sale_items = []
+        rollup_lines = []
+        receipt_items = []
+        total_items = 0
+        total_price = Decimal(0)
+        total_cost = Decimal(0)
+        for product_id, quantity, profit_percentage in lines:
+            product = products[product_id]
+            # Rounded like the price_at_sale column, so the stored totals match the rows
+            selling_price = (product.price + product.price * profit_percentage / 100).quantize(PRICE_QUANTUM)
+            income = line_total(selling_price, quantity, product.is_weight)
+            cost = line_total(product.price, quantity, product.is_weight).quantize(PRICE_QUANTUM)
+            total_items += quantity
+            total_price += income
+            total_cost += cost
+            rollup_lines.append((product_id, quantity, income, cost, dollar_rate))
+            receipt_items.append(receipt_item(product.name, quantity, product.is_weight, income * dollar_rate))
+            sale_items.append(SaleItem(
+                product=product,
+                quantity=quantity,
+                price_at_sale=selling_price,
+                dollar_rate_at_sale=dollar_rate,
+                cost_at_sale=cost,
+            ))
+
+        today = timezone.localdate()
+        sale = Sale.objects.create(
+            date=today,
+            total_payable_price=payable_price,
+            total_items=total_items,
+            total_usd=total_price,
+            total_syp=total_price * dollar_rate,
+            total_cost_syp=total_cost * dollar_rate,
+            receipt=receipt_snapshot(receipt_items, payable_price),
+        )
+        for sale_item in sale_items:
+            sale_item.sale = sale
+        SaleItem.objects.bulk_create(sale_items)
+        rollup.apply(today, rollup.sale_rows(payable_price, rollup_lines))
+
+        cashbox.record(CashMovement.Kind.SALE, payable_price, sale=sale)
+        # Appended as movements: no shared bucket row is locked by the sale
+        inventory.apply(stock_deltas)
+
+        result = {
+            'sale_id': sale.id,
+            'total_price': total_price,
+            'total_syp_price': total_price * dollar_rate,
+            'replayed': False,
+        }
+        if token:
+            # Unique key: a concurrent duplicate fails here and its whole sale rolls back
+            CheckoutToken.objects.create(key=token, sale=sale, result={
+                'sale_id': sale.id,
+                'total_price': str(result['total_price']),
+                'total_syp_price': str(result['total_syp_price']),
+            })
+
+    return result
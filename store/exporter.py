@@ -0,0 +1,74 @@
+"""
+Product catalog export (CSV and XLSX).
+
+Rows are read with ``.iterator()`` so the catalog is never loaded at once.
+The columns use the names read by ``store.importer`` (quantities of weight
+products in Kg), so an exported file can be edited and imported back.
+"""
+import csv
+
+from .models import Product
+
+ITERATOR_CHUNK_SIZE = 2000
+
+COLUMNS = [
+    'name', 'price', 'syp_price', 'quantity', 'is_weight', 'classification',
+    'description', 'retail_sale_percent', 'whole_sale_percent', 'is_active',
+]
+
+
+def export_rows():
+    """Yield one list of cell values per product, ordered by name."""
+    products = (
+        Product.objects.catalog()
+        .order_by('name', 'id')
+        .values_list(
+            'name', 'price', 'annotated_syp_price', 'quantity', 'is_weight', 'classification__category',
+            'description', 'retail_sale_percent', 'whole_sale_percent', 'is_active',
+        )
+    )
+    for (name, price, syp_price, quantity, is_weight, classification,
+         description, retail_percent, whole_percent, is_active) in products.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        yield [
+            name,
+            price,
+            int(syp_price) if syp_price is not None else None,
+            quantity / 1000 if is_weight else quantity,  # Kg for weight products
+            int(is_weight),
+            classification or '',
+            description or '',
+            retail_percent,
+            whole_percent,
+            int(is_active),
+        ]
+
+
+class _Echo:
+    """File-like object handing back what csv.writer writes, for streaming."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv():
+    """Yield the export as CSV text lines (UTF-8 BOM first, for Excel)."""
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(COLUMNS)
+    for row in export_rows():
+        yield writer.writerow(['' if value is None else value for value in row])
+
+
+def write_xlsx(output):
+    """
+    Write the export as .xlsx to the binary file ``output`` with a write-only
+    workbook (rows are flushed as they are added). Run as a report job by
+    ``store.jobs``: the whole catalog takes too long for a request thread.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('products')
+    sheet.append(COLUMNS)
+    for row in export_rows():
+        sheet.append(row)
+    workbook.save(output)
@@ -100,6 +100,10 @@ class ProductBulkAddForm(forms.ModelForm):
 
         self.clean_name()
         return cleaned_data
+
+    def validate_unique(self):
+        # An existing name is not an error here: add_bulk_products restocks that product
+        pass
     
 # class ProductBulkAddForm(forms.ModelForm):
     
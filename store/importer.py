@@ -0,0 +1,271 @@
+"""
+Product import from Excel (.xlsx) or CSV files.
+
+Each chunk of rows is validated with vectorised pandas operations, the
+classifications are resolved by name in one query (missing ones are
+created), and the valid rows are upserted by product name with
+``bulk_create(update_conflicts=True)``. Invalid rows are skipped and
+listed in the report.
+
+Files are processed in chunks of ``CHUNK_SIZE`` rows. CSV files are read
+chunk by chunk, so a large file is never held in memory at once; Excel
+files are read whole (pandas cannot stream them) and then sliced. Files
+are imported in the background by ``store.jobs``, one committed
+transaction per chunk.
+"""
+import csv
+from decimal import Decimal
+
+import pandas as pd
+from django.db import transaction
+from django.utils import timezone
+
+from . import inventory
+from .models import Classification, Product
+from .search import build_search_text
+
+REQUIRED_COLUMNS = ['name', 'price', 'quantity']
+OPTIONAL_COLUMNS = ['description', 'is_weight', 'classification', 'retail_sale_percent', 'whole_sale_percent']
+PERCENT_COLUMNS = ['retail_sale_percent', 'whole_sale_percent']
+
+CHUNK_SIZE = 5000
+BATCH_SIZE = 500
+MAX_PRICE = Decimal('999999.9999')  # Product.price is max_digits=10, decimal_places=4
+PRICE_QUANTUM = Decimal('0.0001')
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'x', 'نعم', 'وزن'}
+
+
+class ImportFileError(Exception):
+    """The file itself cannot be imported (unreadable, missing columns). Nothing has been written."""
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []  # (row number in the file, message)
+
+    @property
+    def imported(self):
+        return self.created + self.updated
+
+    def add_errors(self, rows, message):
+        self.errors.extend((row, message) for row in rows)
+
+
+def _is_csv(name):
+    return (name or '').lower().endswith('.csv')
+
+
+def read_chunks(source, name):
+    """
+    Yield ``source`` (a path or a file object named ``name``) as DataFrames of
+    at most ``CHUNK_SIZE`` text cells rows. The index keeps counting across chunks.
+    """
+    try:
+        if _is_csv(name):
+            yield from pd.read_csv(
+                source, dtype=str, keep_default_na=False, chunksize=CHUNK_SIZE, encoding='utf-8-sig'
+            )
+        else:
+            frame = pd.read_excel(source, dtype=str, keep_default_na=False)
+            for start in range(0, max(len(frame), 1), CHUNK_SIZE):
+                yield frame.iloc[start:start + CHUNK_SIZE]
+    except (ValueError, UnicodeDecodeError, pd.errors.ParserError) as exc:
+        raise ImportFileError(str(exc))
+
+
+def count_rows(path, name):
+    """Number of data rows of the file at ``path``, used to report the progress."""
+    if _is_csv(name):
+        with open(path, encoding='utf-8-sig', newline='') as handle:
+            return max(sum(1 for _ in csv.reader(handle)) - 1, 0)
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True)
+    try:
+        return max((workbook.active.max_row or 1) - 1, 0)
+    finally:
+        workbook.close()
+
+
+def _normalise_columns(frame):
+    frame.columns = [str(column).strip().lower() for column in frame.columns]
+    missing = [column for column in REQUIRED_COLUMNS if column not in frame.columns]
+    if missing:
+        raise ImportFileError(f"Missing columns: {', '.join(missing)}")
+    return frame
+
+
+def validate(frame, report):
+    """
+    Validate and convert one chunk. Invalid rows are added to ``report`` and
+    dropped; the returned frame holds typed, importable rows.
+    Row numbers are the spreadsheet ones (the header is row 1).
+    """
+    frame = _normalise_columns(frame)
+    rows = frame.index.to_series() + 2
+    clean = pd.DataFrame(index=frame.index)
+    invalid = pd.Series(False, index=frame.index)
+
+    def reject(mask, message):
+        nonlocal invalid
+        mask = mask & ~invalid
+        report.add_errors(rows[mask].tolist(), message)
+        invalid |= mask
+
+    clean['name'] = frame['name'].astype(str).str.strip()
+    reject(clean['name'] == '', "name is required")
+
+    price = pd.to_numeric(frame['price'].str.strip(), errors='coerce')
+    reject(price.isna(), "price is not a number")
+    reject((price < 0) | (price > float(MAX_PRICE)), "price is out of range")
+    clean['price'] = price
+
+    # Weight products are counted in Kg in the file and stored in grams
+    quantity = pd.to_numeric(frame['quantity'].str.strip(), errors='coerce')
+    reject(quantity.isna(), "quantity is not a number")
+    reject(quantity < 0, "quantity is negative")
+    if 'is_weight' in frame.columns:
+        is_weight = frame['is_weight'].astype(str).str.strip().str.lower().isin(TRUE_VALUES)
+        clean['is_weight'] = is_weight
+        quantity = quantity.where(~is_weight, quantity * 1000).round(6)
+        reject(quantity % 1 != 0, "quantity must be a whole number (or Kg with at most 3 decimals)")
+    else:
+        # Without the column existing products keep their type, known only in ``upsert``:
+        # the quantity stays as in the file and is converted there
+        reject((quantity * 1000).round(6) % 1 != 0, "quantity must be a whole number (or Kg with at most 3 decimals)")
+    clean['quantity'] = quantity
+
+    for column in PERCENT_COLUMNS:
+        if column not in frame.columns:
+            continue
+        raw = frame[column].astype(str).str.strip()
+        percent = pd.to_numeric(raw, errors='coerce')
+        reject((raw != '') & (percent.isna() | (percent < 0) | (percent % 1 != 0)),
+               f"{column} must be a positive whole number")
+        clean[column] = percent
+
+    if 'description' in frame.columns:
+        clean['description'] = frame['description'].astype(str).str.strip()
+    if 'classification' in frame.columns:
+        clean['classification'] = frame['classification'].astype(str).str.strip()
+
+    clean = clean[~invalid]
+    # The same name twice would hit the same row twice in one upsert: the last one wins
+    duplicated = clean['name'].duplicated(keep='last')
+    report.add_errors(rows[clean.index[duplicated]].tolist(), "duplicate name, replaced by a later row")
+    return clean[~duplicated]
+
+
+def resolve_classifications(names):
+    """Map classification names to ids in one query, creating the missing ones."""
+    names = {name for name in names if name}
+    if not names:
+        return {}
+    ids = {}
+    for classification_id, category in Classification.objects.filter(category__in=names).order_by('-id').values_list('id', 'category'):
+        ids[category] = classification_id  # Duplicated names: the oldest one wins
+    missing = names - set(ids)
+    if missing:
+        Classification.objects.bulk_create([Classification(category=name) for name in sorted(missing)])
+        ids.update(
+            (category, classification_id)
+            for classification_id, category in Classification.objects.filter(category__in=missing).values_list('id', 'category')
+        )
+    return ids
+
+
+def upsert(clean, report):
+    """
+    Create or update the products of a validated chunk, in batches. Only the
+    columns present in the file are updated, and empty optional cells keep
+    the current value of an existing product.
+    """
+    columns = set(clean.columns)
+    update_fields = ['price', 'quantity', 'search_text', 'updated_at']
+    update_fields += [column for column in ['description', 'is_weight', *PERCENT_COLUMNS] if column in columns]
+    if 'classification' in columns:
+        update_fields.append('classification')
+        classification_ids = resolve_classifications(clean['classification'].unique())
+
+    now = timezone.now()
+    # Keyed by the frame index, which gives back the row number of a row rejected here
+    records = list(clean.to_dict('index').items())
+    for start in range(0, len(records), BATCH_SIZE):
+        batch = records[start:start + BATCH_SIZE]
+        with transaction.atomic():
+            # Existing products of the batch: counts, and the values kept for the cells left empty.
+            # Locked (in id order, like the checkout) until the upsert: a sale in between would
+            # change the stock the valuation deltas are computed from
+            existing = {
+                values[0]: values[1:]
+                for values in Product.objects.select_for_update().filter(
+                    name__in=[record['name'] for _, record in batch]
+                ).order_by('id').values_list(
+                    'name', 'description', 'classification_id', *PERCENT_COLUMNS, 'is_weight', 'is_active', 'price', 'quantity',
+                )
+            }
+            products = []
+            stock_deltas = {}
+            for index, record in batch:
+                old = existing.get(record['name'])
+                if 'is_weight' in columns:
+                    is_weight = bool(record['is_weight'])
+                    quantity = record['quantity']
+                else:
+                    # The product keeps its type (a new one is a unit product): Kg in the file for a weight product
+                    is_weight = bool(old[4]) if old else False
+                    quantity = round(record['quantity'] * 1000, 6) if is_weight else record['quantity']
+                    if quantity % 1:
+                        report.add_errors([index + 2], "quantity must be a whole number (unit product)")
+                        continue
+
+                old_description, old_classification_id, *old_percents = old[:4] if old else (None, None, None, None)
+                description = record.get('description') or old_description
+                product = Product(
+                    name=record['name'],
+                    description=description or None,
+                    price=Decimal(repr(record['price'])).quantize(PRICE_QUANTUM),
+                    quantity=int(quantity),
+                    is_weight=is_weight,
+                    search_text=build_search_text(record['name'], description),
+                    updated_at=now,
+                )
+                for column, old_percent in zip(PERCENT_COLUMNS, old_percents):
+                    if column in columns:
+                        percent = record[column]
+                        setattr(product, column, old_percent if pd.isna(percent) else int(percent))
+                if 'classification' in columns:
+                    product.classification_id = classification_ids.get(record['classification'], old_classification_id)
+                products.append(product)
+
+                # Inventory valuation: the stored row is replaced by the values the upsert leaves
+                is_active = True
+                if old:
+                    old_is_weight, is_active = old[4], old[5]
+                    inventory.deltas([(old_classification_id, old_is_weight, is_active, old[6], old[7])], sign=-1, deltas=stock_deltas)
+                    report.updated += 1
+                else:
+                    report.created += 1
+                classification_id = product.classification_id if 'classification' in columns else old_classification_id
+                inventory.deltas(
+                    [(classification_id, product.is_weight, is_active, product.price, product.quantity)], deltas=stock_deltas
+                )
+
+            if products:
+                Product.objects.bulk_create(
+                    products,
+                    update_conflicts=True,
+                    unique_fields=['name'],
+                    update_fields=update_fields,
+                )
+            inventory.apply(stock_deltas)
+
+
+def import_chunk(chunk, report):
+    """Validate and upsert one chunk, adding its counts and errors to ``report``."""
+    clean = validate(chunk, report)
+    if not clean.empty:
+        upsert(clean, report)
@@ -0,0 +1,244 @@
+"""
+Maintained inventory valuation (``InventoryValuation``).
+
+The USD value of the active stock is kept per bucket (classification, weight
+or unit products), so the financial box page reads a few rows instead of
+scanning every product. Each path changing a product's quantity, price,
+activity or bucket appends its deltas as ``InventoryMovement`` rows:
+``Product.save`` and deletes (see models.py), the checkout, the importer and
+the bulk restock. Appending never waits on a shared row, so concurrent
+checkouts do not queue behind the bucket of their classification.
+
+The current buckets are the folded ones plus the movements not folded yet,
+read in one query; reading never writes. Every ``FOLD_EVERY`` movements a
+background job adds the pending ones to the buckets and deletes them
+(``fold``); the ``fold_inventory_movements`` command does the same from a
+scheduled task. ``recompute()`` rebuilds the buckets from the products in
+one grouped query.
+
+Models are imported lazily: models.py imports this module.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+
+from . import upsert
+
+# Product values a bucket depends on, in the order used by ``deltas``
+VALUE_FIELDS = ('classification_id', 'is_weight', 'is_active', 'price', 'quantity')
+VALUE_FIELDS_SAVED = {'classification', 'is_weight', 'is_active', 'price', 'quantity'}
+
+WEIGHT_FACTOR = Decimal('0.001')  # Weight products: price per kg, quantity in grams
+
+FOLD_EVERY = 1000  # A fold is queued each time the movement ids pass a multiple of this
+FOLD_BATCH = 10000  # Movements folded per transaction
+
+
+def values_of(product):
+    """The ``VALUE_FIELDS`` of a product instance."""
+    return tuple(getattr(product, field) for field in VALUE_FIELDS)
+
+
+def stock_value(price, quantity, is_weight):
+    value = Decimal(price) * quantity
+    return value * WEIGHT_FACTOR if is_weight else value
+
+
+def deltas(rows, sign=1, deltas=None):
+    """
+    Add (``sign=1``) or remove (``sign=-1``) products to bucket deltas
+    ``{(classification_key, is_weight): [products, quantity, value_usd]}``.
+    ``rows`` are ``VALUE_FIELDS`` tuples; inactive products are not counted.
+    """
+    if deltas is None:
+        deltas = {}
+    for classification_id, is_weight, is_active, price, quantity in rows:
+        if not is_active:
+            continue
+        bucket = deltas.setdefault((classification_id or 0, bool(is_weight)), [0, 0, Decimal(0)])
+        bucket[0] += sign
+        bucket[1] += sign * quantity
+        bucket[2] += sign * stock_value(price, quantity, is_weight)
+    return deltas
+
+
+def add_quantity(deltas, classification_id, is_weight, price, quantity):
+    """Add a quantity change of an active product (stock sold or restocked) to ``deltas``."""
+    bucket = deltas.setdefault((classification_id or 0, bool(is_weight)), [0, 0, Decimal(0)])
+    bucket[1] += quantity
+    bucket[2] += stock_value(price, quantity, is_weight)
+    return deltas
+
+
+def _rows(deltas):
+    return [
+        (classification_key, is_weight, products, quantity, value)
+        for (classification_key, is_weight), (products, quantity, value) in sorted(deltas.items())
+        if products or quantity or value
+    ]
+
+
+def apply(deltas):
+    """Append bucket deltas as movements, one insert."""
+    from .models import InventoryMovement
+
+    movements = InventoryMovement.objects.bulk_create([
+        InventoryMovement(
+            classification_key=classification_key, is_weight=is_weight,
+            products=products, quantity=quantity, value_usd=value,
+        )
+        for classification_key, is_weight, products, quantity, value in _rows(deltas)
+    ])
+    # The ids come back from the insert (not on every database): no count query needed
+    if any(movement.id and movement.id % FOLD_EVERY == 0 for movement in movements):
+        from .jobs import request_fold
+
+        request_fold()
+
+
+def _add_to_buckets(deltas):
+    """Add deltas to the folded buckets with one additive upsert (see upsert.py for the supported databases)."""
+    from .models import InventoryValuation
+
+    upsert.add(
+        InventoryValuation, ['classification_key', 'is_weight'], ['products', 'quantity', 'value_usd'],
+        [((classification_key, is_weight), values) for classification_key, is_weight, *values in _rows(deltas)],
+    )
+
+
+def fold():
+    """
+    Add the pending movements to the buckets and delete them, in batches.
+    The movements are locked first: a concurrent fold skips the ones this
+    one deletes. Returns the number of movements folded.
+    """
+    from .models import InventoryMovement
+
+    folded = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                InventoryMovement.objects.select_for_update().order_by('id').values_list(
+                    'id', 'classification_key', 'is_weight', 'products', 'quantity', 'value_usd',
+                )[:FOLD_BATCH]
+            )
+            deltas = {}
+            for _, classification_key, is_weight, products, quantity, value in rows:
+                bucket = deltas.setdefault((classification_key, is_weight), [0, 0, Decimal(0)])
+                bucket[0] += products
+                bucket[1] += quantity
+                bucket[2] += value
+            _add_to_buckets(deltas)
+            InventoryMovement.objects.filter(id__in=[row[0] for row in rows]).delete()
+        folded += len(rows)
+        if len(rows) < FOLD_BATCH:
+            return folded
+
+
+def current_buckets():
+    """
+    The buckets ``{(classification_key, is_weight): [products, quantity, value_usd]}``:
+    the folded ones plus the pending movements, in one query (one snapshot,
+    so a concurrent fold is never counted twice or missed). Read only: the
+    movements are folded by ``fold``.
+    """
+    from django.db.models import F, Sum
+
+    from .models import InventoryMovement, InventoryValuation
+
+    columns = ('classification_key', 'is_weight', 'total_products', 'total_quantity', 'total_value')
+    folded = InventoryValuation.objects.annotate(
+        total_products=F('products'), total_quantity=F('quantity'), total_value=F('value_usd'),
+    ).values_list(*columns)
+    movements = InventoryMovement.objects.values('classification_key', 'is_weight').annotate(
+        total_products=Sum('products'), total_quantity=Sum('quantity'), total_value=Sum('value_usd'),
+    ).values_list(*columns).order_by()
+
+    buckets = {}
+    for classification_key, is_weight, products, quantity, value in folded.union(movements, all=True):
+        bucket = buckets.setdefault((classification_key, is_weight), [0, 0, Decimal(0)])
+        bucket[0] += products or 0
+        bucket[1] += quantity or 0
+        bucket[2] += Decimal(value or 0)
+    return buckets
+
+
+def move_classification(classification_id):
+    """Move the buckets of a classification to "no classification" (before it is deleted)."""
+    from .models import InventoryMovement, InventoryValuation
+
+    buckets = InventoryValuation.objects.filter(classification_key=classification_id)
+    moved = {
+        (0, is_weight): [products, quantity, value]
+        for is_weight, products, quantity, value in buckets.values_list('is_weight', 'products', 'quantity', 'value_usd')
+    }
+    _add_to_buckets(moved)
+    buckets.delete()
+    InventoryMovement.objects.filter(classification_key=classification_id).update(classification_key=0)
+
+
+def _computed_buckets():
+    """
+    The buckets computed from the products and the id of the last movement,
+    in one grouped query: one snapshot, so the movements up to that id are
+    exactly the ones already counted in the products.
+    """
+    from django.db.models import Case, Count, DecimalField, F, Max, Subquery, Sum, Value, When
+    from django.db.models.functions import Coalesce
+
+    from .models import InventoryMovement, Product
+
+    amount = DecimalField(max_digits=24, decimal_places=7)
+    rows = list(
+        Product.objects.filter(is_active=True)
+        .values('is_weight', key=Coalesce('classification_id', Value(0)))
+        .annotate(
+            products=Count('id'),
+            total_quantity=Sum('quantity'),
+            value=Sum(
+                F('price') * F('quantity') * Case(
+                    When(is_weight=True, then=Value(WEIGHT_FACTOR)), default=Value(Decimal(1)), output_field=amount,
+                ),
+                output_field=amount,
+            ),
+            last_movement=Max(Subquery(InventoryMovement.objects.order_by('-id').values('id')[:1])),
+        )
+        .order_by()
+    )
+    buckets = {
+        (row['key'], row['is_weight']): [row['products'], row['total_quantity'] or 0, Decimal(row['value'] or 0)]
+        for row in rows
+    }
+    if rows:
+        last_movement = rows[0]['last_movement']
+    else:
+        # No active product to group the last movement with
+        last_movement = InventoryMovement.objects.aggregate(last=Max('id'))['last']
+    return buckets, last_movement or 0
+
+
+def computed_buckets():
+    """The buckets computed from the products, in one grouped query."""
+    return _computed_buckets()[0]
+
+
+def recompute():
+    """
+    Replace the buckets with the ones computed from the products and drop the
+    movements they already count. Movements appended meanwhile (after the
+    products were read) are kept for the next fold. Returns the buckets.
+    """
+    from .models import InventoryMovement, InventoryValuation
+
+    with transaction.atomic():
+        buckets, last_movement = _computed_buckets()
+        InventoryMovement.objects.filter(id__lte=last_movement).delete()
+        InventoryValuation.objects.all().delete()
+        InventoryValuation.objects.bulk_create([
+            InventoryValuation(
+                classification_key=classification_key, is_weight=is_weight,
+                products=products, quantity=quantity, value_usd=value,
+            )
+            for (classification_key, is_weight), (products, quantity, value) in buckets.items()
+        ])
+    return buckets
@@ -0,0 +1,319 @@
+"""
+Background jobs: sales reports, the Excel product export, product imports and
+the folds of the inventory movements.
+
+Jobs run on small thread pools inside the server process, so a long report
+or import never holds one of the waitress request threads. Imports have
+their own pool (``IMPORT_WORKERS``): a large upload does not delay the
+reports, nor a burst of reports the imports. Each request
+creates (or reuses) a ``ReportJob`` / ``ImportJob`` row that the UI polls.
+
+Finished files are cached in ``REPORT_CACHE_DIR``, named after the report
+kind, the date range and a data version computed from the sales of that
+range (from the catalog for the product export, dated the day it is asked
+for). Asking again for data that has not changed is served from the cache
+without running anything.
+
+Uploaded import files are copied to ``IMPORT_SPOOL_DIR`` and imported chunk
+by chunk; each chunk commits with the job's progress, so an import
+interrupted by a restart continues after its last committed chunk.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Max, Sum
+from django.urls import reverse
+from django.utils import timezone
+
+from . import exporter, importer, inventory, settings_cache
+from .models import Classification, ImportJob, Product, ReportJob, Sale
+from .reports import write_sales_csv, write_sales_pdf
+
+# Bump when the report layout changes, so cached files are regenerated
+REPORT_FORMAT_VERSION = 1
+
+REPORT_WORKERS = getattr(settings, 'REPORT_WORKERS', 2)
+IMPORT_WORKERS = getattr(settings, 'IMPORT_WORKERS', 1)
+REPORT_CACHE_DIR = Path(getattr(settings, 'REPORT_CACHE_DIR', Path(settings.BASE_DIR) / 'report_cache'))
+IMPORT_SPOOL_DIR = Path(getattr(settings, 'IMPORT_SPOOL_DIR', Path(settings.BASE_DIR) / 'import_spool'))
+
+
+def _write_products_xlsx(output, start_date, end_date):
+    exporter.write_xlsx(output)  # The whole catalog, whatever the dates
+
+
+# kind -> (writer, file extension, content type)
+REPORTS = {
+    ReportJob.Kind.SALES_PDF: (write_sales_pdf, 'pdf', 'application/pdf'),
+    ReportJob.Kind.SALES_CSV: (write_sales_csv, 'csv', 'text/csv'),
+    ReportJob.Kind.PRODUCTS_XLSX: (
+        _write_products_xlsx, 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    ),
+}
+# Kinds exporting the current catalog: the date range is only the day they were asked for
+CATALOG_REPORTS = {ReportJob.Kind.PRODUCTS_XLSX}
+
+_executors = {}
+_executor_lock = threading.Lock()
+
+
+def _get_executor(pool='report'):
+    """The pool of the reports and folds, or of the imports for ``pool='import'``; started on first use."""
+    executor = _executors.get(pool)
+    if executor is None:
+        with _executor_lock:
+            executor = _executors.get(pool)
+            if executor is None:
+                workers = IMPORT_WORKERS if pool == 'import' else REPORT_WORKERS
+                executor = _executors[pool] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=pool)
+    return executor
+
+
+def _fingerprint(summary):
+    raw = f"{REPORT_FORMAT_VERSION}|" + "|".join(str(summary[key]) for key in sorted(summary))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def data_version(start_date, end_date):
+    """
+    Fingerprint of the sales of the range: any sale added, removed or
+    changed in the range gives a different value.
+    """
+    return _fingerprint(Sale.objects.filter(date__range=(start_date, end_date)).aggregate(
+        count=Count('id'),
+        last_id=Max('id'),
+        id_sum=Sum('id'),
+        payable=Sum('total_payable_price'),
+        cost=Sum('total_cost_syp'),
+        items=Sum('total_items'),
+    ))
+
+
+def catalog_version():
+    """
+    Fingerprint of the exported catalog: every product write sets
+    ``updated_at``, and the SYP prices follow the dollar rate.
+    """
+    summary = Product.objects.aggregate(count=Count('id'), id_sum=Sum('id'), latest=Max('updated_at'))
+    summary.update(Classification.objects.aggregate(classifications=Count('id'), last_classification=Max('id')))
+    summary['dollar_rate'] = settings_cache.dollar_rate()
+    return _fingerprint(summary)
+
+
+def report_file_name(kind, start_date, end_date, version):
+    extension = REPORTS[kind][1]
+    return f"{kind}_{start_date}_{end_date}_{version}.{extension}"
+
+
+def report_path(job):
+    return REPORT_CACHE_DIR / job.file_name
+
+
+def content_type(job):
+    return REPORTS[job.kind][2]
+
+
+def request_report(kind, start_date, end_date):
+    """
+    Return a job producing the ``kind`` report of the date range. It is
+    already DONE when the cache holds a file for the current data, and an
+    identical job still in progress is reused instead of starting another one.
+    """
+    if kind not in REPORTS:
+        raise ValueError(f"Unknown report kind: {kind}")
+    version = catalog_version() if kind in CATALOG_REPORTS else data_version(start_date, end_date)
+    file_name = report_file_name(kind, start_date, end_date, version)
+    jobs = ReportJob.objects.filter(kind=kind, start_date=start_date, end_date=end_date, data_version=version)
+
+    if (REPORT_CACHE_DIR / file_name).exists():
+        job = jobs.filter(status=ReportJob.Status.DONE).order_by('-id').first()
+        if job is None:
+            job = ReportJob.objects.create(
+                kind=kind, start_date=start_date, end_date=end_date, data_version=version,
+                file_name=file_name, status=ReportJob.Status.DONE, finished_at=timezone.now(),
+            )
+        return job
+
+    job = jobs.filter(status__in=[ReportJob.Status.PENDING, ReportJob.Status.RUNNING]).order_by('-id').first()
+    if job is not None:
+        return job
+
+    job = ReportJob.objects.create(
+        kind=kind, start_date=start_date, end_date=end_date, data_version=version, file_name=file_name,
+    )
+    # Old job rows are dropped here, their cached files stay usable
+    ReportJob.objects.filter(created_at__lt=timezone.now() - ReportJob.TTL).exclude(
+        status__in=[ReportJob.Status.PENDING, ReportJob.Status.RUNNING]
+    ).delete()
+    transaction.on_commit(lambda: _get_executor().submit(run_job, job.id))
+    return job
+
+
+def run_job(job_id):
+    """Generate the file of a pending job (runs in a worker thread)."""
+    close_old_connections()
+    try:
+        claimed = ReportJob.objects.filter(id=job_id, status=ReportJob.Status.PENDING).update(
+            status=ReportJob.Status.RUNNING
+        )
+        if not claimed:
+            return
+        job = ReportJob.objects.get(id=job_id)
+        writer = REPORTS[job.kind][0]
+        try:
+            REPORT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            # Written under a temporary name, then renamed: a cached file is always complete
+            fd, temp_path = tempfile.mkstemp(dir=REPORT_CACHE_DIR, suffix='.part')
+            try:
+                with os.fdopen(fd, 'wb') as output:
+                    writer(output, job.start_date, job.end_date)
+                os.replace(temp_path, report_path(job))
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        except Exception as exc:
+            ReportJob.objects.filter(id=job_id).update(
+                status=ReportJob.Status.FAILED, error=str(exc), finished_at=timezone.now()
+            )
+            return
+        ReportJob.objects.filter(id=job_id).update(status=ReportJob.Status.DONE, finished_at=timezone.now())
+        _remove_stale_files(job)
+    finally:
+        close_old_connections()
+
+
+def _remove_stale_files(job):
+    """Delete the cached files of the same report made from older data."""
+    if job.kind in CATALOG_REPORTS:
+        prefix = f"{job.kind}_"  # Older days included: only the current catalog matters
+    else:
+        prefix = f"{job.kind}_{job.start_date}_{job.end_date}_"
+    for path in REPORT_CACHE_DIR.glob(f"{prefix}*"):
+        if path.name != job.file_name:
+            path.unlink(missing_ok=True)
+
+
+def request_import(uploaded_file):
+    """Copy an uploaded product file to the spool directory and queue its import."""
+    IMPORT_SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+    spool_path = IMPORT_SPOOL_DIR / f"{uuid.uuid4().hex}{Path(uploaded_file.name).suffix.lower()}"
+    with open(spool_path, 'wb') as spool:
+        for chunk in uploaded_file.chunks():
+            spool.write(chunk)
+    job = ImportJob.objects.create(file_name=uploaded_file.name[:255], spool_path=str(spool_path))
+    transaction.on_commit(lambda: _get_executor('import').submit(run_import_job, job.id))
+    return job
+
+
+def run_import_job(job_id):
+    """Import the spooled file of a pending job chunk by chunk (runs in a worker thread)."""
+    close_old_connections()
+    try:
+        claimed = ImportJob.objects.filter(id=job_id, status=ImportJob.Status.PENDING).update(
+            status=ImportJob.Status.RUNNING
+        )
+        if not claimed:
+            return
+        job = ImportJob.objects.get(id=job_id)
+        try:
+            if job.total_rows is None:
+                job.total_rows = importer.count_rows(job.spool_path, job.file_name)
+                job.save(update_fields=['total_rows'])
+
+            for index, chunk in enumerate(importer.read_chunks(job.spool_path, job.file_name)):
+                if index < job.committed_chunks:
+                    continue  # Already imported before an interruption
+                report = importer.ImportReport()
+                with transaction.atomic():
+                    importer.import_chunk(chunk, report)
+                    # Committed with the chunk: the counters always match the imported rows
+                    job.processed_rows += len(chunk)
+                    job.failed_rows += len(report.errors)
+                    job.created_count += report.created
+                    job.updated_count += report.updated
+                    job.errors += [list(error) for error in report.errors][:ImportJob.MAX_ERRORS - len(job.errors)]
+                    job.committed_chunks = index + 1
+                    job.save(update_fields=[
+                        'processed_rows', 'failed_rows', 'created_count', 'updated_count',
+                        'errors', 'committed_chunks',
+                    ])
+        except Exception as exc:
+            ImportJob.objects.filter(id=job_id).update(
+                status=ImportJob.Status.FAILED, error=str(exc), finished_at=timezone.now()
+            )
+            return
+        finally:
+            # A failed job is not resumed: its file is not needed any more either way
+            Path(job.spool_path).unlink(missing_ok=True)
+        ImportJob.objects.filter(id=job_id).update(status=ImportJob.Status.DONE, finished_at=timezone.now())
+    finally:
+        close_old_connections()
+
+
+_fold_lock = threading.Lock()
+
+
+def request_fold():
+    """Queue a fold of the pending inventory movements once the transaction commits."""
+    transaction.on_commit(lambda: _get_executor().submit(run_fold))
+
+
+def run_fold():
+    """Fold the pending inventory movements (runs in a worker thread), one fold at a time."""
+    if not _fold_lock.acquire(blocking=False):
+        return  # Already folding
+    close_old_connections()
+    try:
+        inventory.fold()
+    finally:
+        close_old_connections()
+        _fold_lock.release()
+
+
+def resume_pending():
+    """
+    Queue again the jobs left unfinished by a previous run of the server.
+    Called once at startup (see apps.py).
+    """
+    for model, runner, pool in ((ReportJob, run_job, 'report'), (ImportJob, run_import_job, 'import')):
+        model.objects.filter(status=model.Status.RUNNING).update(status=model.Status.PENDING)
+        for job_id in model.objects.filter(status=model.Status.PENDING).values_list('id', flat=True):
+            _get_executor(pool).submit(runner, job_id)
+
+
+def job_json(job):
+    """Status of a job as returned to the polling UI."""
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'error': job.error,
+        'status_url': reverse('report_job_status', args=[job.id]),
+        'download_url': reverse('report_job_download', args=[job.id]) if job.status == ReportJob.Status.DONE else None,
+    }
+
+
+def import_job_json(job):
+    """Progress of an import job as returned to the polling UI."""
+    return {
+        'id': job.id,
+        'file_name': job.file_name,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'total_rows': job.total_rows,
+        'processed_rows': job.processed_rows,
+        'failed_rows': job.failed_rows,
+        'created': job.created_count,
+        'updated': job.updated_count,
+        'errors': job.errors,
+        'error': job.error,
+        'status_url': reverse('import_job_status', args=[job.id]),
+    }
@@ -0,0 +1,80 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from store.models import Sale
+
+TOTAL_FIELDS = ['total_items', 'total_usd', 'total_syp', 'total_cost_syp']
+TOLERANCE = Decimal('0.01')
+
+
+def _computed_totals(sale_ids):
+    """Totals of the given sales computed from their SaleItem rows, in one grouped query."""
+    rows = Sale.objects.filter(id__in=sale_ids).with_totals().values(
+        'id', 'items_count', 'items_total_usd', 'items_total_syp', 'items_cost_syp',
+    )
+    return {
+        row['id']: {
+            'total_items': row['items_count'],
+            'total_usd': row['items_total_usd'],
+            'total_syp': row['items_total_syp'],
+            'total_cost_syp': row['items_cost_syp'],
+        }
+        for row in rows
+    }
+
+
+class Command(BaseCommand):
+    help = "Fill (or verify) the denormalised totals stored on Sale, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--all', action='store_true',
+                            help="Recompute every sale, not only the ones without totals.")
+        parser.add_argument('--verify', action='store_true',
+                            help="Only compare the stored totals with the sale items and report differences.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        verify = options['verify']
+
+        sales = Sale.objects.order_by('id')
+        if not verify and not options['all']:
+            sales = sales.filter(total_items__isnull=True)
+
+        last_id = 0
+        processed = mismatched = 0
+        while True:
+            # Keyset over the primary key so every batch is an indexed range scan
+            batch = list(sales.filter(id__gt=last_id).only('id', *TOTAL_FIELDS)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            computed = _computed_totals([sale.id for sale in batch])
+            empty = {'total_items': 0, 'total_usd': Decimal(0), 'total_syp': Decimal(0), 'total_cost_syp': Decimal(0)}
+
+            if verify:
+                for sale in batch:
+                    expected = computed.get(sale.id, empty)
+                    if any(
+                        getattr(sale, field) is None or abs(getattr(sale, field) - expected[field]) > TOLERANCE
+                        for field in TOTAL_FIELDS
+                    ):
+                        mismatched += 1
+                        self.stdout.write(f"Sale {sale.id}: stored "
+                                          f"{[getattr(sale, field) for field in TOTAL_FIELDS]} "
+                                          f"!= computed {[expected[field] for field in TOTAL_FIELDS]}")
+            else:
+                for sale in batch:
+                    for field, value in computed.get(sale.id, empty).items():
+                        setattr(sale, field, value)
+                with transaction.atomic():
+                    Sale.objects.bulk_update(batch, TOTAL_FIELDS)
+
+            processed += len(batch)
+
+        if verify:
+            style = self.style.SUCCESS if not mismatched else self.style.ERROR
+            self.stdout.write(style(f"Checked {processed} sales, {mismatched} with wrong totals."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Updated the totals of {processed} sales."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from store import inventory
+
+
+class Command(BaseCommand):
+    help = (
+        "Add the pending inventory movements to the valuation buckets and delete them. "
+        "The server queues a fold every FOLD_EVERY movements; schedule this to fold the rest."
+    )
+
+    def handle(self, *args, **options):
+        folded = inventory.fold()
+        self.stdout.write(self.style.SUCCESS(f"Folded {folded} inventory movement(s)."))
@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store import rollup
+
+
+def _date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales rollup from the sale items (all days, or a date range)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=_date, help="First day to rebuild (YYYY-MM-DD).")
+        parser.add_argument('--end', type=_date, help="Last day to rebuild (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        rows = rollup.rebuild(options['start'], options['end'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the daily sales rollup: {rows} rows."))
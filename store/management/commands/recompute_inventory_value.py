@@ -0,0 +1,43 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from store import inventory
+
+VALUE_QUANTUM = Decimal('0.0001')
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the inventory valuation buckets from the products (one grouped query), "
+        "report the differences with the maintained ones and replace them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report the differences.")
+
+    def handle(self, *args, **options):
+        stored = inventory.current_buckets()
+        computed = inventory.computed_buckets()
+
+        drift = 0
+        for key in sorted(set(stored) | set(computed)):
+            old = stored.get(key, [0, 0, Decimal(0)])
+            new = computed.get(key, [0, 0, Decimal(0)])
+            if old[:2] != new[:2] or Decimal(old[2]).quantize(VALUE_QUANTUM) != Decimal(new[2]).quantize(VALUE_QUANTUM):
+                drift += 1
+                classification_key, is_weight = key
+                self.stdout.write(
+                    f"classification {classification_key or '-'} {'weight' if is_weight else 'unit'}: "
+                    f"stored {old[0]} products / {old[1]} / ${old[2]}, "
+                    f"computed {new[0]} products / {new[1]} / ${new[2]}"
+                )
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("The inventory valuation matches the products."))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"{drift} bucket(s) drifted, run again without --dry-run to fix them."))
+        if not options['dry_run']:
+            inventory.recompute()
+            if drift:
+                self.stdout.write(self.style.SUCCESS(f"Recomputed the inventory valuation ({drift} bucket(s) fixed)."))
@@ -0,0 +1,40 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+
+from store.models import Trader, Transaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the cached balance of every trader with the sum of its transactions "
+        "(one grouped query) and report the differences."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Write the recomputed balance of the traders that drifted.")
+
+    def handle(self, *args, **options):
+        drifted = (
+            Trader.objects
+            .annotate(computed_balance=Coalesce(Sum(Transaction.balance_delta('transactions__')), Decimal(0)))
+            .exclude(current_balance=F('computed_balance'))
+            .order_by('id')
+            .values_list('id', 'name', 'current_balance', 'computed_balance')
+        )
+        count = 0
+        for trader_id, name, current, computed in drifted:
+            count += 1
+            self.stdout.write(f"{trader_id} {name}: cached {current}, transactions {computed} (drift {current - computed})")
+            if options['fix']:
+                # Recomputed again for this trader alone, so a transaction added meanwhile is counted
+                Trader(pk=trader_id).update_balance()
+
+        if not count:
+            self.stdout.write(self.style.SUCCESS("All trader balances match their transactions."))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {count} trader balance(s)."))
+        else:
+            self.stdout.write(self.style.WARNING(f"{count} trader balance(s) drifted, run again with --fix to repair them."))
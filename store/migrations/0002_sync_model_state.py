@@ -0,0 +1,61 @@
+# Generated by Django 5.0.2 on 2026-10-18 12:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='financialbox',
+            options={'verbose_name': 'Financial Box', 'verbose_name_plural': 'Financial Box'},
+        ),
+        migrations.AlterModelOptions(
+            name='saleitem',
+            options={'verbose_name': 'Sale Item', 'verbose_name_plural': 'Sale Items'},
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='is_weight',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='name',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='price',
+            field=models.DecimalField(decimal_places=4, max_digits=10),
+        ),
+        migrations.AlterField(
+            model_name='saleitem',
+            name='dollar_rate_at_sale',
+            field=models.DecimalField(decimal_places=4, max_digits=10),
+        ),
+        migrations.AlterField(
+            model_name='saleitem',
+            name='price_at_sale',
+            field=models.DecimalField(decimal_places=4, max_digits=10),
+        ),
+        migrations.AlterField(
+            model_name='settings',
+            name='value',
+            field=models.DecimalField(decimal_places=4, max_digits=15),
+        ),
+        migrations.AlterField(
+            model_name='trader',
+            name='current_balance',
+            field=models.DecimalField(decimal_places=4, default=0.0, max_digits=10, verbose_name='Current Financial Balance'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='amount',
+            field=models.DecimalField(decimal_places=4, max_digits=10, verbose_name='Amount'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.0.2 on 2026-10-18 12:58
+
+from django.db import migrations, models
+
+from store.search import build_search_text
+
+
+def fill_search_text(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    products = list(Product.objects.only('id', 'name', 'description'))
+    for product in products:
+        product.search_text = build_search_text(product.name, product.description)
+    Product.objects.bulk_update(products, ['search_text'], batch_size=500)
+
+
+def create_trigram_index(apps, schema_editor):
+    # Trigram GIN index serving LIKE '%term%' and LIKE 'term%'. PostgreSQL only,
+    # other backends (SQLite in tests) fall back to a scan of the same column.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS store_product_search_text_trgm '
+        'ON store_product USING gin (search_text gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS store_product_search_text_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_sync_model_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_text',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
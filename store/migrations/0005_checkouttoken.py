@@ -0,0 +1,24 @@
+# Generated by Django 5.0.2 on 2026-10-18 13:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_product_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckoutToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('result', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('sale', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkout_tokens', to='store.sale')),
+            ],
+        ),
+    ]
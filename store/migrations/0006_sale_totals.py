@@ -0,0 +1,72 @@
+# Generated by Django 5.0.2 on 2026-10-18 13:02
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Case, F, Sum, Value, When
+
+BATCH_SIZE = 1000
+
+
+def fill_sale_totals(apps, schema_editor):
+    # Same computation as the backfill_sale_totals command, on the historical models.
+    # The lines have no buying cost yet: the current price of the product is the best value.
+    Sale = apps.get_model('store', 'Sale')
+    SaleItem = apps.get_model('store', 'SaleItem')
+    amount = models.DecimalField(max_digits=18, decimal_places=4)
+    # Weight products are priced per kg and sold in grams
+    factor = Case(When(product__is_weight=True, then=Value(Decimal('0.001'))), default=Value(Decimal(1)), output_field=amount)
+    line_usd = F('price_at_sale') * F('quantity') * factor
+    fields = ['total_items', 'total_usd', 'total_syp', 'total_cost_syp']
+
+    last_id = 0
+    while True:
+        batch = list(Sale.objects.filter(id__gt=last_id).order_by('id').only('id')[:BATCH_SIZE])
+        if not batch:
+            break
+        last_id = batch[-1].id
+        rows = SaleItem.objects.filter(sale_id__in=[sale.id for sale in batch]).values('sale_id').annotate(
+            items=Sum('quantity'),
+            usd=Sum(line_usd, output_field=amount),
+            syp=Sum(line_usd * F('dollar_rate_at_sale'), output_field=amount),
+            cost_syp=Sum(F('product__price') * F('quantity') * factor * F('dollar_rate_at_sale'), output_field=amount),
+        ).order_by()
+        totals = {row['sale_id']: row for row in rows}
+        for sale in batch:
+            row = totals.get(sale.id, {})
+            sale.total_items = row.get('items') or 0
+            sale.total_usd = row.get('usd') or Decimal(0)
+            sale.total_syp = row.get('syp') or Decimal(0)
+            sale.total_cost_syp = row.get('cost_syp') or Decimal(0)
+        Sale.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_checkouttoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='total_cost_syp',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=18, null=True),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='total_items',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='total_syp',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=18, null=True),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='total_usd',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=14, null=True),
+        ),
+        migrations.RunPython(fill_sale_totals, migrations.RunPython.noop),
+    ]
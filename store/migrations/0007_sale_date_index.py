@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_sale_totals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['date', 'id'], name='store_sale_date_id_idx'),
+        ),
+    ]
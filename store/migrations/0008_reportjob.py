@@ -0,0 +1,28 @@
+# Generated by Django 5.0.2 on 2026-10-18 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_sale_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('sales_pdf', 'تقرير مبيعات PDF'), ('sales_csv', 'تقرير مبيعات CSV')], max_length=20)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('data_version', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'بالانتظار'), ('running', 'قيد الإنشاء'), ('done', 'جاهز'), ('failed', 'فشل')], db_index=True, default='pending', max_length=10)),
+                ('file_name', models.CharField(blank=True, max_length=255)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
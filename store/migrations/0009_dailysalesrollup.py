@@ -0,0 +1,88 @@
+# Generated by Django 5.0.2 on 2026-10-18 13:09
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def build_rollup(apps, schema_editor):
+    # Same as store.rollup.rebuild, on the historical models. The lines have no
+    # buying cost yet: the cost uses the current price of the product.
+    from store.rollup import AMOUNT_COLUMNS, sale_rows
+
+    SaleItem = apps.get_model('store', 'SaleItem')
+    DailySalesRollup = apps.get_model('store', 'DailySalesRollup')
+    items = SaleItem.objects.select_related('sale', 'product').order_by('sale_id', 'id')
+
+    totals = {}
+
+    def add_sale(sale, sale_items):
+        lines = []
+        for item in sale_items:
+            # Weight products are priced per kg and sold in grams
+            factor = Decimal('0.001') if item.product.is_weight else Decimal(1)
+            lines.append((
+                item.product_id, item.quantity, item.price_at_sale * item.quantity * factor,
+                item.product.price * item.quantity * factor, item.dollar_rate_at_sale,
+            ))
+        for product_id, values in sale_rows(sale.total_payable_price, lines).items():
+            current = totals.setdefault((sale.date, product_id), [0, *[Decimal(0)] * len(AMOUNT_COLUMNS)])
+            for index, value in enumerate(values):
+                current[index] += value
+
+    sale, sale_items = None, []
+    for item in items.iterator(chunk_size=BATCH_SIZE):
+        if sale is not None and item.sale_id != sale.id:
+            add_sale(sale, sale_items)
+            sale_items = []
+        sale = item.sale
+        sale_items.append(item)
+    if sale is not None:
+        add_sale(sale, sale_items)
+
+    DailySalesRollup.objects.bulk_create(
+        [
+            DailySalesRollup(
+                day=day, product_id=product_id, quantity=values[0],
+                **dict(zip(AMOUNT_COLUMNS, values[1:])),
+            )
+            for (day, product_id), values in totals.items()
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_reportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('income_usd', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('income_syp', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+                ('cost_usd', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('cost_syp', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+                ('payable_syp', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='store.product')),
+            ],
+            options={
+                'verbose_name': 'Daily Sales Rollup',
+                'verbose_name_plural': 'Daily Sales Rollup',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailysalesrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'product'), name='store_rollup_day_product_uniq'),
+        ),
+        migrations.RunPython(build_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.2 on 2026-10-18 14:10
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, OuterRef, Subquery, Value
+
+
+def fill_cost_at_sale(apps, schema_editor):
+    # Best available value for the existing lines: the current buying price of the product.
+    # One UPDATE per kind of product, weight products are priced per kg and sold in grams.
+    Product = apps.get_model('store', 'Product')
+    SaleItem = apps.get_model('store', 'SaleItem')
+    price = Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('price')[:1])
+    amount = models.DecimalField(max_digits=18, decimal_places=4)
+    SaleItem.objects.filter(product__is_weight=True).update(
+        cost_at_sale=ExpressionWrapper(price * F('quantity') * Value(Decimal('0.001')), output_field=amount)
+    )
+    SaleItem.objects.filter(product__is_weight=False).update(
+        cost_at_sale=ExpressionWrapper(price * F('quantity'), output_field=amount)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_dailysalesrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='saleitem',
+            name='cost_at_sale',
+            field=models.DecimalField(decimal_places=4, max_digits=18, null=True),
+        ),
+        migrations.RunPython(fill_cost_at_sale, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='saleitem',
+            name='cost_at_sale',
+            field=models.DecimalField(decimal_places=4, max_digits=18),
+        ),
+    ]
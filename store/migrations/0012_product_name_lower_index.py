@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-18 13:17
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_importjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='store_product_name_lower_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-18 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_product_name_lower_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['trader', 'date', 'id'], name='store_trans_trader_date_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.0.2 on 2026-10-18 13:22
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def seed_from_financial_box(apps, schema_editor):
+    # The amount of the old single-row box becomes the opening adjustment of the ledger
+    FinancialBox = apps.get_model('store', 'FinancialBox')
+    CashMovement = apps.get_model('store', 'CashMovement')
+    amount = FinancialBox.objects.aggregate(total=Sum('current_amount'))['total'] or 0
+    if amount:
+        CashMovement.objects.create(kind='adjustment', amount=amount, note='رصيد الصندوق السابق')
+
+
+def restore_financial_box(apps, schema_editor):
+    FinancialBox = apps.get_model('store', 'FinancialBox')
+    CashMovement = apps.get_model('store', 'CashMovement')
+    FinancialBox.objects.create(current_amount=CashMovement.objects.aggregate(total=Sum('amount'))['total'] or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_transaction_trader_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoxCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_movement_id', models.BigIntegerField(unique=True)),
+                ('balance', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CashMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('sale', 'بيع'), ('payment', 'دفع لتاجر'), ('adjustment', 'تعديل يدوي')], max_length=10)),
+                ('amount', models.BigIntegerField()),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('sale', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cash_movements', to='store.sale')),
+                ('trader_transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cash_movements', to='store.transaction')),
+            ],
+            options={
+                'verbose_name': 'Cash Movement',
+                'verbose_name_plural': 'Cash Movements',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.RunPython(seed_from_financial_box, restore_financial_box),
+        migrations.DeleteModel(
+            name='FinancialBox',
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.0.2 on 2026-10-18 13:25
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+
+def fill_inventory_valuation(apps, schema_editor):
+    # Same grouped query as store.inventory.computed_buckets, on the historical models
+    Product = apps.get_model('store', 'Product')
+    InventoryValuation = apps.get_model('store', 'InventoryValuation')
+    amount = models.DecimalField(max_digits=24, decimal_places=7)
+    rows = (
+        Product.objects.filter(is_active=True)
+        .values('is_weight', key=Coalesce('classification_id', Value(0)))
+        .annotate(
+            products=Count('id'),
+            total_quantity=Sum('quantity'),
+            value=Sum(
+                F('price') * F('quantity') * Case(
+                    When(is_weight=True, then=Value(Decimal('0.001'))), default=Value(Decimal(1)), output_field=amount,
+                ),
+                output_field=amount,
+            ),
+        )
+        .order_by()
+    )
+    InventoryValuation.objects.bulk_create([
+        InventoryValuation(
+            classification_key=row['key'], is_weight=row['is_weight'], products=row['products'],
+            quantity=row['total_quantity'] or 0, value_usd=row['value'] or 0,
+        )
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0014_cash_movement_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryValuation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('classification_key', models.BigIntegerField(default=0)),
+                ('is_weight', models.BooleanField()),
+                ('products', models.IntegerField(default=0)),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('value_usd', models.DecimalField(decimal_places=7, default=0, max_digits=24)),
+            ],
+            options={
+                'verbose_name': 'Inventory Valuation',
+                'verbose_name_plural': 'Inventory Valuation',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='inventoryvaluation',
+            constraint=models.UniqueConstraint(fields=('classification_key', 'is_weight'), name='store_inventory_bucket_uniq'),
+        ),
+        migrations.RunPython(fill_inventory_valuation, migrations.RunPython.noop),
+    ]
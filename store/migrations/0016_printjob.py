@@ -0,0 +1,30 @@
+# Generated by Django 5.0.2 on 2026-10-18 13:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0015_inventoryvaluation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrintJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.JSONField()),
+                ('status', models.CharField(choices=[('pending', 'بالانتظار'), ('printing', 'قيد الطباعة'), ('done', 'تمت الطباعة'), ('failed', 'فشل')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('printed_at', models.DateTimeField(blank=True, null=True)),
+                ('sale', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='print_jobs', to='store.sale')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='store_printjob_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-18 13:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0016_printjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='receipt',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
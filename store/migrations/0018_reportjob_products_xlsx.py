@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-18 13:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0017_sale_receipt'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reportjob',
+            name='kind',
+            field=models.CharField(choices=[('sales_pdf', 'تقرير مبيعات PDF'), ('sales_csv', 'تقرير مبيعات CSV'), ('products_xlsx', 'تصدير المنتجات Excel')], max_length=20),
+        ),
+    ]
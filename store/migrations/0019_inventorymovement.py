@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0018_reportjob_products_xlsx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('classification_key', models.BigIntegerField(default=0)),
+                ('is_weight', models.BooleanField()),
+                ('products', models.IntegerField(default=0)),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('value_usd', models.DecimalField(decimal_places=7, default=0, max_digits=24)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Inventory Movement',
+                'verbose_name_plural': 'Inventory Movements',
+            },
+        ),
+    ]
@@ -1,6 +1,15 @@
-from django.db import models
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import BooleanField, Case, ExpressionWrapper, F, FloatField, Q, Subquery, Sum, Value, When, Window
+from django.db.models.functions import Cast, Coalesce, Floor, Lower
+from django.db.models.signals import post_delete, pre_delete
 from django.utils import timezone
 
+from . import inventory, settings_cache
+from .search import build_search_text
+
 # ======================================================================
 # ======================================================================
 # ======================================================================
@@ -15,6 +24,28 @@ class Classification(models.Model):
 # ======================================================================
 # ======================================================================
 
+class ProductQuerySet(models.QuerySet):
+
+    def catalog(self):
+        """
+        Products ready to be rendered as catalog cards in a single query:
+        the classification is joined, and the SYP price, stock flags and kg
+        quantity are computed in SQL from the current Settings rows.
+        """
+        dollar_rate = Subquery(Settings.objects.filter(key='dollar_rate').values('value')[:1])
+        minimum = Subquery(Settings.objects.filter(key='minimum').values('value')[:1])
+        return self.select_related('classification').annotate(
+            annotated_syp_price=Floor(F('price') * dollar_rate),
+            is_out_of_stock=ExpressionWrapper(Q(quantity=0), output_field=BooleanField()),
+            is_low_stock=ExpressionWrapper(Q(quantity__lt=minimum), output_field=BooleanField()),
+            quantity_kg=Case(
+                When(is_weight=True, then=Cast('quantity', FloatField()) / Value(1000.0)),
+                default=None,
+                output_field=FloatField(),
+            ),
+        )
+
+
 class Product(models.Model):
     is_weight = models.BooleanField(default=False)
     
@@ -28,12 +59,50 @@ class Product(models.Model):
 
     is_active = models.BooleanField(default=True)
 
+    # Folded name + description used by store.search (kept in sync in save())
+    search_text = models.TextField(default='', editable=False)
+    # Drives the incremental refresh of the sell screen product index.
+    # Queryset .update() / bulk paths must set it explicitly.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Case-insensitive name lookups (bulk restock) filter on LOWER(name)
+            models.Index(Lower('name'), name='store_product_name_lower_idx'),
+        ]
+
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        self.search_text = build_search_text(self.name, self.description)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields) | {'updated_at'}
+            if {'name', 'description'} & update_fields:
+                update_fields.add('search_text')
+            kwargs['update_fields'] = update_fields
+            if not inventory.VALUE_FIELDS_SAVED & update_fields:
+                super().save(*args, **kwargs)
+                return
+
+        # The inventory valuation moves by the difference with the stored row
+        with transaction.atomic():
+            old = None
+            if self.pk is not None and not self._state.adding:
+                old = Product.objects.select_for_update().filter(pk=self.pk).values_list(*inventory.VALUE_FIELDS).first()
+            super().save(*args, **kwargs)
+            deltas = inventory.deltas([old], sign=-1) if old else {}
+            inventory.apply(inventory.deltas([inventory.values_of(self)], deltas=deltas))
     
     def syp_price(self):
-        dollar_rate = Settings.objects.get(key="dollar_rate").value 
-        return int(self.price * dollar_rate)
+        # Rows coming from Product.objects.catalog() already carry the value computed in SQL
+        annotated = getattr(self, 'annotated_syp_price', None)
+        if annotated is not None:
+            return int(annotated)
+        return int(self.price * settings_cache.dollar_rate())
     
     def safe_delete(self):
         if SaleItem.objects.filter(product=self).exists():
@@ -48,10 +117,74 @@ class Product(models.Model):
 # ======================================================================
 # ======================================================================
 
+AMOUNT_FIELD = models.DecimalField(max_digits=18, decimal_places=4)
+
+
+def weight_factor(product_path='product'):
+    """
+    Factor turning quantity x price into a line total: weight products are
+    priced per kg and sold in grams. A multiplication, so integer-valued
+    operands are never truncated by an integer division.
+    """
+    return Case(
+        When(**{f'{product_path}__is_weight': True}, then=Value(Decimal('0.001'))),
+        default=Value(Decimal(1)),
+        output_field=AMOUNT_FIELD,
+    )
+
+
+class SaleQuerySet(models.QuerySet):
+
+    def with_cost(self):
+        """
+        Annotate each sale with ``items_cost_syp``, the cost of its items from
+        ``SaleItem.cost_at_sale`` (no join to Product).
+        """
+        return self.annotate(
+            items_cost_syp=Coalesce(
+                Sum(F('saleitem__cost_at_sale') * F('saleitem__dollar_rate_at_sale'), output_field=AMOUNT_FIELD),
+                Value(0), output_field=AMOUNT_FIELD,
+            ),
+        )
+
+    def with_totals(self):
+        """
+        Annotate each sale with totals computed from its items in SQL
+        (``items_count``, ``items_total_usd``, ``items_total_syp``, ``items_cost_syp``).
+        """
+        line_usd = F('saleitem__price_at_sale') * F('saleitem__quantity') * weight_factor('saleitem__product')
+        return self.annotate(
+            items_count=Coalesce(Sum('saleitem__quantity'), 0),
+            items_total_usd=Coalesce(Sum(line_usd, output_field=AMOUNT_FIELD), Value(0), output_field=AMOUNT_FIELD),
+            items_total_syp=Coalesce(
+                Sum(line_usd * F('saleitem__dollar_rate_at_sale'), output_field=AMOUNT_FIELD),
+                Value(0), output_field=AMOUNT_FIELD,
+            ),
+        ).with_cost()
+
+
 class Sale(models.Model):
     date = models.DateField(default=timezone.now)
     products = models.ManyToManyField(Product, through='SaleItem')
     total_payable_price=models.PositiveIntegerField(null=True,blank=True)
+
+    # Denormalised totals of the sale items, written by store.checkout.
+    # Filled for older sales by migration 0006; `manage.py backfill_sale_totals --verify` checks them.
+    total_items = models.PositiveIntegerField(null=True, blank=True)
+    total_usd = models.DecimalField(max_digits=14, decimal_places=4, null=True, blank=True)
+    total_syp = models.DecimalField(max_digits=18, decimal_places=4, null=True, blank=True)
+    total_cost_syp = models.DecimalField(max_digits=18, decimal_places=4, null=True, blank=True)
+    # What the receipt shows, fixed by the checkout (see checkout.receipt_snapshot); NULL for older sales
+    receipt = models.JSONField(null=True, blank=True, editable=False)
+
+    objects = SaleQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Sales history is browsed newest first with a (date, id) keyset cursor
+            models.Index(fields=['date', 'id'], name='store_sale_date_id_idx'),
+        ]
+
     def __str__(self):
         return f"Sale on {self.date.strftime('%Y-%m-%d %H:%M:%S')}"
 
@@ -59,18 +192,69 @@ class Sale(models.Model):
 # ======================================================================
 # ======================================================================
 
+class CheckoutToken(models.Model):
+    """
+    Idempotency key of a checkout submission, generated by cart.js.
+    A replayed submission (double click, resent form) finds its token and
+    gets the stored result back instead of selling the cart a second time.
+    Tokens expire after ``TTL`` and are purged by the checkout itself.
+    """
+    TTL = timedelta(days=2)
+
+    key = models.CharField(max_length=64, unique=True)
+    sale = models.ForeignKey(Sale, on_delete=models.CASCADE, related_name='checkout_tokens')
+    result = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Checkout {self.key} -> {self.sale_id}"
+
+# ======================================================================
+# ======================================================================
+# ======================================================================
+
+class SaleItemQuerySet(models.QuerySet):
+
+    def with_line_totals(self):
+        """
+        Join the product and annotate each line with its weight-aware totals
+        (``line_total`` in USD, ``line_total_syp``) and its kg quantity for weight products.
+        """
+        line_total = ExpressionWrapper(
+            F('price_at_sale') * F('quantity') * weight_factor(), output_field=AMOUNT_FIELD
+        )
+        return self.select_related('product').annotate(
+            line_total=line_total,
+            line_total_syp=ExpressionWrapper(line_total * F('dollar_rate_at_sale'), output_field=AMOUNT_FIELD),
+            quantity_kg=Case(
+                When(product__is_weight=True, then=Cast('quantity', FloatField()) / Value(1000.0)),
+                default=None,
+                output_field=FloatField(),
+            ),
+        )
+
+
 class SaleItem(models.Model):
     sale = models.ForeignKey(Sale, on_delete=models.CASCADE)  # CASCADE is fine here because SaleItem is a child of Sale
     product = models.ForeignKey(Product, on_delete=models.PROTECT)
     quantity = models.PositiveIntegerField()  # Quantity of the product sold
     price_at_sale = models.DecimalField(max_digits=10, decimal_places=4)  # Price at the time of sale
     dollar_rate_at_sale=models.DecimalField(max_digits=10, decimal_places=4)
+    # Buying cost of the whole line in USD at the time of sale (per kg price / 1000 for weight products)
+    cost_at_sale = models.DecimalField(max_digits=18, decimal_places=4)
+
+    objects = SaleItemQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Sale Item"
         verbose_name_plural = "Sale Items" 
     def save(self, *args, **kwargs):
         if self.dollar_rate_at_sale is None:
-            self.dollar_rate_at_sale = Settings.objects.filter(key='dollar_rate').first().value
+            self.dollar_rate_at_sale = settings_cache.dollar_rate()
+        if self.cost_at_sale is None:
+            self.cost_at_sale = self.product.price * self.quantity
+            if self.product.is_weight:
+                self.cost_at_sale /= 1000
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -80,6 +264,96 @@ class SaleItem(models.Model):
 # ======================================================================
 # ======================================================================
 
+class DailySalesRollup(models.Model):
+    """
+    Sales of one product on one day, kept up to date by ``store.rollup``
+    (checkout adds, sale removal subtracts). Built by migration 0009 and
+    rebuilt from the sale items by ``manage.py rebuild_sales_rollup``. Amounts are weight-aware; the
+    payable amount of each sale is shared between its products by income.
+    """
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    quantity = models.BigIntegerField(default=0)  # Units, or grams for weight products
+    income_usd = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    income_syp = models.DecimalField(max_digits=20, decimal_places=4, default=0)
+    cost_usd = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    cost_syp = models.DecimalField(max_digits=20, decimal_places=4, default=0)
+    payable_syp = models.DecimalField(max_digits=20, decimal_places=4, default=0)
+
+    class Meta:
+        verbose_name = "Daily Sales Rollup"
+        verbose_name_plural = "Daily Sales Rollup"
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='store_rollup_day_product_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.day}: {self.quantity} of product {self.product_id}"
+
+
+
+class InventoryValuation(models.Model):
+    """
+    USD value of the active stock in one bucket (classification, weight or
+    unit products), as of the last fold of the ``InventoryMovement`` rows
+    (see ``store.inventory``). Reconciled against the products by
+    ``manage.py recompute_inventory_value``.
+    """
+    classification_key = models.BigIntegerField(default=0)  # Classification id, 0 for none
+    is_weight = models.BooleanField()
+    products = models.IntegerField(default=0)
+    quantity = models.BigIntegerField(default=0)  # Units, or grams for weight products
+    # price (4 places) x grams x 0.001 needs 7 places to stay exact
+    value_usd = models.DecimalField(max_digits=24, decimal_places=7, default=0)
+
+    class Meta:
+        verbose_name = "Inventory Valuation"
+        verbose_name_plural = "Inventory Valuation"
+        constraints = [
+            models.UniqueConstraint(fields=['classification_key', 'is_weight'], name='store_inventory_bucket_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.classification_key}/{'weight' if self.is_weight else 'unit'}: {self.value_usd}"
+
+
+class InventoryMovement(models.Model):
+    """
+    A change of one inventory bucket, appended by every path that changes a
+    product's quantity, price or bucket, so concurrent checkouts never update
+    the same row. Folded into ``InventoryValuation`` and deleted by ``store.inventory``.
+    """
+    classification_key = models.BigIntegerField(default=0)
+    is_weight = models.BooleanField()
+    products = models.IntegerField(default=0)
+    quantity = models.BigIntegerField(default=0)
+    value_usd = models.DecimalField(max_digits=24, decimal_places=7, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Inventory Movement"
+        verbose_name_plural = "Inventory Movements"
+
+    def __str__(self):
+        return f"{self.classification_key}/{'weight' if self.is_weight else 'unit'}: {self.value_usd:+}"
+
+
+def _product_deleted(sender, instance, **kwargs):
+    inventory.apply(inventory.deltas([inventory.values_of(instance)], sign=-1))
+
+
+def _classification_deleted(sender, instance, **kwargs):
+    # Its products are about to be moved to "no classification" (SET_NULL, no save signals)
+    inventory.move_classification(instance.pk)
+
+
+post_delete.connect(_product_deleted, sender=Product, dispatch_uid='product_inventory_delete')
+pre_delete.connect(_classification_deleted, sender=Classification, dispatch_uid='classification_inventory_delete')
+
+# ======================================================================
+# ======================================================================
+# ======================================================================
+
 class Settings(models.Model):
     key = models.CharField(max_length=50, unique=True)
     value = models.DecimalField(max_digits=15, decimal_places=4)
@@ -117,23 +391,21 @@ class Trader(models.Model):
         return self.name
 
 
+    @classmethod
+    def add_to_balance(cls, trader_id, delta):
+        """Atomically add ``delta`` to the cached balance of a trader (one UPDATE)."""
+        if delta:
+            cls.objects.filter(pk=trader_id).update(current_balance=F('current_balance') + delta)
+
     def update_balance(self):
         """
         Recalculates the total balance based on all related transactions.
+        The balance is kept current by ``Transaction``; this is the fallback
+        used to repair it (see the verify_trader_balances command).
         """
-        balance_qs = self.transactions.aggregate(
-            total=Sum(
-                Case(
-                    When(transaction_type=Transaction.TransactionType.PURCHASE, then=F('amount')),
-                    When(transaction_type=Transaction.TransactionType.PAYMENT, then=-F('amount')),
-                    default=0,
-                    output_field=DecimalField(max_digits=10, decimal_places=4)
-                )
-            )
-        )
-        new_balance = balance_qs['total'] or 0.00
-        self.current_balance = new_balance
-        self.save(update_fields=['current_balance'])
+        balance_qs = self.transactions.aggregate(total=Coalesce(Sum(Transaction.balance_delta()), Decimal(0)))
+        self.current_balance = balance_qs['total']
+        Trader.objects.filter(pk=self.pk).update(current_balance=self.current_balance)
 
     # def update_balance(self):
     #     """
@@ -157,6 +429,30 @@ class Trader(models.Model):
     #     self.save(update_fields=['current_balance'])
 
 
+class TransactionQuerySet(models.QuerySet):
+
+    def opening_balance(self, before):
+        """Balance of the transactions dated before ``before`` (a datetime)."""
+        return self.filter(date__lt=before).aggregate(
+            total=Coalesce(Sum(Transaction.balance_delta()), Decimal(0))
+        )['total']
+
+    def with_running_balance(self, opening=Decimal(0)):
+        """
+        Annotate ``running_balance``, the trader's balance right after each
+        transaction: a window ``Sum`` in (date, id) order over the rows of the
+        queryset, plus ``opening`` for the ones before them. Filter the queryset
+        by trader (and date range) first. Filters on newer rows (the keyset
+        pages, newest first) leave the older rows, so the sums stay right.
+        """
+        return self.annotate(
+            running_balance=Window(
+                Sum(Transaction.balance_delta()),
+                order_by=[F('date').asc(), F('id').asc()],
+            ) + Value(Decimal(opening), output_field=models.DecimalField(max_digits=10, decimal_places=4)),
+        )
+
+
 class Transaction(models.Model):
     class TransactionType(models.TextChoices):
         # PURCHASE = 'P', 'Purchase'  # Store buys from trader (increases debt/liability)
@@ -179,32 +475,213 @@ class Transaction(models.Model):
     notes = models.TextField(blank=True, verbose_name="Notes")
     date = models.DateTimeField(auto_now_add=True, verbose_name="Date")
 
+    objects = TransactionQuerySet.as_manager()
+
     class Meta:
         ordering = ['-date']
         verbose_name = "Transaction"
         verbose_name_plural = "Transactions"
+        indexes = [
+            # Trader ledger: one trader's rows in date order (pages, running balance, statements)
+            models.Index(fields=['trader', 'date', 'id'], name='store_trans_trader_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_transaction_type_display()} of {self.amount} with {self.trader.name}"
 
+    @staticmethod
+    def balance_delta(prefix=''):
+        """
+        Expression of what a transaction adds to its trader's balance: purchases
+        add their amount, payments subtract it. ``prefix`` is the path to the
+        transaction (e.g. ``'transactions__'`` from ``Trader``).
+        """
+        return Case(
+            When(**{f'{prefix}transaction_type': Transaction.TransactionType.PURCHASE}, then=F(f'{prefix}amount')),
+            When(**{f'{prefix}transaction_type': Transaction.TransactionType.PAYMENT}, then=-F(f'{prefix}amount')),
+            default=Value(Decimal(0)),
+            output_field=models.DecimalField(max_digits=10, decimal_places=4),
+        )
+
+    @classmethod
+    def signed_amount(cls, transaction_type, amount):
+        """Python counterpart of ``balance_delta`` for one transaction."""
+        if transaction_type == cls.TransactionType.PURCHASE:
+            return Decimal(amount)
+        if transaction_type == cls.TransactionType.PAYMENT:
+            return -Decimal(amount)
+        return Decimal(0)
+
     def save(self, *args, **kwargs):
         """
-        Overrides save method to update the trader's balance.
-        If it's an existing transaction being updated, we need to handle the old amount.
-        We assume this is a new transaction for simplicity, but a full app would need
-        to handle updates/deletions via signals/overrides. For a new record:
+        Saves the transaction and moves the trader's cached balance by the
+        difference with the stored row (nothing for a new one), with F()
+        updates in the same database transaction. Deletes are handled by the
+        post_delete signal below, which also covers queryset deletes.
         """
-        super().save(*args, **kwargs)  # Save the transaction first
+        with transaction.atomic():
+            old = None
+            if self.pk is not None and not self._state.adding:
+                old = Transaction.objects.select_for_update().filter(pk=self.pk).values_list(
+                    'trader_id', 'transaction_type', 'amount'
+                ).first()
+            super().save(*args, **kwargs)
 
-        # Simple logic for NEW transaction: update the associated Trader's balance
-        self.trader.update_balance()
+            new_delta = self.signed_amount(self.transaction_type, self.amount)
+            if old is None:
+                Trader.add_to_balance(self.trader_id, new_delta)
+            else:
+                old_trader_id, old_type, old_amount = old
+                old_delta = self.signed_amount(old_type, old_amount)
+                if old_trader_id == self.trader_id:
+                    Trader.add_to_balance(self.trader_id, new_delta - old_delta)
+                else:
+                    Trader.add_to_balance(old_trader_id, -old_delta)
+                    Trader.add_to_balance(self.trader_id, new_delta)
 
-    # Note: For production use, you would also need to implement delete() and update 
-    # logic to reverse the balance changes correctly.
 
+def _transaction_deleted(sender, instance, **kwargs):
+    # Sent for every row, also by QuerySet.delete() and cascades, inside the delete transaction
+    Trader.add_to_balance(instance.trader_id, -Transaction.signed_amount(instance.transaction_type, instance.amount))
+
+
+post_delete.connect(_transaction_deleted, sender=Transaction, dispatch_uid='transaction_balance_delete')
+
+
+class CashMovement(models.Model):
+    """
+    One change of the cash box (SYP, positive in, negative out). Rows are only
+    ever added, never updated; the box balance is the last ``BoxCheckpoint``
+    plus the movements after it (see ``store.cashbox``).
+    """
+    class Kind(models.TextChoices):
+        SALE = 'sale', 'بيع'
+        PAYMENT = 'payment', 'دفع لتاجر'
+        ADJUSTMENT = 'adjustment', 'تعديل يدوي'
+
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    amount = models.BigIntegerField()
+    sale = models.ForeignKey(Sale, on_delete=models.SET_NULL, null=True, blank=True, related_name='cash_movements')
+    trader_transaction = models.ForeignKey(
+        Transaction, on_delete=models.SET_NULL, null=True, blank=True, related_name='cash_movements'
+    )
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
 
-class FinancialBox(models.Model):
     class Meta:
-        verbose_name = "Financial Box"
-        verbose_name_plural = "Financial Box"  
-    current_amount = models.BigIntegerField(default=0)
\ No newline at end of file
+        ordering = ['-id']
+        verbose_name = "Cash Movement"
+        verbose_name_plural = "Cash Movements"
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.amount}"
+
+
+class BoxCheckpoint(models.Model):
+    """Cash box balance including every movement up to ``last_movement_id``."""
+    last_movement_id = models.BigIntegerField(unique=True)
+    balance = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.balance} @ {self.last_movement_id}"
+# ======================================================================
+# ======================================================================
+# ======================================================================
+
+class ReportJob(models.Model):
+    """
+    A report generated in the background by ``store.jobs``. The finished file
+    is kept in the report cache and shared by every job with the same
+    kind, date range and data version.
+    """
+    TTL = timedelta(days=30)
+
+    class Kind(models.TextChoices):
+        SALES_PDF = 'sales_pdf', 'تقرير مبيعات PDF'
+        SALES_CSV = 'sales_csv', 'تقرير مبيعات CSV'
+        PRODUCTS_XLSX = 'products_xlsx', 'تصدير المنتجات Excel'
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'بالانتظار'
+        RUNNING = 'running', 'قيد الإنشاء'
+        DONE = 'done', 'جاهز'
+        FAILED = 'failed', 'فشل'
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    data_version = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING, db_index=True)
+    file_name = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.start_date} -> {self.end_date} ({self.status})"
+
+
+class ImportJob(models.Model):
+    """
+    A product import running in the background (see ``store.jobs``). The
+    uploaded file is kept in a spool file until the import is finished;
+    every chunk of rows is committed together with the progress counters,
+    so an interrupted import resumes after ``committed_chunks``.
+    """
+    MAX_ERRORS = 1000  # Rows reported on the page, the counters keep counting
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'بالانتظار'
+        RUNNING = 'running', 'قيد الاستيراد'
+        DONE = 'done', 'تم'
+        FAILED = 'failed', 'فشل'
+
+    file_name = models.CharField(max_length=255)
+    spool_path = models.CharField(max_length=500)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING, db_index=True)
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    processed_rows = models.PositiveIntegerField(default=0)
+    failed_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    committed_chunks = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)  # [row number, message]
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Import of {self.file_name} ({self.status})"
+
+
+class PrintJob(models.Model):
+    """
+    A receipt waiting for the printer. Printed in order by the spooler thread
+    (``store.spooler``), which keeps the printer connection open, retries
+    failed jobs and gives up on receipts that waited longer than ``TTL``.
+    """
+    TTL = timedelta(minutes=10)  # An older receipt is no longer worth printing
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'بالانتظار'
+        PRINTING = 'printing', 'قيد الطباعة'
+        DONE = 'done', 'تمت الطباعة'
+        FAILED = 'failed', 'فشل'
+
+    sale = models.ForeignKey(Sale, on_delete=models.SET_NULL, null=True, blank=True, related_name='print_jobs')
+    payload = models.JSONField()  # Arguments of printer_utils.write_receipt
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    printed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The spooler polls the oldest pending jobs
+            models.Index(fields=['status', 'id'], name='store_printjob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Receipt {self.sale_id} ({self.status})"
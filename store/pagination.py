@@ -0,0 +1,94 @@
+"""
+Keyset ("seek") pagination helpers.
+
+Instead of OFFSET, each page continues after the last row of the previous
+one, using a cursor that holds that row's ordering values. With an index on
+the ordering columns every page costs the same, however deep the user
+scrolls. The ordering must end with a unique column (usually ``id``).
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """The cursor cannot be decoded or does not match the ordering (tampered or stale)."""
+
+
+def encode_cursor(values):
+    """Encode a list of ordering values into an URL-safe cursor string."""
+    def default(value):
+        if isinstance(value, (date, datetime)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+    raw = json.dumps(list(values), default=default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, length):
+    """Decode a cursor produced by ``encode_cursor``. Returns None if it is invalid."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, binascii.Error, UnicodeError):
+        return None
+    if not isinstance(values, list) or len(values) != length:
+        return None
+    return values
+
+
+def _seek_filter(ordering, values):
+    """
+    Build the WHERE clause selecting rows strictly after ``values``:
+    (a > x) OR (a = x AND b > y) OR ... with ``<`` for descending fields.
+    """
+    condition = Q()
+    for position, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        branch = Q(**{f'{name}__{lookup}': values[position]})
+        for previous_field, previous_value in zip(ordering[:position], values[:position]):
+            branch &= Q(**{previous_field.lstrip('-'): previous_value})
+        condition |= branch
+    return condition
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=50):
+    """
+    Return ``(rows, next_cursor)`` for the page after ``cursor`` (the first
+    page without one). ``next_cursor`` is None on the last page. Raises
+    ``InvalidCursor`` when a cursor is given but cannot be used, rather than
+    restarting from the first page (the caller would append duplicate rows).
+    """
+    ordering = list(ordering)
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        values = decode_cursor(cursor, len(ordering))
+        if values is None:
+            raise InvalidCursor(cursor)
+        try:
+            queryset = queryset.filter(_seek_filter(ordering, values))
+        except (ValidationError, ValueError, TypeError):
+            raise InvalidCursor(cursor)
+
+    # Fetch one extra row to know whether another page exists
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        if isinstance(last, dict):
+            next_cursor = encode_cursor(last[field.lstrip('-')] for field in ordering)
+        else:
+            next_cursor = encode_cursor(getattr(last, field.lstrip('-')) for field in ordering)
+    return rows, next_cursor
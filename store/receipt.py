@@ -0,0 +1,166 @@
+"""
+ESC/POS receipt renderer.
+
+``render_receipt`` builds the whole receipt as one ``bytes`` buffer (commands
+and text), so the printer gets it in a single write and the layout can be
+checked without a printer.
+
+By default the text is sent as Windows-1256 (code page 33 of the printer) in
+logical order, and the printer joins and orders the Arabic letters itself.
+For printers that cannot, ``RECEIPT_ARABIC_SHAPING = True`` shapes the text
+with arabic_reshaper (each letter in its joined form), puts it in visual
+(right-to-left) order with python-bidi before the columns are padded, and
+sends it as PC864, which holds the shaped letter forms one byte per glyph;
+the few forms it lacks are printed with the nearest one it has. Switch it
+on after a test print shows the letters unjoined or reversed.
+"""
+import textwrap
+import unicodedata
+
+from django.conf import settings
+
+ESC = b'\x1b'
+GS = b'\x1d'
+
+INIT = ESC + b'@'
+CODEPAGE_CP1256 = ESC + b't\x21'  # Code page 33 of the printer: Windows-1256
+CODEPAGE_PC864 = ESC + b't\x25'  # Code page 37 (Epson numbering): PC864, Arabic letter forms
+ALIGN_LEFT = ESC + b'a\x00'
+ALIGN_CENTER = ESC + b'a\x01'
+BOLD_ON = ESC + b'E\x01'
+BOLD_OFF = ESC + b'E\x00'
+SIZE_NORMAL = GS + b'!\x00'
+SIZE_DOUBLE = GS + b'!\x11'  # Double width and height
+FEED_LINES = 6
+CUT = GS + b'V\x00'
+
+LINE_WIDTH = 48  # Characters per line in normal size (80 mm paper)
+
+# Item columns, from left to right: the name is on the right for an Arabic reader
+PRICE_WIDTH = 12
+QUANTITY_WIDTH = 10
+NAME_WIDTH = LINE_WIDTH - PRICE_WIDTH - QUANTITY_WIDTH
+
+
+def _printable_forms():
+    """
+    Translation table replacing the shaped forms missing from PC864 by the
+    nearest ones it has (medial -> initial, final -> isolated...).
+    """
+    fallbacks = {'<medial>': ['<initial>', '<isolated>'], '<final>': ['<isolated>'], '<initial>': ['<isolated>']}
+    similar = {'\u0625': '\u0627', '\u0626': '\u064a', '\u0644\u0625': '\u0644\u0627'}  # إ -> ا, ئ -> ي, لإ -> لا
+
+    forms = {}
+    for code in range(0xFE70, 0xFEFD):
+        tag, *base = unicodedata.decomposition(chr(code)).split() or ['']
+        if tag.startswith('<'):
+            forms[tag, ''.join(chr(int(part, 16)) for part in base)] = chr(code)
+
+    def printable(char):
+        try:
+            char.encode('cp864')
+            return True
+        except UnicodeEncodeError:
+            return False
+
+    table = {}
+    for (tag, base), char in forms.items():
+        if printable(char):
+            continue
+        candidates = [forms.get((other, base)) for other in fallbacks.get(tag, [])]
+        candidates += [forms.get((other, similar[base])) for other in [tag, *fallbacks.get(tag, [])] if base in similar]
+        # Nothing close enough: dropped for a diacritic, '?' for a letter
+        missing = '' if unicodedata.category(base[-1]) == 'Mn' else '?'
+        table[ord(char)] = next((candidate for candidate in candidates if candidate and printable(candidate)), missing)
+    return table
+
+
+PRINTABLE_FORMS = _printable_forms()
+
+
+def _logical(text):
+    """Text as it is: the printer joins and orders the letters (Windows-1256)."""
+    return str(text)
+
+
+def _visual(text):
+    """
+    Text shaped and in display order (right-to-left runs reversed), one
+    character per printed glyph for PC864; unchanged when it has no Arabic.
+    """
+    text = str(text)
+    if text.isascii():
+        return text
+    import arabic_reshaper
+    from bidi import get_display
+
+    return get_display(arabic_reshaper.reshape(text)).translate(PRINTABLE_FORMS)
+
+
+def _encode_cp1256(text):
+    return text.encode('cp1256', errors='replace')
+
+
+def _encode_pc864(text):
+    # PC864 has the Arabic percent sign where ASCII has '%'
+    return text.replace('%', '\u066a').encode('cp864', errors='replace')
+
+
+# RECEIPT_ARABIC_SHAPING -> (code page command, text transform, encoder)
+TEXT_MODES = {
+    False: (CODEPAGE_CP1256, _logical, _encode_cp1256),
+    True: (CODEPAGE_PC864, _visual, _encode_pc864),
+}
+
+
+def _item_lines(name, quantity, price, text):
+    """Rows of one item: the name is wrapped in its column, price and quantity on the first row."""
+    name_lines = textwrap.wrap(str(name), NAME_WIDTH) or ['']
+    rows = [price.ljust(PRICE_WIDTH) + text(quantity).center(QUANTITY_WIDTH) + text(name_lines[0]).rjust(NAME_WIDTH)]
+    rows += [text(line).rjust(LINE_WIDTH) for line in name_lines[1:]]
+    return rows
+
+
+def _amount(value):
+    try:
+        return "{:,.0f}".format(float(value))
+    except (TypeError, ValueError):
+        return "0"
+
+
+def render_receipt(serial_number, cart_items, total_payable, date_str):
+    """
+    The complete receipt as ESC/POS bytes. ``cart_items`` are dicts with
+    ``product_name``, ``quantity`` (display text) and ``total_price`` (SYP).
+    """
+    codepage, text, encode = TEXT_MODES[bool(getattr(settings, 'RECEIPT_ARABIC_SHAPING', False))]
+    lines = [
+        f"Receipt No: {serial_number}",
+        "",
+        f"Date: {date_str}",
+        "-" * LINE_WIDTH,
+        text('السعر').ljust(PRICE_WIDTH) + text('الكمية').center(QUANTITY_WIDTH) + text('المادة').rjust(NAME_WIDTH),
+    ]
+    for item in cart_items:
+        lines += _item_lines(
+            item.get('product_name', 'N/A'),
+            str(item.get('quantity', 0)),
+            _amount(item.get('total_price', 0)),
+            text,
+        )
+    lines.append("-" * LINE_WIDTH)
+
+    return b''.join([
+        INIT,
+        codepage,
+        ALIGN_CENTER, SIZE_DOUBLE, BOLD_ON,
+        b"SALES RECEIPT\n",
+        b"=" * (LINE_WIDTH // 2) + b"\n",
+        ALIGN_LEFT, SIZE_NORMAL, BOLD_OFF,
+        encode("\n".join(lines) + "\n\n"),
+        SIZE_DOUBLE, BOLD_ON,
+        encode(f"{_amount(total_payable)} SYP\n"),
+        SIZE_NORMAL, BOLD_OFF,
+        b"\n" * FEED_LINES,
+        CUT,
+    ])
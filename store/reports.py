@@ -0,0 +1,150 @@
+"""
+Sales reports (PDF and CSV).
+
+The per-sale figures come from one grouped query (``Sale.objects.with_cost``)
+read with ``.iterator()``, so the rows are never all in memory. The PDF is
+drawn directly on a canvas, one page-sized table at a time. The writers are
+run in the background by ``store.jobs``, which caches the files on disk.
+"""
+import csv
+import io
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Paragraph, Table, TableStyle
+
+from .models import Sale
+
+ITERATOR_CHUNK_SIZE = 2000
+
+PAGE_WIDTH, PAGE_HEIGHT = letter
+MARGIN = 72
+# Rows per page, leaving room for the header row and a possible totals row
+FIRST_PAGE_ROWS = 28
+PAGE_ROWS = 33
+
+HEADER = ['Sale ID', 'Date', 'Price (Buy)', 'Price (Sell)', 'Profit']
+COL_WIDTHS = [90, 60, 100, 100, 100]
+
+TABLE_STYLE = [
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#1E3A8A")),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('TOPPADDING', (0, 0), (-1, 0), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 9),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor("#F8FAFC")]),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#D1D5DB")),
+]
+
+TOTALS_STYLE = [
+    ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor("#F3F4F6")),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ('BACKGROUND', (-1, -1), (-1, -1), colors.HexColor("#DCFCE7")),
+    ('TEXTCOLOR', (-1, -1), (-1, -1), colors.HexColor("#166534")),
+    ('SPAN', (0, -1), (1, -1)),
+]
+
+
+def sales_report_rows(start_date, end_date):
+    """
+    Yield ``(sale_id, date, buy_syp, sell_syp, profit_syp)`` for every sale of the
+    range, oldest first. Buy is the cost of the items when they were sold, sell the amount actually paid.
+    """
+    sales = (
+        Sale.objects.filter(date__range=(start_date, end_date))
+        .with_cost()
+        .order_by('date', 'id')
+        .values_list('id', 'date', 'total_payable_price', 'items_cost_syp')
+    )
+    for sale_id, date, payable, cost in sales.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        sell = payable or 0
+        yield sale_id, date, cost, sell, sell - cost
+
+
+def _pages(rows):
+    """Group ``rows`` into page-sized lists. Always yields at least one (possibly empty) page."""
+    page, limit = [], FIRST_PAGE_ROWS
+    yielded = False
+    for row in rows:
+        page.append(row)
+        if len(page) == limit:
+            yield page
+            yielded = True
+            page, limit = [], PAGE_ROWS
+    if page or not yielded:
+        yield page
+
+
+def _draw_table(pdf, rows, top, totals=None):
+    data = [HEADER]
+    for sale_id, date, buy, sell, profit in rows:
+        data.append([sale_id, date.strftime("%Y-%m-%d"), f"{buy:,.0f}", f"{sell:,.0f}", f"{profit:,.0f}"])
+    style = list(TABLE_STYLE)
+    if totals is not None:
+        if len(data) == 1:
+            data.append(['No Sales Found', '', '', '', ''])
+        else:
+            data.append(['', '', *(f"{value:,.0f}" for value in totals)])
+            style += TOTALS_STYLE
+
+    table = Table(data, colWidths=COL_WIDTHS)
+    table.setStyle(TableStyle(style))
+    width, height = table.wrapOn(pdf, PAGE_WIDTH - 2 * MARGIN, top - MARGIN)
+    table.drawOn(pdf, (PAGE_WIDTH - width) / 2, top - height)
+
+
+def write_sales_pdf(output, start_date, end_date):
+    """Write the PDF sales report of the date range to the binary file ``output``."""
+    pdf = canvas.Canvas(output, pagesize=letter, pageCompression=1)
+    pdf.setTitle(f"Sales Report: {start_date} to {end_date}")
+    styles = getSampleStyleSheet()
+
+    # Title and section heading on the first page
+    top = PAGE_HEIGHT - MARGIN
+    for text, style, space_after in (
+        (f"Sales Report: {start_date} to {end_date}", styles['Title'], 12),
+        ("Sales Summary", styles['h2'], 0),
+    ):
+        paragraph = Paragraph(text, style)
+        _, height = paragraph.wrapOn(pdf, PAGE_WIDTH - 2 * MARGIN, top - MARGIN)
+        paragraph.drawOn(pdf, MARGIN, top - height)
+        top -= height + style.spaceAfter + space_after
+
+    totals = [0, 0, 0]
+
+    def counted(rows):
+        for row in rows:
+            totals[0] += row[2]
+            totals[1] += row[3]
+            totals[2] += row[4]
+            yield row
+
+    # Draw each page once the next one exists: the last page also gets the totals row
+    pages = _pages(counted(sales_report_rows(start_date, end_date)))
+    page = next(pages)
+    for next_page in pages:
+        _draw_table(pdf, page, top)
+        pdf.showPage()
+        top = PAGE_HEIGHT - MARGIN
+        page = next_page
+    _draw_table(pdf, page, top, totals=totals)
+
+    pdf.showPage()
+    pdf.save()
+
+
+def write_sales_csv(output, start_date, end_date):
+    """Write the sales report of the date range as CSV (UTF-8 with BOM, for Excel) to the binary file ``output``."""
+    text = io.TextIOWrapper(output, encoding='utf-8-sig', newline='')
+    writer = csv.writer(text)
+    writer.writerow(HEADER)
+    for sale_id, date, buy, sell, profit in sales_report_rows(start_date, end_date):
+        writer.writerow([sale_id, date.isoformat(), f"{buy:.0f}", f"{sell:.0f}", f"{profit:.0f}"])
+    text.flush()
+    text.detach()
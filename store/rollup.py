@@ -0,0 +1,126 @@
+"""
+Daily sales rollup (``DailySalesRollup``).
+
+The checkout adds each sale to the rows of its day with an additive upsert
+(see upsert.py for the supported databases), and removing a sale subtracts
+it the same way, so the statistics pages read a handful of pre-aggregated
+rows per day instead of every sale item.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+
+from . import upsert
+from .models import DailySalesRollup, SaleItem
+
+AMOUNT_QUANTUM = Decimal('0.0001')
+AMOUNT_COLUMNS = ['income_usd', 'income_syp', 'cost_usd', 'cost_syp', 'payable_syp']
+BATCH_SIZE = 1000
+
+
+def sale_rows(payable_price, lines):
+    """
+    Rollup deltas of one sale, ``{product_id: [quantity, income_usd, income_syp,
+    cost_usd, cost_syp, payable_syp]}``. ``lines`` are ``(product_id, quantity,
+    income_usd, cost_usd, dollar_rate)`` tuples with weight-aware amounts.
+    The payable amount is shared between the products in proportion to their
+    income; the rounding remainder goes to the last product.
+    """
+    rows = {}
+    for product_id, quantity, income_usd, cost_usd, dollar_rate in lines:
+        row = rows.setdefault(product_id, [0, Decimal(0), Decimal(0), Decimal(0), Decimal(0), Decimal(0)])
+        row[0] += quantity
+        row[1] += income_usd
+        row[2] += income_usd * dollar_rate
+        row[3] += cost_usd
+        row[4] += cost_usd * dollar_rate
+
+    payable = Decimal(payable_price or 0)
+    total_income = sum(row[1] for row in rows.values())
+    remaining = payable
+    product_ids = sorted(rows)
+    for position, product_id in enumerate(product_ids):
+        row = rows[product_id]
+        if position == len(product_ids) - 1:
+            row[5] = remaining
+        elif total_income:
+            row[5] = (payable * row[1] / total_income).quantize(AMOUNT_QUANTUM)
+        else:
+            row[5] = (payable / len(product_ids)).quantize(AMOUNT_QUANTUM)
+        remaining -= row[5]
+    for row in rows.values():
+        for index in range(1, 5):
+            row[index] = row[index].quantize(AMOUNT_QUANTUM)
+    return rows
+
+
+def apply(day, rows, sign=1):
+    """Add (``sign=1``) or subtract (``sign=-1``) ``sale_rows`` deltas to the rollup of ``day``."""
+    if not rows:
+        return
+    upsert.add(
+        DailySalesRollup, ['day', 'product_id'], ['quantity', *AMOUNT_COLUMNS],
+        [((day, product_id), [value * sign for value in values]) for product_id, values in rows.items()],
+    )
+    if sign < 0:
+        # Drop the rows emptied by the subtraction
+        DailySalesRollup.objects.filter(day=day, product_id__in=rows, quantity__lte=0).delete()
+
+
+def _item_lines(items):
+    for item in items:
+        yield item.product_id, item.quantity, item.line_total, item.cost_at_sale, item.dollar_rate_at_sale
+
+
+def remove_sale(sale):
+    """Subtract ``sale`` from the rollup. Call before deleting it, inside the same transaction."""
+    items = SaleItem.objects.filter(sale=sale).with_line_totals()
+    apply(sale.date, sale_rows(sale.total_payable_price, _item_lines(items)), sign=-1)
+
+
+def rebuild(start_date=None, end_date=None):
+    """
+    Recompute the rollup from the sale items, for every day or for the given
+    range, in one transaction. Returns the number of rollup rows written.
+    """
+    items = SaleItem.objects.with_line_totals().select_related('sale').order_by('sale_id', 'id')
+    rollup = DailySalesRollup.objects.all()
+    if start_date:
+        items = items.filter(sale__date__gte=start_date)
+        rollup = rollup.filter(day__gte=start_date)
+    if end_date:
+        items = items.filter(sale__date__lte=end_date)
+        rollup = rollup.filter(day__lte=end_date)
+
+    totals = {}
+
+    def add_sale(sale, sale_items):
+        for product_id, values in sale_rows(sale.total_payable_price, _item_lines(sale_items)).items():
+            current = totals.setdefault((sale.date, product_id), [0, *[Decimal(0)] * len(AMOUNT_COLUMNS)])
+            for index, value in enumerate(values):
+                current[index] += value
+
+    with transaction.atomic():
+        # Items arrive grouped by sale: each group is turned into rollup deltas
+        sale, sale_items = None, []
+        for item in items.iterator(chunk_size=BATCH_SIZE):
+            if sale is not None and item.sale_id != sale.id:
+                add_sale(sale, sale_items)
+                sale_items = []
+            sale = item.sale
+            sale_items.append(item)
+        if sale is not None:
+            add_sale(sale, sale_items)
+
+        rollup.delete()
+        DailySalesRollup.objects.bulk_create(
+            [
+                DailySalesRollup(
+                    day=day, product_id=product_id, quantity=values[0],
+                    **dict(zip(AMOUNT_COLUMNS, values[1:])),
+                )
+                for (day, product_id), values in totals.items()
+            ],
+            batch_size=BATCH_SIZE,
+        )
+    return len(totals)
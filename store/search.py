@@ -0,0 +1,81 @@
+"""
+Product search.
+
+Names and descriptions are folded into ``Product.search_text`` when a
+product is saved (see ``normalize_arabic``), so searching is a plain
+``LIKE`` on one column. On PostgreSQL that column has a trigram GIN index
+(migration 0003), which serves both the ``%term%`` and ``term%`` patterns;
+on SQLite the same queries run without the index.
+"""
+import re
+
+from django.db.models import Case, IntegerField, Value, When
+
+# Harakat, superscript alef and tatweel carry no meaning for matching
+_DIACRITICS = re.compile('[\u064B-\u065F\u0670\u0640]')
+_WHITESPACE = re.compile(r'\s+')
+_FOLDS = str.maketrans({
+    '\u0623': '\u0627',  # أ -> ا
+    '\u0625': '\u0627',  # إ -> ا
+    '\u0622': '\u0627',  # آ -> ا
+    '\u0671': '\u0627',  # ٱ -> ا
+    '\u0649': '\u064A',  # ى -> ي
+    '\u0626': '\u064A',  # ئ -> ي
+    '\u0624': '\u0648',  # ؤ -> و
+    '\u0629': '\u0647',  # ة -> ه
+})
+
+SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+
+
+def normalize_arabic(text):
+    """
+    Fold a string for matching: drop diacritics and tatweel, unify the alef,
+    ya and ta-marbuta forms, lower-case latin letters and collapse spaces.
+    """
+    if not text:
+        return ''
+    text = _DIACRITICS.sub('', str(text)).translate(_FOLDS).casefold()
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def build_search_text(name, description=None):
+    """Value stored in ``Product.search_text``: the folded name, a newline, then the folded description."""
+    return f"{normalize_arabic(name)}\n{normalize_arabic(description)}"
+
+
+def filter_products(queryset, query):
+    """Keep the products whose name or description contains every word of ``query``."""
+    for term in normalize_arabic(query).split():
+        queryset = queryset.filter(search_text__contains=term)
+    return queryset
+
+
+def rank_products(queryset, query):
+    """
+    Filter ``queryset`` by ``query`` and order the matches by relevance:
+    exact name, then name prefix, then word prefix, then anywhere.
+    """
+    term = normalize_arabic(query)
+    return filter_products(queryset, term).annotate(
+        search_rank=Case(
+            When(search_text__startswith=f"{term}\n", then=Value(0)),
+            When(search_text__startswith=term, then=Value(1)),
+            When(search_text__contains=f" {term}", then=Value(2)),
+            default=Value(3),
+            output_field=IntegerField(),
+        )
+    ).order_by('search_rank', 'name')
+
+
+def search_products(query, limit=SEARCH_LIMIT, queryset=None):
+    """Return the ``limit`` best active catalog matches for ``query``."""
+    from .models import Product
+
+    if not normalize_arabic(query):
+        return []
+    if queryset is None:
+        queryset = Product.objects.catalog().filter(is_active=True)
+    limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+    return list(rank_products(queryset, query)[:limit])
@@ -0,0 +1,98 @@
+"""
+Per-process, in-memory cache of the ``Settings`` table.
+
+The whole table (a handful of rows) is loaded with one query the first time
+a value is needed and then served from memory. A save or delete of a
+``Settings`` row in this process (``settings_view`` or the admin of the
+server) drops the cache and bumps ``version()`` so the next read reloads it.
+
+Other processes (a shell, a management command, a second server) do not
+see those signals: the values are also reloaded once they are older than
+``SETTINGS_CACHE_MAX_AGE`` seconds, so a change made there shows up within
+that delay.
+"""
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+MAX_AGE = getattr(settings, 'SETTINGS_CACHE_MAX_AGE', 60)
+
+_lock = threading.Lock()
+_values = None
+_loaded_at = 0.0
+_version = 0
+
+_MISSING = object()
+
+
+def _load():
+    from .models import Settings
+    return dict(Settings.objects.values_list('key', 'value'))
+
+
+def _expired():
+    return _values is None or time.monotonic() - _loaded_at > MAX_AGE
+
+
+def all_values():
+    """Return a ``{key: value}`` dict of every setting (loaded at most once per ``MAX_AGE``)."""
+    global _values, _loaded_at
+    values = _values
+    if _expired():
+        with _lock:
+            if _expired():
+                _values = _load()
+                _loaded_at = time.monotonic()
+            values = _values
+    return values
+
+
+def get(key, default=_MISSING):
+    """
+    Return the value of the setting ``key``.
+    Raises ``Settings.DoesNotExist`` when the row is missing and no default is given.
+    """
+    try:
+        return all_values()[key]
+    except KeyError:
+        if default is not _MISSING:
+            return default
+        from .models import Settings
+        raise Settings.DoesNotExist(f"Setting '{key}' does not exist.")
+
+
+def dollar_rate():
+    """Current USD -> SYP exchange rate."""
+    return get('dollar_rate')
+
+
+def minimum():
+    """Low-stock threshold used by the product list."""
+    return get('minimum', Decimal(0))
+
+
+def version():
+    """Counter that changes every time the settings are modified in this process."""
+    return _version
+
+
+def invalidate():
+    global _values, _version
+    with _lock:
+        _values = None
+        _version += 1
+
+
+def _on_settings_changed(sender, **kwargs):
+    invalidate()
+    # Drop it again once the surrounding transaction commits, so a reader
+    # that reloaded in between does not keep the pre-commit values.
+    transaction.on_commit(invalidate)
+
+
+post_save.connect(_on_settings_changed, sender='store.Settings', dispatch_uid='settings_cache_save')
+post_delete.connect(_on_settings_changed, sender='store.Settings', dispatch_uid='settings_cache_delete')
@@ -0,0 +1,131 @@
+"""
+Receipt print spooler.
+
+``print_receipt`` only stores a ``PrintJob``; one daemon thread started with
+the server (see apps.py) prints the jobs in order, so a slow or disconnected printer
+never holds a request thread. The thread keeps the printer open between
+receipts and reopens it after an error, waiting longer after each failed
+attempt (``RECONNECT_DELAYS``). A failed job stays first in the queue and is
+retried until it has waited ``PrintJob.TTL``; only then is it marked as
+failed, so a printer out of paper for a few minutes loses no receipt.
+"""
+import logging
+import threading
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import printer_utils
+from .models import PrintJob
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 5  # Seconds between queue checks when nothing wakes the thread up
+RECONNECT_DELAYS = [1, 2, 5, 10, 30]  # Seconds, the last one repeats
+
+_wakeup = threading.Event()
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def enqueue(sale, payload):
+    """Queue a receipt for ``sale``; the spooler is woken up once the job is committed."""
+    job = PrintJob.objects.create(sale=sale, payload=payload)
+    transaction.on_commit(wake)
+    return job
+
+
+def wake():
+    """Make the spooler look at the queue now."""
+    _wakeup.set()
+
+
+def start():
+    """Start the spooler thread (once). Jobs interrupted by the last shutdown are queued again."""
+    global _thread
+    with _thread_lock:
+        if _thread is not None:
+            return
+        PrintJob.objects.filter(status=PrintJob.Status.PRINTING).update(status=PrintJob.Status.PENDING)
+        _thread = threading.Thread(target=_run, name='print-spooler', daemon=True)
+        _thread.start()
+
+
+class _Spooler:
+    def __init__(self):
+        self.printer = None
+        self.failures = 0  # Consecutive connection failures, picks the reconnect delay
+
+    def connect(self):
+        """Return the open printer, opening it if needed; None while it is unavailable."""
+        if self.printer is None:
+            try:
+                self.printer = printer_utils.open_printer()
+                self.failures = 0
+            except Exception as exc:
+                self.failures += 1
+                logger.warning("Receipt printer unavailable: %s", exc)
+        return self.printer
+
+    def disconnect(self):
+        if self.printer is not None:
+            try:
+                self.printer.close()
+            except Exception:
+                pass
+            self.printer = None
+
+    def reconnect_delay(self):
+        return RECONNECT_DELAYS[min(self.failures, len(RECONNECT_DELAYS)) - 1]
+
+    def expire_old_jobs(self):
+        PrintJob.objects.filter(
+            status=PrintJob.Status.PENDING, created_at__lt=timezone.now() - PrintJob.TTL
+        ).update(status=PrintJob.Status.FAILED, error="انتهت مهلة الطباعة")
+
+    def print_next(self):
+        """
+        Print the oldest pending job. Returns False when there is nothing to
+        print, or when the printer is unavailable (the job stays queued).
+        """
+        self.expire_old_jobs()
+        job = PrintJob.objects.filter(status=PrintJob.Status.PENDING).order_by('id').first()
+        if job is None or self.connect() is None:
+            return False
+        claimed = PrintJob.objects.filter(id=job.id, status=PrintJob.Status.PENDING).update(
+            status=PrintJob.Status.PRINTING, attempts=job.attempts + 1
+        )
+        if not claimed:
+            return True
+        try:
+            printer_utils.write_receipt(self.printer, **job.payload)
+        except Exception as exc:
+            # The handle may be dead after an error: reopened for the next attempt
+            self.disconnect()
+            self.failures += 1
+            # Queued again: expire_old_jobs gives up on it once it is older than the TTL
+            PrintJob.objects.filter(id=job.id).update(status=PrintJob.Status.PENDING, error=str(exc))
+            logger.warning("Receipt %s not printed (attempt %s): %s", job.sale_id, job.attempts + 1, exc)
+            return False
+        PrintJob.objects.filter(id=job.id).update(
+            status=PrintJob.Status.DONE, error='', printed_at=timezone.now()
+        )
+        return True
+
+
+def _run():
+    spooler = _Spooler()
+    while True:
+        try:
+            close_old_connections()
+            while spooler.print_next():
+                pass
+        except Exception:
+            logger.exception("Print spooler error")
+        finally:
+            close_old_connections()
+
+        # Back off while the printer is failing, otherwise wait for the next job
+        timeout = spooler.reconnect_delay() if spooler.failures else POLL_INTERVAL
+        _wakeup.wait(timeout)
+        _wakeup.clear()
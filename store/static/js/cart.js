@@ -26,6 +26,14 @@ function approximatePrice(amount, breakpoint = 250) {
     return payableAmount;
 }
 
+// Idempotency key of a checkout submission: a resent form carries the same
+// token, so the server returns the first sale instead of selling twice.
+function newCheckoutToken() {
+    const bytes = new Uint8Array(16);
+    window.crypto.getRandomValues(bytes);
+    return Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('');
+}
+
 document.addEventListener('DOMContentLoaded', function () {
     const productSearchInput = document.getElementById('productSearchInput');
     const productDatalist = document.getElementById('productOptions');
@@ -50,6 +58,8 @@ document.addEventListener('DOMContentLoaded', function () {
 
     const cartDataInput = document.getElementById('cartDataInput');
     const payablePriceInput = document.getElementById('payablePriceInput');//hello
+    const checkoutTokenInput = document.getElementById('checkoutTokenInput');
+    const sellButton = document.getElementById('sellButton');
 
     const cartTotalSypProfitSpan = document.getElementById('cartTotalSypProfit');
     const cartTotalProfitSpan = document.getElementById('cartTotalProfit');
@@ -312,6 +322,92 @@ function calculatePrices() {
 
 
 
+    // ===============================================
+    // Local product index (fetched once, then refreshed incrementally)
+    // ===============================================
+    const indexUrl = productSearchInput.getAttribute('data-index-url');
+    const productIndex = new Map();
+    let indexVersion = null;
+    let indexRate = null;
+    const MAX_SUGGESTIONS = 30;
+
+    // Same folding as store/search.py normalize_arabic
+    function foldArabic(text) {
+        return (text || '')
+            .replace(/[\u064B-\u065F\u0670\u0640]/g, '')
+            .replace(/[\u0623\u0625\u0622\u0671]/g, '\u0627')
+            .replace(/[\u0649\u0626]/g, '\u064A')
+            .replace(/\u0624/g, '\u0648')
+            .replace(/\u0629/g, '\u0647')
+            .toLowerCase()
+            .replace(/\s+/g, ' ')
+            .trim();
+    }
+
+    function loadProductIndex(full) {
+        const params = new URLSearchParams();
+        if (!full && indexVersion) {
+            params.set('since', indexVersion);
+            params.set('rate', indexRate);
+        }
+        return fetch(`${indexUrl}?${params.toString()}`)
+            .then(response => response.json())
+            .then(data => {
+                if (data.full) productIndex.clear();
+                data.products.forEach(row => {
+                    const product = {};
+                    data.fields.forEach((field, i) => { product[field] = row[i]; });
+                    product.key = foldArabic(product.name);
+                    if (product.is_active) {
+                        productIndex.set(product.id, product);
+                    } else {
+                        productIndex.delete(product.id);
+                    }
+                });
+                indexVersion = data.version;
+                indexRate = data.dollar_rate;
+            })
+            .catch(error => console.error('Loading the product index failed:', error));
+    }
+
+    function renderProductOptions(products) {
+        productDatalist.innerHTML = '';
+        products.forEach(product => {
+            const option = document.createElement('option');
+            option.value = product.name;
+            option.setAttribute('data-id', product.id);
+            option.setAttribute('data-qty', product.quantity);
+            option.setAttribute('data-price', product.price);
+            option.setAttribute('data-is-weight', product.is_weight ? 'True' : 'False');
+            option.setAttribute('retail-percent', product.retail_sale_percent);
+            option.setAttribute('whole-percent', product.whole_sale_percent);
+            option.setAttribute('data-syp-price', product.syp_price);
+            productDatalist.appendChild(option);
+        });
+    }
+
+    // Ranked like the search API: exact name, name prefix, word prefix, anywhere
+    function searchProducts() {
+        const query = foldArabic(productSearchInput.value);
+        if (!query || productIndex.size === 0) return;
+        const matches = [];
+        productIndex.forEach(product => {
+            let rank;
+            if (product.key === query) rank = 0;
+            else if (product.key.startsWith(query)) rank = 1;
+            else if (product.key.includes(' ' + query)) rank = 2;
+            else if (product.key.includes(query)) rank = 3;
+            else return;
+            matches.push([rank, product]);
+        });
+        matches.sort((a, b) => a[0] - b[0] || a[1].name.localeCompare(b[1].name, 'ar'));
+        renderProductOptions(matches.slice(0, MAX_SUGGESTIONS).map(match => match[1]));
+    }
+
+    loadProductIndex(true);
+    setInterval(() => loadProductIndex(false), 30 * 1000);     // pick up stock / price changes
+    setInterval(() => loadProductIndex(true), 10 * 60 * 1000); // and drop deleted products
+
     // ===============================================
     // Cart Summary and Rendering (Logic remains the same)
     // ===============================================
@@ -351,6 +447,7 @@ function calculatePrices() {
 
     window.removeFromCart = function (index) {
         cart.splice(index, 1);
+        checkoutTokenInput.value = ''; // a different cart is a new checkout
         renderCart();
     };
 
@@ -400,6 +497,7 @@ function calculatePrices() {
         }
 
         // Now clear the form and render the cart
+        checkoutTokenInput.value = ''; // a different cart is a new checkout
         clearForm();
         renderCart();
     });
@@ -413,10 +511,21 @@ function calculatePrices() {
         cartDataInput.value = JSON.stringify(cart);
         payablePriceInput.value = parseInt(cartAprTotalSypPriceSpan.textContent.replace(/,/g, ''), 10);//hello
         // payablePriceInput.value = cartAprTotalSypPriceSpan.textContent; //hello
+        // Keep the same token for every resubmission of this cart
+        if (!checkoutTokenInput.value) {
+            checkoutTokenInput.value = newCheckoutToken();
+        }
+        sellButton.disabled = true;
         this.submit();
     });
 
+    // Re-enable selling when the page comes back from the browser history
+    window.addEventListener('pageshow', function () {
+        sellButton.disabled = false;
+    });
+
     // --- Initial Event Listeners ---
+    productSearchInput.addEventListener('input', searchProducts);
     productSearchInput.addEventListener('input', calculatePrices);
     SaleTypeSelect.addEventListener('change', calculatePrices);
     profitSelect.addEventListener('change', calculatePrices);
@@ -1,3 +1,1129 @@
-from django.test import TestCase
+import csv
+import io
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    cashbox, importer, inventory, jobs, printer_utils, receipt, rollup, settings_cache, spooler, upsert, views,
+)
+from .checkout import CheckoutError, InsufficientStock, checkout, sale_receipt
+from .models import (
+    BoxCheckpoint, CashMovement, CheckoutToken, Classification, DailySalesRollup, ImportJob, InventoryMovement,
+    PrintJob, Product, ReportJob, Sale, SaleItem, Settings, Trader, Transaction,
+)
+from .pagination import InvalidCursor, keyset_page
+from .search import normalize_arabic, search_products
+
+# ======================================================================
+# ======================================================================
+# ======================================================================
+
+
+class SettingsCacheTests(TestCase):
+
+    def setUp(self):
+        Settings.objects.create(key='dollar_rate', value=15000)
+        settings_cache.invalidate()
+
+    def test_loaded_once(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(settings_cache.dollar_rate(), 15000)
+            self.assertEqual(settings_cache.minimum(), 0)
+            self.assertEqual(Product(name='pepsi', price=2).syp_price(), 30000)
+
+    def test_saves_and_deletes_drop_the_cache(self):
+        settings_cache.dollar_rate()
+        version = settings_cache.version()
+
+        Settings.objects.create(key='minimum', value=5)
+        self.assertEqual(settings_cache.minimum(), 5)
+        Settings.objects.get(key='minimum').delete()
+        self.assertEqual(settings_cache.minimum(), 0)
+        self.assertGreater(settings_cache.version(), version)
+
+    def test_changes_from_another_process_show_up_after_max_age(self):
+        settings_cache.dollar_rate()
+        # An update sends no signal, like a save made by another process
+        Settings.objects.filter(key='dollar_rate').update(value=16000)
+        self.assertEqual(settings_cache.dollar_rate(), 15000)
+
+        settings_cache._loaded_at -= settings_cache.MAX_AGE + 1
+        self.assertEqual(settings_cache.dollar_rate(), 16000)
+
+
+# ======================================================================
+# ======================================================================
+# ======================================================================
+
+
+class SearchTests(TestCase):
+
+    def test_normalize_arabic(self):
+        self.assertEqual(normalize_arabic('  أَحْمَد   إبراهيم '), 'احمد ابراهيم')
+        self.assertEqual(normalize_arabic('مـكـتـبـة مستشفى'), 'مكتبه مستشفي')
+        self.assertEqual(normalize_arabic('Pepsi COLA'), 'pepsi cola')
+        self.assertEqual(normalize_arabic(None), '')
+
+    def test_search_text_is_kept_on_save(self):
+        product = Product.objects.create(name='آيس كريم', price=1, quantity=1, description='فانيلا')
+        self.assertEqual(product.search_text, 'ايس كريم\nفانيلا')
+
+        product.name = 'أيس كريم'
+        product.save()
+        product.refresh_from_db()
+        self.assertEqual(product.search_text, 'ايس كريم\nفانيلا')
+
+    def test_ranking(self):
+        for name, description in [
+            ('شاي اخضر', ''), ('شاي', ''), ('كوب شاي', ''), ('سكر', 'يباع مع الشاي'), ('شايات', ''),
+        ]:
+            Product.objects.create(name=name, price=1, quantity=1, description=description)
+        Product.objects.create(name='شاي احمر', price=1, quantity=1, is_active=False)
+
+        names = [product.name for product in search_products('شاي')]
+
+        # Exact name, name prefixes (by name), a later word, then anywhere
+        self.assertEqual(names, ['شاي', 'شاي اخضر', 'شايات', 'كوب شاي', 'سكر'])
+
+    def test_every_word_must_match(self):
+        Product.objects.create(name='شاي اخضر', price=1, quantity=1)
+        Product.objects.create(name='شاي احمر', price=1, quantity=1)
+
+        response = self.client.get(reverse('product_search_api'), {'q': 'أخضر شاي'})
+
+        self.assertEqual([product['name'] for product in response.json()['results']], ['شاي اخضر'])
+        self.assertEqual(search_products('   '), [])
+
+
+# ======================================================================
+# ======================================================================
+# ======================================================================
+
+
+class StoreTestCase(TestCase):
+    """Products sold at a dollar rate of 15000 SYP."""
+
+    def setUp(self):
+        Settings.objects.create(key='dollar_rate', value=15000)
+        self.unit = Product.objects.create(name='pepsi', price='2', quantity=10)
+        self.weight = Product.objects.create(name='rice', price='3', quantity=5000, is_weight=True)
+
+    def cart(self, *lines):
+        return [{'productId': product.id, 'quantity': quantity, 'profitPercentage': 10} for product, quantity in lines]
+
+
+class CheckoutTests(StoreTestCase):
+
+    def test_sells_the_cart(self):
+        result = checkout(self.cart((self.unit, 3), (self.weight, 1500), (self.unit, 2)), 150000)
+
+        sale = Sale.objects.get(id=result['sale_id'])
+        self.unit.refresh_from_db()
+        self.weight.refresh_from_db()
+        self.assertEqual((self.unit.quantity, self.weight.quantity), (5, 3500))
+        # 5 x 2.2 + 1.5 Kg x 3.3
+        self.assertEqual(result['total_price'], Decimal('15.95'))
+        self.assertEqual((sale.total_items, sale.total_usd, sale.total_payable_price), (1505, Decimal('15.95'), 150000))
+        self.assertEqual(SaleItem.objects.filter(sale=sale).count(), 3)
+        self.assertEqual(CashMovement.objects.get(sale=sale).amount, 150000)
+
+    def test_insufficient_stock_rolls_everything_back(self):
+        with self.assertRaises(InsufficientStock):
+            checkout(self.cart((self.weight, 1000), (self.unit, 8), (self.unit, 3)), 1000)
+
+        self.unit.refresh_from_db()
+        self.weight.refresh_from_db()
+        self.assertEqual((self.unit.quantity, self.weight.quantity), (10, 5000))
+        self.assertFalse(Sale.objects.exists())
+        self.assertFalse(SaleItem.objects.exists())
+        self.assertFalse(CashMovement.objects.exists())
+
+    def test_malformed_cart(self):
+        for cart in ([], [{'productId': self.unit.id}], self.cart((self.unit, 0))):
+            with self.assertRaises(CheckoutError):
+                checkout(cart, 1000)
+        with self.assertRaises(CheckoutError):
+            checkout([{'productId': 0, 'quantity': 1, 'profitPercentage': 0}], 1000)
+
+    def test_missing_payable_price(self):
+        for payable_price in (None, '', 'abc'):
+            with self.assertRaises(CheckoutError):
+                checkout(self.cart((self.unit, 1)), payable_price)
+
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.quantity, 10)
+        self.assertFalse(CashMovement.objects.exists())
+
+    def test_products_locked_in_one_query(self):
+        if not connection.features.has_select_for_update:
+            self.skipTest("The database does not lock rows")
+        with CaptureQueriesContext(connection) as queries:
+            checkout(self.cart((self.weight, 1), (self.unit, 1)), 1000)
+
+        locks = [query['sql'] for query in queries if 'FOR UPDATE' in query['sql']]
+        self.assertEqual(len(locks), 1)
+        self.assertIn('ORDER BY', locks[0])
+
+
+class CheckoutTokenTests(StoreTestCase):
+
+    def test_replayed_token_sells_once(self):
+        first = checkout(self.cart((self.unit, 2)), 30000, token='abc')
+        again = checkout(self.cart((self.unit, 2)), 30000, token='abc')
+
+        self.assertFalse(first['replayed'])
+        self.assertTrue(again['replayed'])
+        self.assertEqual(again['sale_id'], first['sale_id'])
+        self.assertEqual(again['total_price'], first['total_price'])
+        self.assertEqual(Sale.objects.count(), 1)
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.quantity, 8)
+
+    def test_other_token_sells_again(self):
+        checkout(self.cart((self.unit, 2)), 30000, token='abc')
+        checkout(self.cart((self.unit, 2)), 30000, token='def')
+
+        self.assertEqual(Sale.objects.count(), 2)
+        self.assertEqual(CheckoutToken.objects.count(), 2)
+
+    def test_failed_sale_does_not_use_the_token(self):
+        with self.assertRaises(InsufficientStock):
+            checkout(self.cart((self.unit, 20)), 30000, token='abc')
+        checkout(self.cart((self.unit, 2)), 30000, token='abc')
+
+        self.assertEqual(Sale.objects.count(), 1)
+
+
+# ======================================================================
+# ======================================================================
+# ======================================================================
+
+
+class ProductIndexApiTests(StoreTestCase):
+
+    def index(self, **params):
+        return self.client.get(reverse('product_index_api'), params)
+
+    def test_full_snapshot(self):
+        Product.objects.create(name='old', price=1, quantity=1, is_active=False)
+        data = self.index().json()
+
+        self.assertTrue(data['full'])
+        self.assertEqual(Decimal(data['dollar_rate']), 15000)
+        products = [dict(zip(data['fields'], row)) for row in data['products']]
+        self.assertEqual([product['name'] for product in products], ['pepsi', 'rice'])
+        self.assertEqual(products[0]['syp_price'], 30000)
+
+    def test_delta_since_a_version(self):
+        data = self.index().json()
+        self.weight.is_active = False
+        self.weight.save()
+        Product.objects.create(name='salt', price=1, quantity=1)
+
+        delta = self.index(since=data['version'], rate=data['dollar_rate']).json()
+
+        # pepsi is unchanged, rice is sent deactivated so the client drops it
+        self.assertFalse(delta['full'])
+        self.assertEqual([(row[1], row[-1]) for row in delta['products']], [('rice', False), ('salt', True)])
+        # Another dollar rate: every price changed, a full snapshot is sent
+        self.assertTrue(self.index(since=data['version'], rate='14000').json()['full'])
+
+    def test_unchanged_catalog_is_not_modified(self):
+        first = self.index()
+
+        with self.assertNumQueries(1):
+            again = self.client.get(reverse('product_index_api'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+        self.unit.quantity = 3
+        self.unit.save()
+        self.assertEqual(
+            self.client.get(reverse('product_index_api'), HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200
+        )
+
+
+# ======================================================================
+# ======================================================================
+# ======================================================================
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        # Repeated quantities: the id breaks the ties of the quantity
+        Product.objects.bulk_create([Product(name=f'product {i:02}', price=1, quantity=i // 3) for i in range(10)])
+
+    def pages(self, queryset, ordering, page_size):
+        seen, cursor = [], None
+        while True:
+            rows, cursor = keyset_page(queryset, ordering, cursor=cursor, page_size=page_size)
+            seen.append([row.id for row in rows])
+            if cursor is None:
+                return seen
+
+    def test_pages_cover_every_row_once_in_order(self):
+        for ordering in (('quantity', 'id'), ('-quantity', '-id')):
+            expected = list(Product.objects.order_by(*ordering).values_list('id', flat=True))
+            for page_size in (1, 3, 4, 10, 11):
+                pages = self.pages(Product.objects.all(), ordering, page_size)
+                self.assertEqual(sum(pages, []), expected)
+                self.assertTrue(all(len(page) == page_size for page in pages[:-1]))
+
+    def test_exact_multiple_has_no_empty_last_page(self):
+        pages = self.pages(Product.objects.all(), ('name', 'id'), 5)
+
+        self.assertEqual([len(page) for page in pages], [5, 5])
+
+    def test_invalid_cursor(self):
+        _, cursor = keyset_page(Product.objects.all(), ('name', 'id'), page_size=3)
+        for bad in ('zzz', cursor[:-4], 'WyJ4Il0'):  # The last one decodes to ["x"]
+            with self.assertRaises(InvalidCursor):
+                keyset_page(Product.objects.all(), ('name', 'id'), cursor=bad, page_size=3)
+
+        response = self.client.get(reverse('product_list_page'), {'cursor': 'zzz'})
+        self.assertEqual(response.status_code, 400)
+
+    @mock.patch.object(views, 'PRODUCT_PAGE_SIZE', 4)
+    def test_product_list_page(self):
+        first = self.client.get(reverse('product_list_page')).json()
+        second = self.client.get(reverse('product_list_page'), {'cursor': first['next_cursor']}).json()
+        last = self.client.get(reverse('product_list_page'), {'cursor': second['next_cursor']}).json()
+
+        self.assertEqual([page['count'] for page in (first, second, last)], [4, 4, 2])
+        self.assertIsNone(last['next_cursor'])
+
+
+class SalesPageTests(TestCase):
+
+    def setUp(self):
+        # Several sales per day: the id breaks the ties of the date
+        Sale.objects.bulk_create([Sale(date=date(2025, 1, 1) + timedelta(days=i // 3)) for i in range(10)])
+
+    def walk(self, **params):
+        ids = []
+        while True:
+            page = self.client.get(reverse('list_sales_page'), params).json()
+            ids += [row['id'] for row in page['results']]
+            if page['next_cursor'] is None:
+                return ids
+            params['cursor'] = page['next_cursor']
+
+    @mock.patch.object(views, 'SALES_PAGE_SIZE', 4)
+    def test_pages_newest_first(self):
+        self.assertEqual(self.walk(), list(Sale.objects.order_by('-date', '-id').values_list('id', flat=True)))
+
+    @mock.patch.object(views, 'SALES_PAGE_SIZE', 2)
+    def test_pages_within_date_range(self):
+        ids = self.walk(start_date='2025-01-02', end_date='2025-01-03')
+
+        self.assertEqual(ids, list(
+            Sale.objects.filter(date__range=(date(2025, 1, 2), date(2025, 1, 3)))
+            .order_by('-date', '-id').values_list('id', flat=True)
+        ))
+        self.assertEqual(len(ids), 6)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('list_sales_page'), {'cursor': 'zzz'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+# ======================================================================
+# ======================================================================
+# ======================================================================
+
+
+class TraderBalanceTests(TestCase):
+
+    def setUp(self):
+        self.trader = Trader.objects.create(name='trader')
+        self.other = Trader.objects.create(name='other')
+
+    def balances(self):
+        return list(Trader.objects.order_by('id').values_list('current_balance', flat=True))
+
+    def test_saves_move_the_balance(self):
+        purchase = Transaction.objects.create(trader=self.trader, transaction_type='P', amount=100)
+        Transaction.objects.create(trader=self.trader, transaction_type='T', amount=30)
+        self.assertEqual(self.balances(), [70, 0])
+
+        purchase.amount = 150
+        purchase.save()
+        self.assertEqual(self.balances(), [120, 0])
+
+        purchase.trader = self.other
+        purchase.transaction_type = 'T'
+        purchase.save()
+        self.assertEqual(self.balances(), [-30, -150])
+
+    def test_save_without_recomputing(self):
+        Transaction.objects.create(trader=self.trader, transaction_type='P', amount=100)
+
+        with CaptureQueriesContext(connection) as queries:
+            Transaction.objects.create(trader=self.trader, transaction_type='P', amount=10)
+
+        self.assertFalse([query for query in queries if 'SUM' in query['sql'].upper()])
+
+    def test_deletes_move_the_balance(self):
+        first = Transaction.objects.create(trader=self.trader, transaction_type='P', amount=100)
+        Transaction.objects.create(trader=self.trader, transaction_type='T', amount=30)
+        Transaction.objects.create(trader=self.trader, transaction_type='P', amount=5)
+
+        first.delete()
+        self.assertEqual(self.balances(), [-25, 0])
+        Transaction.objects.filter(trader=self.trader, transaction_type='T').delete()
+        self.assertEqual(self.balances(), [5, 0])
+
+    def test_verify_trader_balances(self):
+        Transaction.objects.create(trader=self.trader, transaction_type='P', amount=100)
+        Trader.objects.filter(id=self.trader.id).update(current_balance=90)
+
+        output = io.StringIO()
+        call_command('verify_trader_balances', stdout=output)
+        self.assertIn("cached 90", output.getvalue())
+        self.assertEqual(self.balances(), [90, 0])
+
+        call_command('verify_trader_balances', '--fix', stdout=io.StringIO())
+        self.assertEqual(self.balances(), [100, 0])
+        output = io.StringIO()
+        call_command('verify_trader_balances', stdout=output)
+        self.assertIn("All trader balances match", output.getvalue())
+
+
+class TraderLedgerTests(TestCase):
+
+    def setUp(self):
+        self.trader = Trader.objects.create(name='trader')
+        amounts = [('P', 100), ('T', 30), ('P', 50), ('T', 70), ('P', 20)]
+        for day, (transaction_type, amount) in enumerate(amounts, start=1):
+            transaction = Transaction.objects.create(trader=self.trader, transaction_type=transaction_type, amount=amount)
+            # One transaction per day
+            Transaction.objects.filter(id=transaction.id).update(date=timezone.make_aware(datetime(2025, 1, day, 12)))
+
+    def test_running_balance_across_pages(self):
+        transactions = Transaction.objects.filter(trader=self.trader).with_running_balance()
+        balances, cursor = [], None
+        while True:
+            rows, cursor = keyset_page(transactions, ('-date', '-id'), cursor=cursor, page_size=2)
+            balances += [row.running_balance for row in rows]
+            if cursor is None:
+                break
+
+        self.assertEqual(balances, [70, 50, 120, 70, 100])
+        self.trader.refresh_from_db()
+        self.assertEqual(self.trader.current_balance, 70)
+
+    def test_date_range_starts_from_the_opening_balance(self):
+        response = self.client.get(
+            reverse('trader_detail', args=[self.trader.id]), {'start_date': '2025-01-02', 'end_date': '2025-01-04'}
+        )
+
+        self.assertEqual(response.context['opening_balance'], 100)
+        self.assertEqual([row.running_balance for row in response.context['transactions']], [50, 120, 70])
+
+    def test_ledger_page(self):
+        url = reverse('trader_ledger_page', args=[self.trader.id])
+        with mock.patch.object(views, 'LEDGER_PAGE_SIZE', 3):
+            first = self.client.get(url).json()
+            last = self.client.get(url, {'cursor': first['next_cursor']}).json()
+
+        self.assertEqual((first['count'], last['count'], last['next_cursor']), (3, 2, None))
+        self.assertEqual(self.client.get(url, {'cursor': 'zzz'}).status_code, 400)
+
+
+# ======================================================================
+# ======================================================================
+# ======================================================================
+
+
+class CashboxTests(TestCase):
+
+    def age(self, *movements):
+        # Older than the settle delay, so a checkpoint may cover them
+        CashMovement.objects.filter(id__in=[movement.id for movement in movements]).update(
+            created_at=timezone.now() - cashbox.CHECKPOINT_SETTLE - timedelta(minutes=1)
+        )
+
+    def test_balance_is_the_sum_of_the_movements(self):
+        cashbox.record(CashMovement.Kind.SALE, 1000)
+        cashbox.record(CashMovement.Kind.PAYMENT, -300)
+        self.assertIsNone(cashbox.record(CashMovement.Kind.ADJUSTMENT, 0))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(cashbox.balance(), (700, 2))
+
+    def test_fractions_are_rounded(self):
+        self.assertEqual(cashbox.record(CashMovement.Kind.PAYMENT, Decimal('-1500.5')).amount, -1501)
+        self.assertEqual(cashbox.record(CashMovement.Kind.SALE, Decimal('99.4999')).amount, 99)
+
+    def test_checkpoint_covers_settled_movements_only(self):
+        first = cashbox.record(CashMovement.Kind.SALE, 1000)
+        second = cashbox.record(CashMovement.Kind.SALE, 500)
+        self.age(first)
+        cashbox.record(CashMovement.Kind.PAYMENT, -200)
+
+        checkpoint = cashbox.checkpoint()
+
+        self.assertEqual((checkpoint.last_movement_id, checkpoint.balance), (first.id, 1000))
+        self.assertEqual(cashbox.balance(), (1300, 2))
+        self.age(second)
+        self.assertEqual(cashbox.checkpoint().balance, 1500)
+        self.assertEqual(cashbox.balance(), (1300, 1))
+
+    def test_checkpoint_without_settled_movements(self):
+        cashbox.record(CashMovement.Kind.SALE, 1000)
+
+        self.assertIsNone(cashbox.checkpoint())
+        self.assertFalse(BoxCheckpoint.objects.exists())
+
+
+# ======================================================================
+# ======================================================================
+# ======================================================================
+
+
+class InventoryValuationTests(StoreTestCase):
+
+    def assertBucketsMatchProducts(self):
+        quantum = Decimal('0.0001')
+        stored = {
+            key: [products, quantity, Decimal(value).quantize(quantum)]
+            for key, (products, quantity, value) in inventory.current_buckets().items() if products
+        }
+        computed = {
+            key: [products, quantity, Decimal(value).quantize(quantum)]
+            for key, (products, quantity, value) in inventory.computed_buckets().items()
+        }
+        self.assertEqual(stored, computed)
+
+    def test_every_path_keeps_the_buckets(self):
+        classification = Classification.objects.create(category='drinks')
+        self.assertBucketsMatchProducts()
+
+        self.unit.classification = classification
+        self.unit.price = Decimal('2.5')
+        self.unit.save()
+        self.assertBucketsMatchProducts()
+
+        checkout(self.cart((self.unit, 4), (self.weight, 1250)), 1000)
+        self.assertBucketsMatchProducts()
+
+        import_csv("name,price,quantity\nrice,4,2\nsalt,1,7\n")
+        self.assertBucketsMatchProducts()
+
+        self.weight.refresh_from_db()
+        self.weight.is_active = False
+        self.weight.save()
+        Product.objects.get(name='salt').delete()
+        classification.delete()
+        self.assertBucketsMatchProducts()
+
+    def test_checkout_appends_movements(self):
+        checkout(self.cart((self.unit, 4)), 1000)
+
+        movement = InventoryMovement.objects.order_by('-id').first()
+        self.assertEqual((movement.products, movement.quantity, movement.value_usd), (0, -4, Decimal(-8)))
+
+    def test_fold(self):
+        checkout(self.cart((self.unit, 4), (self.weight, 1000)), 1000)
+        before = inventory.current_buckets()
+        pending = InventoryMovement.objects.count()
+
+        self.assertEqual(inventory.fold(), pending)
+        self.assertFalse(InventoryMovement.objects.exists())
+        self.assertEqual(inventory.current_buckets(), before)
+        self.assertBucketsMatchProducts()
+
+    def test_fold_without_on_conflict(self):
+        classification = Classification.objects.create(category='drinks')
+        self.unit.classification = classification
+        self.unit.save()
+        checkout(self.cart((self.unit, 4), (self.weight, 1000)), 1000)
+
+        with mock.patch.object(upsert, 'ON_CONFLICT_VENDORS', set()):
+            inventory.fold()
+            checkout(self.cart((self.unit, 1)), 1000)
+            inventory.fold()
+            self.assertBucketsMatchProducts()
+            classification.delete()
+        self.assertBucketsMatchProducts()
+
+    def test_reading_does_not_fold(self):
+        checkout(self.cart((self.unit, 4)), 1000)
+        pending = InventoryMovement.objects.count()
+
+        with mock.patch.object(inventory, 'FOLD_EVERY', 1), CaptureQueriesContext(connection) as queries:
+            inventory.current_buckets()
+
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(InventoryMovement.objects.count(), pending)
+
+    def test_fold_is_queued_every_fold_every_movements(self):
+        with mock.patch.object(inventory, 'FOLD_EVERY', 1), mock.patch('store.jobs.request_fold') as request_fold:
+            checkout(self.cart((self.unit, 4)), 1000)
+
+        request_fold.assert_called_once()
+
+    def test_recompute_keeps_movements_appended_meanwhile(self):
+        checkout(self.cart((self.unit, 4)), 1000)
+        computed_buckets = inventory._computed_buckets
+
+        def sale_during_recompute():
+            buckets = computed_buckets()
+            # A sale committed after the products were read: its movement is not counted yet
+            checkout(self.cart((self.weight, 500)), 1000)
+            return buckets
+
+        with mock.patch.object(inventory, '_computed_buckets', sale_during_recompute):
+            inventory.recompute()
+
+        self.assertEqual(InventoryMovement.objects.count(), 1)
+        self.assertBucketsMatchProducts()
+
+
+# ======================================================================
+# ======================================================================
+# ======================================================================
+
+
+class RestockTests(StoreTestCase):
+
+    def row(self, name, quantity, price=1):
+        return {'name': name, 'price': Decimal(price), 'quantity': quantity, 'description': 'جديد'}
+
+    def test_restock_in_a_few_queries(self):
+        rows = [self.row('PEPSI', 5), self.row('سكر', 3), self.row('pepsi', 2), self.row('سكر', 4), self.row('rice', 0)]
+
+        with self.assertNumQueries(6):  # Savepoint, lock, update, insert, movements, release
+            views._restock_products(rows)
+
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.quantity, 17)
+        sugar = Product.objects.get(name='سكر')
+        self.assertEqual((sugar.quantity, sugar.search_text), (7, 'سكر\nجديد'))
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertGreater(self.unit.updated_at, self.weight.updated_at)
+
+    def test_restock_keeps_the_inventory_valuation(self):
+        views._restock_products([self.row('Rice', 1000), self.row('salt', 3)])
+
+        self.assertEqual(
+            {key: bucket[:2] for key, bucket in inventory.current_buckets().items()},
+            {key: bucket[:2] for key, bucket in inventory.computed_buckets().items()},
+        )
+
+
+# ======================================================================
+# ======================================================================
+# ======================================================================
+
+
+class ReceiptSnapshotTests(StoreTestCase):
+
+    def test_receipt_is_fixed_at_the_sale(self):
+        sale = Sale.objects.get(id=checkout(self.cart((self.weight, 1500), (self.unit, 2)), 100000)['sale_id'])
+        Product.objects.filter(id=self.unit.id).update(name='pepsi 2L')
+
+        snapshot = sale_receipt(sale)
+        self.assertEqual(snapshot['total_payable'], 100000)
+        self.assertEqual(
+            [(item['product_name'], item['quantity'], item['total_price']) for item in snapshot['cart_items']],
+            [('rice', '1.50 كغ', '74250.00'), ('pepsi', '2', '66000.00')],
+        )
+
+    def test_older_sale_is_rebuilt_from_its_items(self):
+        sale = Sale.objects.get(id=checkout(self.cart((self.unit, 2)), 66000)['sale_id'])
+        Sale.objects.filter(id=sale.id).update(receipt=None)
+        sale.refresh_from_db()
+
+        self.assertEqual(sale_receipt(sale)['cart_items'][0]['total_price'], '66000.00')
+
+    def test_print_queues_the_snapshot(self):
+        sale_id = checkout(self.cart((self.unit, 2)), 66000)['sale_id']
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('print_receipt', args=[sale_id]))
+
+        self.assertEqual(response.status_code, 302)
+        job = PrintJob.objects.get()
+        self.assertEqual(job.payload['serial_number'], sale_id)
+        self.assertEqual(job.payload['cart_items'], Sale.objects.get(id=sale_id).receipt['cart_items'])
+
+
+# ======================================================================
+# ======================================================================
+# ======================================================================
+
+
+class PrintSpoolerTests(TestCase):
+
+    def setUp(self):
+        self.spooler = spooler._Spooler()
+        self.printer = mock.Mock()
+        for patcher in (
+            mock.patch.object(printer_utils, 'open_printer', return_value=self.printer),
+            mock.patch.object(printer_utils, 'write_receipt'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def enqueue(self, serial_number):
+        return spooler.enqueue(None, {
+            'serial_number': serial_number, 'cart_items': [], 'total_payable': 1000, 'date_str': '2026-10-18',
+        })
+
+    def test_jobs_printed_in_order_on_one_connection(self):
+        self.enqueue(1)
+        self.enqueue(2)
+
+        while self.spooler.print_next():
+            pass
+
+        self.assertEqual(printer_utils.open_printer.call_count, 1)
+        self.assertEqual([call.kwargs['serial_number'] for call in printer_utils.write_receipt.call_args_list], [1, 2])
+        self.assertEqual(PrintJob.objects.filter(status=PrintJob.Status.DONE).count(), 2)
+
+    def test_failed_job_is_retried_until_it_prints(self):
+        job = self.enqueue(1)
+        printer_utils.write_receipt.side_effect = [OSError("out of paper"), None]
+
+        with self.assertLogs('store.spooler', 'WARNING'):
+            self.assertFalse(self.spooler.print_next())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error), (PrintJob.Status.PENDING, 1, "out of paper"))
+        self.printer.close.assert_called_once()
+
+        self.assertTrue(self.spooler.print_next())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error), (PrintJob.Status.DONE, 2, ''))
+        self.assertEqual(printer_utils.open_printer.call_count, 2)
+
+    def test_job_expires_after_the_ttl(self):
+        job = self.enqueue(1)
+        printer_utils.open_printer.side_effect = OSError("no printer")
+
+        with self.assertLogs('store.spooler', 'WARNING'):
+            self.assertFalse(self.spooler.print_next())
+        self.assertEqual(self.spooler.reconnect_delay(), spooler.RECONNECT_DELAYS[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, PrintJob.Status.PENDING)
+
+        PrintJob.objects.filter(id=job.id).update(created_at=timezone.now() - PrintJob.TTL - timedelta(seconds=1))
+        self.assertFalse(self.spooler.print_next())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (PrintJob.Status.FAILED, "انتهت مهلة الطباعة"))
+        self.assertEqual(printer_utils.write_receipt.call_count, 0)
+
+
+# ======================================================================
+# ======================================================================
+# ======================================================================
+
+
+class SaleTotalsTests(StoreTestCase):
+
+    def totals(self, sale):
+        return [sale.total_items, sale.total_usd, sale.total_syp, sale.total_cost_syp]
+
+    def test_checkout_stores_the_totals(self):
+        sale = Sale.objects.get(id=checkout(self.cart((self.unit, 3), (self.weight, 1500)), 100000)['sale_id'])
+
+        # 3 x 2.2 + 1.5 Kg x 3.3, at 15000 SYP; cost 3 x 2 + 1.5 Kg x 3
+        self.assertEqual(self.totals(sale), [1503, Decimal('11.55'), 173250, 157500])
+        sales_data = self.client.get(reverse('list_sales')).context['sales_data']
+        self.assertEqual((sales_data[0]['total_items'], sales_data[0]['total_price']), (1503, Decimal('11.55')))
+
+    def test_backfill(self):
+        sale_id = checkout(self.cart((self.unit, 3), (self.weight, 1500)), 100000)['sale_id']
+        expected = self.totals(Sale.objects.get(id=sale_id))
+        Sale.objects.filter(id=sale_id).update(total_items=None, total_usd=None, total_syp=None, total_cost_syp=None)
+
+        output = io.StringIO()
+        call_command('backfill_sale_totals', '--verify', stdout=output)
+        self.assertIn("1 with wrong totals", output.getvalue())
+
+        call_command('backfill_sale_totals', stdout=io.StringIO())
+        self.assertEqual(self.totals(Sale.objects.get(id=sale_id)), expected)
+        output = io.StringIO()
+        call_command('backfill_sale_totals', '--verify', stdout=output)
+        self.assertIn("0 with wrong totals", output.getvalue())
+
+    def test_totals_computed_in_sql(self):
+        sale_id = checkout(self.cart((self.unit, 3), (self.weight, 1500)), 100000)['sale_id']
+
+        sale = Sale.objects.with_totals().get(id=sale_id)
+        self.assertEqual(
+            [sale.items_count, sale.items_total_usd, sale.items_total_syp, sale.items_cost_syp],
+            self.totals(sale),
+        )
+
+    def test_sale_detail_in_two_queries(self):
+        sale_id = checkout(self.cart((self.unit, 3), (self.weight, 1500)), 100000)['sale_id']
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('sale_detail', args=[sale_id]))
+
+        self.assertEqual(response.context['all_items_price'], Decimal('11.55'))
+        self.assertEqual(response.context['all_items_price_syp'], 173250)
+        self.assertEqual(
+            [item['total_price'] for item in response.context['sale_items']], [Decimal('6.6'), Decimal('4.95')]
+        )
+
+
+# ======================================================================
+# ======================================================================
+# ======================================================================
+
+
+class SalesRollupTests(StoreTestCase):
+
+    def rollup(self):
+        return {
+            row.product_id: (row.quantity, row.income_usd, row.cost_usd, row.payable_syp)
+            for row in DailySalesRollup.objects.filter(day=timezone.localdate())
+        }
+
+    def sell_and_remove(self):
+        checkout(self.cart((self.unit, 3), (self.weight, 1500)), 100000)
+        second = checkout(self.cart((self.unit, 2)), 30000)['sale_id']
+        checkout(self.cart((self.unit, 1)), 16000)
+        self.assertEqual(self.rollup(), {
+            self.unit.id: (6, Decimal('13.2'), Decimal('12'), Decimal('103142.8571')),
+            self.weight.id: (1500, Decimal('4.95'), Decimal('4.5'), Decimal('42857.1429')),
+        })
+
+        self.client.get(reverse('remove_sale', args=[second]))
+        self.assertEqual(self.rollup()[self.unit.id][:3], (4, Decimal('8.8'), Decimal('8')))
+
+    def test_sales_are_added_and_removed(self):
+        self.sell_and_remove()
+
+        before = self.rollup()
+        self.assertEqual(rollup.rebuild(), 2)
+        self.assertEqual(self.rollup(), before)
+
+    def test_without_on_conflict(self):
+        with mock.patch.object(upsert, 'ON_CONFLICT_VENDORS', set()):
+            self.sell_and_remove()
+
+    def test_emptied_rows_are_dropped(self):
+        sale_id = checkout(self.cart((self.unit, 3)), 50000)['sale_id']
+        self.client.get(reverse('remove_sale', args=[sale_id]))
+
+        self.assertFalse(DailySalesRollup.objects.exists())
+
+
+class CostAtSaleTests(StoreTestCase):
+
+    def test_cost_is_fixed_at_the_sale(self):
+        sale_id = checkout(self.cart((self.unit, 3), (self.weight, 1500)), 100000)['sale_id']
+        Product.objects.update(price=10)
+
+        # 3 x 2 + 1.5 Kg x 3
+        self.assertEqual(
+            sorted(SaleItem.objects.filter(sale_id=sale_id).values_list('cost_at_sale', flat=True)),
+            [Decimal('4.5'), Decimal('6')],
+        )
+        today = timezone.localdate().isoformat()
+        response = self.client.get(reverse('sales_statistics'), {'start_date': today, 'end_date': today})
+        self.assertEqual(response.context['total_revenue'], Decimal('1.05'))
+        rollup.rebuild()
+        response = self.client.get(reverse('sales_statistics'), {'start_date': today, 'end_date': today})
+        self.assertEqual(response.context['total_revenue'], Decimal('1.05'))
+
+    def test_cost_needs_no_product_join(self):
+        queryset = Sale.objects.with_cost()
+
+        self.assertNotIn(Product._meta.db_table, str(queryset.query))
+
+    def test_items_saved_without_a_cost(self):
+        self.weight.refresh_from_db()
+        item = SaleItem.objects.create(sale=Sale.objects.create(), product=self.weight, quantity=500, price_at_sale=3)
+
+        self.assertEqual((item.cost_at_sale, item.dollar_rate_at_sale), (Decimal('1.5'), 15000))
+
+
+# ======================================================================
+# ======================================================================
+# ======================================================================
+
+
+class JobTestCase(StoreTestCase):
+    """Jobs run in the test thread, with their files in a temporary directory."""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        for patcher in (
+            mock.patch.object(jobs, 'REPORT_CACHE_DIR', self.directory / 'reports'),
+            mock.patch.object(jobs, 'IMPORT_SPOOL_DIR', self.directory / 'spool'),
+            # The test case's connection must stay open
+            mock.patch.object(jobs, 'close_old_connections'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class ReportJobTests(JobTestCase):
+
+    def request(self):
+        today = timezone.localdate()
+        with self.captureOnCommitCallbacks() as callbacks:
+            job = jobs.request_report(ReportJob.Kind.SALES_CSV, today, today)
+        return job, callbacks
+
+    def test_report_is_generated_then_served_from_the_cache(self):
+        checkout(self.cart((self.unit, 2)), 30000)
+        job, callbacks = self.request()
+        self.assertEqual((job.status, len(callbacks)), (ReportJob.Status.PENDING, 1))
+
+        jobs.run_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.Status.DONE)
+        self.assertTrue(jobs.report_path(job).exists())
+
+        again, callbacks = self.request()
+        self.assertEqual((again.id, again.status, callbacks), (job.id, ReportJob.Status.DONE, []))
+        response = self.client.get(reverse('report_job_download', args=[job.id]))
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+    def test_pending_job_is_reused(self):
+        job, _ = self.request()
+        again, callbacks = self.request()
+
+        self.assertEqual((again.id, callbacks), (job.id, []))
+
+    def test_new_sale_makes_a_new_report(self):
+        job, _ = self.request()
+        jobs.run_job(job.id)
+        checkout(self.cart((self.unit, 2)), 30000)
+
+        again, callbacks = self.request()
+
+        self.assertNotEqual(again.id, job.id)
+        self.assertEqual((again.status, len(callbacks)), (ReportJob.Status.PENDING, 1))
+        jobs.run_job(again.id)
+        # The file made from the older data is removed
+        self.assertEqual([path.name for path in jobs.REPORT_CACHE_DIR.iterdir()], [again.file_name])
+
+
+class ImportJobTests(JobTestCase):
+
+    def request(self, text):
+        with self.captureOnCommitCallbacks() as callbacks:
+            job = jobs.request_import(SimpleUploadedFile('products.csv', text.encode('utf-8')))
+        return job, callbacks
+
+    def test_import_runs_on_the_import_workers(self):
+        job, callbacks = self.request("name,price,quantity\nsalt,1,4\n")
+        with mock.patch.object(jobs, '_get_executor') as get_executor:
+            callbacks[0]()
+
+        get_executor.assert_called_once_with('import')
+        get_executor.return_value.submit.assert_called_once_with(jobs.run_import_job, job.id)
+
+    @mock.patch.object(importer, 'CHUNK_SIZE', 2)
+    def test_import_progress_by_chunk(self):
+        job, _ = self.request("name,price,quantity\nsalt,1,4\nsugar,2,x\npepsi,3,12\n")
+
+        jobs.run_import_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.Status.DONE)
+        self.assertEqual(
+            (job.total_rows, job.processed_rows, job.failed_rows, job.created_count, job.updated_count,
+             job.committed_chunks),
+            (3, 3, 1, 1, 1, 2),
+        )
+        self.assertEqual(len(job.errors), 1)
+        self.assertFalse(Path(job.spool_path).exists())
+
+    @mock.patch.object(importer, 'CHUNK_SIZE', 2)
+    def test_interrupted_import_continues_after_its_last_chunk(self):
+        job, _ = self.request("name,price,quantity\nsalt,1,4\nsugar,2,5\npepsi,3,12\n")
+        # Stopped by a restart after its first chunk
+        ImportJob.objects.filter(id=job.id).update(status=ImportJob.Status.RUNNING, committed_chunks=1)
+
+        with mock.patch.object(jobs, '_get_executor') as get_executor:
+            jobs.resume_pending()
+        get_executor.return_value.submit.assert_called_once_with(jobs.run_import_job, job.id)
+        jobs.run_import_job(job.id)
+
+        self.assertFalse(Product.objects.filter(name__in=['salt', 'sugar']).exists())
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.quantity, 12)
+
+
+# ======================================================================
+# ======================================================================
+# ======================================================================
+
+
+class ProductExportTests(JobTestCase):
+
+    def test_csv_is_streamed_in_the_import_columns(self):
+        response = self.client.get(reverse('export_products'))
+
+        self.assertTrue(response.streaming)
+        text = b''.join(response.streaming_content).decode('utf-8')
+        rows = list(csv.DictReader(io.StringIO(text.lstrip('\ufeff'))))
+        self.assertEqual([(row['name'], row['quantity'], row['syp_price']) for row in rows], [
+            ('pepsi', '10', '30000'), ('rice', '5.0', '45000'),
+        ])
+
+    def test_exported_csv_imports_back(self):
+        text = b''.join(self.client.get(reverse('export_products')).streaming_content).decode('utf-8')
+        Product.objects.update(quantity=0)
+
+        report = import_csv(text.lstrip('\ufeff'))
+
+        self.assertEqual((report.updated, report.errors), (2, []))
+        self.weight.refresh_from_db()
+        self.assertEqual(self.weight.quantity, 5000)
+
+    def test_xlsx_is_a_report_job(self):
+        with self.captureOnCommitCallbacks():
+            response = self.client.get(reverse('export_products'), {'format': 'xlsx'})
+
+        self.assertEqual(response.status_code, 202)
+        job = ReportJob.objects.get(id=response.json()['id'])
+        self.assertEqual(job.kind, ReportJob.Kind.PRODUCTS_XLSX)
+        jobs.run_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.Status.DONE)
+        self.assertTrue(jobs.report_path(job).read_bytes().startswith(b'PK'))
+
+
+# ======================================================================
+# ======================================================================
+# ======================================================================
+
+
+def import_csv(text):
+    """Import ``text`` as a CSV file the way an import job does, and return the report."""
+    report = importer.ImportReport()
+    for chunk in importer.read_chunks(io.StringIO(text), 'products.csv'):
+        importer.import_chunk(chunk, report)
+    return report
+
+
+class ImporterTests(TestCase):
+
+    def test_upsert_creates_and_updates(self):
+        Product.objects.create(name='rice', price=1, quantity=5)
+        report = import_csv("name,price,quantity,description\nrice,2.5,7,\nsugar,3,4,white\n")
+
+        self.assertEqual((report.created, report.updated, report.errors), (1, 1, []))
+        rice = Product.objects.get(name='rice')
+        self.assertEqual((rice.price, rice.quantity), (2.5, 7))
+        self.assertEqual(Product.objects.get(name='sugar').description, 'white')
+
+    def test_weight_column_converts_kg_to_grams(self):
+        report = import_csv("name,price,quantity,is_weight\nrice,2,1.25,yes\nsugar,3,4,no\nsalt,1,0.0005,yes\n")
+
+        self.assertEqual(report.errors, [(4, "quantity must be a whole number (or Kg with at most 3 decimals)")])
+        self.assertEqual(Product.objects.get(name='rice').quantity, 1250)
+        self.assertEqual(Product.objects.get(name='sugar').quantity, 4)
+
+    def test_without_weight_column_products_keep_their_type(self):
+        Product.objects.create(name='rice', price=1, quantity=0, is_weight=True)
+        Product.objects.create(name='sugar', price=1, quantity=0)
+        report = import_csv("name,price,quantity\nrice,2,2.5\nsugar,3,4\nsalt,1,1.5\n")
+
+        # rice is a weight product: Kg in the file; salt is new, so a unit product
+        self.assertEqual(report.errors, [(4, "quantity must be a whole number (unit product)")])
+        self.assertEqual((report.created, report.updated), (0, 2))
+        rice = Product.objects.get(name='rice')
+        self.assertEqual((rice.is_weight, rice.quantity), (True, 2500))
+        self.assertEqual(Product.objects.get(name='sugar').quantity, 4)
+        self.assertFalse(Product.objects.filter(name='salt').exists())
+
+
+# ======================================================================
+# ======================================================================
+# ======================================================================
+
+
+class ReceiptRenderTests(SimpleTestCase):
+
+    def render(self, items):
+        return receipt.render_receipt(12, items, 24000, '2026-10-18')
+
+    def text_lines(self, data):
+        """The lines between the header commands and the total."""
+        body = data.split(receipt.ALIGN_LEFT + receipt.SIZE_NORMAL + receipt.BOLD_OFF, 1)[1]
+        return body.split(receipt.SIZE_DOUBLE, 1)[0].split(b'\n')
+
+    def item_rows(self):
+        lines = self.text_lines(self.render([
+            {'product_name': 'سكر أبيض ناعم مع إضافات كثيرة جدا للتجربة', 'quantity': '1.5 كغ', 'total_price': '15000.00'},
+            {'product_name': 'Pepsi 10%', 'quantity': '2', 'total_price': '9000'},
+        ]))
+        return [line for line in lines if line and not line.startswith((b'Receipt', b'Date', b'-'))]
+
+    def test_one_buffer_with_commands(self):
+        data = self.render([])
+
+        self.assertTrue(data.startswith(receipt.INIT + receipt.CODEPAGE_CP1256))
+        self.assertTrue(data.endswith(b'\n' * receipt.FEED_LINES + receipt.CUT))
+        self.assertIn(b'Receipt No: 12\n\nDate: 2026-10-18\n', data)
+        self.assertIn(b'24,000 SYP\n', data)
+
+    def test_arabic_in_logical_order_by_default(self):
+        data = self.render([])
+
+        # "السعر" as typed, the printer joins the letters
+        self.assertIn('السعر'.encode('cp1256'), data)
+        self.assertNotIn(b'?', data)
+
+    def test_item_columns(self):
+        rows = self.item_rows()
+
+        # Header, the wrapped name on two rows, then the second item
+        self.assertEqual(len(rows), 4)
+        for row in rows:
+            self.assertEqual(len(row), receipt.LINE_WIDTH)
+        self.assertTrue(rows[1].startswith(b'15,000'.ljust(receipt.PRICE_WIDTH)))
+        self.assertEqual(rows[2][:receipt.LINE_WIDTH - receipt.NAME_WIDTH].strip(), b'')
+        self.assertEqual(
+            rows[3],
+            b'9,000'.ljust(receipt.PRICE_WIDTH) + b'2'.center(receipt.QUANTITY_WIDTH)
+            + b'Pepsi 10%'.rjust(receipt.NAME_WIDTH),
+        )
+
+    @override_settings(RECEIPT_ARABIC_SHAPING=True)
+    def test_shaped_arabic_in_visual_order(self):
+        data = self.render([])
+
+        self.assertTrue(data.startswith(receipt.INIT + receipt.CODEPAGE_PC864))
+        # "السعر" right to left: reh, ain (medial), seen (medial printed initial), lam (initial), alef
+        self.assertIn(b'\xd1\xec\xd3\xe4\xc7', data)
+        self.assertNotIn(b'?', data)
+
+    @override_settings(RECEIPT_ARABIC_SHAPING=True)
+    def test_shaped_item_columns(self):
+        rows = self.item_rows()
+
+        self.assertEqual(len(rows), 4)
+        for row in rows:
+            self.assertEqual(len(row), receipt.LINE_WIDTH)
+        # '%' is sent as the Arabic percent sign, which PC864 keeps at 0x25
+        self.assertEqual(
+            rows[3],
+            b'9,000'.ljust(receipt.PRICE_WIDTH) + b'2'.center(receipt.QUANTITY_WIDTH)
+            + b'Pepsi 10%'.rjust(receipt.NAME_WIDTH),
+        )
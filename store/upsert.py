@@ -0,0 +1,62 @@
+"""
+Additive upserts: add deltas to the counters of the rows found by a unique
+key, creating the rows that do not exist yet.
+
+``bulk_create(update_conflicts=True)`` cannot express this: it replaces the
+stored values instead of adding to them. So on PostgreSQL and SQLite (3.24+)
+each row is one ``INSERT ... ON CONFLICT DO UPDATE SET column = column +
+EXCLUDED.column``, which never fails on a concurrent insert. The other
+databases Django supports (MySQL, SQL Server...) update the row with ``F()``
+expressions, locking it, and create it when nothing was updated; a row
+created meanwhile by another transaction is updated instead.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+ON_CONFLICT_VENDORS = {'postgresql', 'sqlite'}
+
+
+def add(model, key_fields, value_fields, rows):
+    """
+    Add ``rows``, ``(key, values)`` tuples ordered like ``key_fields`` and
+    ``value_fields``, to the rows of ``model``. ``key_fields`` must be the
+    fields of a unique constraint.
+    """
+    # The same key order for every caller: concurrent upserts lock the rows in the same order
+    rows = sorted(rows, key=lambda row: row[0])
+    if not rows:
+        return
+    if connection.vendor in ON_CONFLICT_VENDORS:
+        _insert_on_conflict(model, key_fields, value_fields, rows)
+    else:
+        _update_or_create(model, key_fields, value_fields, rows)
+
+
+def _insert_on_conflict(model, key_fields, value_fields, rows):
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    keys = [quote(model._meta.get_field(field).column) for field in key_fields]
+    columns = [quote(model._meta.get_field(field).column) for field in value_fields]
+    updates = ', '.join(f"{column} = {table}.{column} + EXCLUDED.{column}" for column in columns)
+    sql = (
+        f"INSERT INTO {table} ({', '.join(keys + columns)}) "
+        f"VALUES ({', '.join(['%s'] * (len(keys) + len(columns)))}) "
+        f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}"
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [[*key, *values] for key, values in rows])
+
+
+def _update_or_create(model, key_fields, value_fields, rows):
+    with transaction.atomic():
+        for key, values in rows:
+            lookup = dict(zip(key_fields, key))
+            changes = {field: F(field) + value for field, value in zip(value_fields, values)}
+            if model.objects.filter(**lookup).update(**changes):
+                continue
+            try:
+                with transaction.atomic():
+                    model.objects.create(**lookup, **dict(zip(value_fields, values)))
+            except IntegrityError:
+                # Created by another transaction since the update
+                model.objects.filter(**lookup).update(**changes)
@@ -7,6 +7,9 @@ urlpatterns = [
     path('', views.product_list, name='home'),
 
     path('products', views.product_list, name='product_list'),
+    path('products/page', views.product_list_page, name='product_list_page'),
+    path('api/products/search', views.product_search_api, name='product_search_api'),
+    path('api/products/index', views.product_index_api, name='product_index_api'),
     path('add', views.add_product, name='add_product'),
     path('remove/<int:product_id>', views.remove_product, name='remove_product'),
     path('products/<int:product_id>', views.product_detail, name='product_detail'),
@@ -17,15 +20,20 @@ urlpatterns = [
 
     path('sell', views.sell_product, name='sell_product'),
     path('sales', views.list_sales, name='list_sales'),
+    path('sales/page', views.list_sales_page, name='list_sales_page'),
     path('sales/<int:sale_id>', views.sale_detail, name='sale_detail'),
     path('sales/delete/<int:sale_id>', views.remove_sale, name='remove_sale'),
     path('sales/delete-all', views.remove_all_sales, name='remove_all_sales'),
 
     path('generate_pdf', views.generate_pdf, name='generate_pdf'),
+    path('reports/<int:job_id>', views.report_job_status, name='report_job_status'),
+    path('reports/<int:job_id>/download', views.report_job_download, name='report_job_download'),
 
     path('settings', views.settings_view, name='settings'),
 
     path('import-products/', views.import_products, name='import_products'),
+    path('import-products/<int:job_id>', views.import_job_status, name='import_job_status'),
+    path('export-products/', views.export_products, name='export_products'),
     path('insert-products/', views.add_bulk_products, name='insert_products'),
 
     path('sales-statistics/', views.sales_statistics, name='sales_statistics'),
@@ -34,6 +42,7 @@ urlpatterns = [
     path('traders/', views.trader_list, name='trader_list'),
     path('traders/add/', views.add_trader, name='add_trader'),
     path('traders/<int:pk>/', views.trader_detail, name='trader_detail'),
+    path('traders/<int:pk>/ledger', views.trader_ledger_page, name='trader_ledger_page'),
     path('financial-box', views.financial_box, name='financial_box'),
     # path('retrieve-sale-item/<int:item_id>/', views.retrieve_sale_item, name='retrieve_sale_item'),
 
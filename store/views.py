@@ -1,24 +1,26 @@
 from decimal import Decimal
-from datetime import datetime
-from io import BytesIO
+from datetime import datetime, timedelta
+import hashlib
 
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse, JsonResponse
-from django.db.models import Sum, Q, F, Count
-from django.db.models.functions import TruncDay
-from django.db import IntegrityError
+from django.template.loader import render_to_string
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.db.models import Case, Sum, Q, F, Count, Max, PositiveIntegerField, When
+from django.db.models.functions import Lower
+from django.db import IntegrityError, transaction
 from django.forms import formset_factory
+from django.urls import reverse
 from django.utils import timezone
-
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.gzip import gzip_page
 
 import json
-import pandas as pd
 
-from .models import Product, Settings, Sale, SaleItem, Classification,FinancialBox,Trader,Transaction
+from .models import Product, Settings, Sale, SaleItem, Classification,CashMovement,Trader,Transaction,ReportJob,DailySalesRollup,ImportJob
+from . import cashbox, exporter, importer, inventory, jobs, rollup, settings_cache
+from .checkout import CheckoutError, InsufficientStock, checkout, sale_receipt
+from .pagination import InvalidCursor, keyset_page
+from .search import SEARCH_LIMIT, build_search_text, filter_products, normalize_arabic, search_products
 from .forms import ProductBulkAddForm, ProductForm, DateRangeForm,TraderForm, TransactionForm
 
 
@@ -35,34 +37,35 @@ def format_number_with_commas(number):
 # =======================================================================================
 # =======================================================================================
 
-def product_list(request):
+PRODUCT_PAGE_SIZE = 60
 
-    # Get search and quantity filter from the request
+
+def _filtered_products(request):
+    """
+    Apply the product list filters (search, quantity, classification and
+    alphabet letter) from the query string to the catalog queryset.
+    """
     search_query = request.GET.get('search', '')
     quantity_filter = request.GET.get('quantity', '')
     classification_filter = request.GET.get('classification', '')
-    minimum_setting = Settings.objects.filter(key='minimum').first().value
+    letter = request.GET.get('letter', '')
 
     # products = Product.objects.all()
-    products = Product.objects.filter(is_active=True)
-
-    # Fetch all classifications 
-    classifications = Classification.objects.all()
+    # catalog() joins the classification and computes prices / stock flags in SQL
+    products = Product.objects.catalog().filter(is_active=True)
 
-    # Apply search filter (filter by name or description)
+    # Apply search filter (filter by name or description, Arabic letter forms folded)
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) | Q(description__icontains=search_query)
-        )
+        products = filter_products(products, search_query)
 
     # Apply quantity filter
     if quantity_filter:
         if quantity_filter == 'low':
-            products = products.filter(quantity__lt=minimum_setting)
+            products = products.filter(is_low_stock=True)
         elif quantity_filter == 'high':
-            products = products.filter(quantity__gte=minimum_setting)
+            products = products.filter(is_low_stock=False)
         elif quantity_filter == 'none':
-            products = products.filter(quantity=0)
+            products = products.filter(is_out_of_stock=True)
 
     # Apply classification filter
     if classification_filter:
@@ -73,26 +76,148 @@ def product_list(request):
         else:
             products = products.filter(classification=classification_filter)
 
-    # Order products by name to enable grouping in the template
-    products = products.order_by('name')
+    # Apply alphabet filter (أ / إ / آ / ا are folded together by the search text)
+    if letter and letter != 'all':
+        products = products.filter(search_text__startswith=normalize_arabic(letter))
+
+    return products
+
 
-     # Fetch the setting with the key 'minimum'
-    minimum_setting = Settings.objects.filter(key='minimum').first()
+def product_list(request):
+
+    # Get search and quantity filter from the request
+    search_query = request.GET.get('search', '')
+    quantity_filter = request.GET.get('quantity', '')
+    classification_filter = request.GET.get('classification', '')
+    minimum_setting = settings_cache.minimum()
+
+    # Fetch all classifications 
+    classifications = Classification.objects.all()
+
+    # Only the first page is rendered, the rest is fetched by product_list_page while scrolling
+    products, next_cursor = keyset_page(_filtered_products(request), ('name', 'id'), page_size=PRODUCT_PAGE_SIZE)
 
     return render(
         request,
         'store/product_list.html',
         {
             'products': products,
+            'next_cursor': next_cursor,
             'classifications':classifications,
             'search_query': search_query,
             'quantity_filter': quantity_filter,
             'classification_filter':classification_filter,
-            'minimum_value': minimum_setting.value if minimum_setting else None,
+            'minimum_value': minimum_setting,
         },
     )
 
 
+def _invalid_cursor():
+    # "Load more" must not restart from the first page and append the same rows again
+    return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+
+def product_list_page(request):
+    """Return the next page of product cards (rendered HTML) as JSON for infinite scrolling."""
+    try:
+        products, next_cursor = keyset_page(
+            _filtered_products(request),
+            ('name', 'id'),
+            cursor=request.GET.get('cursor'),
+            page_size=PRODUCT_PAGE_SIZE,
+        )
+    except InvalidCursor:
+        return _invalid_cursor()
+    html = render_to_string('store/snippets/product_cards.html', {'products': products}, request=request)
+    return JsonResponse({'html': html, 'next_cursor': next_cursor, 'count': len(products)})
+
+
+def product_json(product):
+    """Compact representation of a catalog product used by the JSON endpoints."""
+    return {
+        'id': product.id,
+        'name': product.name,
+        'price': str(product.price),
+        'syp_price': product.syp_price(),
+        'quantity': product.quantity,
+        'is_weight': product.is_weight,
+        'retail_sale_percent': product.retail_sale_percent,
+        'whole_sale_percent': product.whole_sale_percent,
+    }
+
+
+def product_search_api(request):
+    """Autocomplete endpoint: the best matching active products for ``q`` (ranked)."""
+    query = request.GET.get('q', '')
+    try:
+        limit = int(request.GET.get('limit', SEARCH_LIMIT))
+    except ValueError:
+        limit = SEARCH_LIMIT
+    products = search_products(query, limit=limit)
+    return JsonResponse({'results': [product_json(product) for product in products]})
+
+
+PRODUCT_INDEX_FIELDS = [
+    'id', 'name', 'price', 'syp_price', 'quantity', 'is_weight',
+    'retail_sale_percent', 'whole_sale_percent', 'is_active',
+]
+
+
+@gzip_page
+def product_index_api(request):
+    """
+    Compact catalog snapshot for the sell screen (cart.js), one array per product.
+    Passing ``since`` (the ``version`` of a previous response) and ``rate`` returns
+    only the products changed since then, deactivated ones included so the client
+    drops them. A change of the dollar rate always answers with a full snapshot.
+    Unchanged answers cost one aggregate query and a 304 thanks to the ETag.
+    """
+    dollar_rate = settings_cache.dollar_rate()
+    state = Product.objects.aggregate(latest=Max('updated_at'), total=Count('id'))
+    version = state['latest'].isoformat() if state['latest'] else ''
+
+    etag = '"%s"' % hashlib.md5(
+        f"{version}|{state['total']}|{dollar_rate}|{request.GET.urlencode()}".encode('utf-8')
+    ).hexdigest()
+    # GZip turns the ETag into a weak one, compare without the W/ prefix
+    if request.headers.get('If-None-Match', '').replace('W/', '') == etag:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    products = Product.objects.catalog()
+    try:
+        since = parse_datetime(request.GET.get('since', ''))
+    except ValueError:
+        since = None
+    full = since is None or request.GET.get('rate') != str(dollar_rate)
+    if full:
+        products = products.filter(is_active=True)
+    else:
+        # >= rather than >: rows saved in the same instant as the last version are resent
+        products = products.filter(updated_at__gte=since)
+
+    rows = [
+        [id_, name, str(price), int(syp_price or 0), quantity, is_weight, retail, whole, is_active]
+        for id_, name, price, syp_price, quantity, is_weight, retail, whole, is_active
+        in products.order_by('name').values_list(
+            'id', 'name', 'price', 'annotated_syp_price', 'quantity', 'is_weight',
+            'retail_sale_percent', 'whole_sale_percent', 'is_active',
+        )
+    ]
+
+    response = JsonResponse({
+        'version': version,
+        'dollar_rate': str(dollar_rate),
+        'full': full,
+        'fields': PRODUCT_INDEX_FIELDS,
+        'products': rows,
+    })
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
 # =======================================================================================
 # =======================================================================================
 # =======================================================================================
@@ -315,7 +440,9 @@ def remove_product(request, product_id):
 
 def remove_sale(request, sale_id):
     sale = get_object_or_404(Sale, id=sale_id)
-    sale.delete()
+    with transaction.atomic():
+        rollup.remove_sale(sale)
+        sale.delete()
     return redirect('list_sales')
 
 
@@ -325,7 +452,9 @@ def remove_sale(request, sale_id):
 # =======================================================================================
 
 def remove_all_sales(request):
-    Sale.objects.all().delete()
+    with transaction.atomic():
+        DailySalesRollup.objects.all().delete()
+        Sale.objects.all().delete()
     return redirect('list_sales')
 
 
@@ -341,13 +470,8 @@ def sell_product(request):
     # Fetch products based on selected IDs
     if selected_ids:
         # If there are selected IDs, filter products
-        products = Product.objects.filter(id__in=selected_ids)
-    else:
-        # If no IDs are selected, fetch all products
-        # products = Product.objects.all()
-        products = Product.objects.filter(is_active=True)
-
-    dollar_rate = Settings.objects.filter(key='dollar_rate').first().value
+        products = Product.objects.catalog().filter(id__in=selected_ids)
+    # Otherwise cart.js fills the product options from product_index_api
 
     if request.method == 'POST':
         cart_data = request.POST.get('cart_data')
@@ -363,62 +487,28 @@ def sell_product(request):
 
         try:
             cart = json.loads(cart_data)  # Parse the JSON string into a Python list
-            total_price = Decimal(0)
-
-            # Create a new Sale instance
-            # sale = Sale.objects.create()
-            sale = Sale.objects.create(
-                total_payable_price=payable_price
-            )
-            serial_number=sale.id  # You can add a date or other fields if needed
-            box = FinancialBox.objects.get() 
-    
-    # Use F() expression to perform atomic update (highly recommended for concurrency)
-            box.current_amount = F('current_amount') + payable_price 
-            box.save()
-
-            for item in cart:
-                product_id = item['productId']
-                quantity = item['quantity']
-                profit_percentage = Decimal(item['profitPercentage']) / 100
-
-                product = get_object_or_404(Product, id=product_id)
-
-                # Calculate total price for this item
-                cost_price = product.price
-                selling_price = cost_price + (cost_price * profit_percentage)
-                total_price += selling_price * quantity
-
-                # Handle product quantity update
-                if product.quantity < quantity:
-                    return render(request, 'store/sell_product.html', {
-                        'error': f'لا يوجد كمية كافية من {product.name}, لديك {product.quantity} قطع متبقية في المستودع .',
-                        'products': products,
-                    })
-
-                # Update product quantity
-                product.quantity -= quantity
-                product.save()
-
-                # Create SaleItem instance
-                SaleItem.objects.create(sale=sale, product=product, quantity=quantity,price_at_sale=selling_price)
-
-            total_syp_price = total_price * dollar_rate
-
-            return render(request, 'store/sell_success.html', {
-                'cart': cart,
-                'payablePrice':payable_price,
-                'serial_number':serial_number,
-                'total_price': total_price,
-                'total_syp_price': total_syp_price
+            # Locks the products, checks the stock and writes the sale in one transaction
+            # A resubmitted checkout_token returns the original sale instead of selling twice
+            result = checkout(cart, payable_price, token=request.POST.get('checkout_token'))
+        except InsufficientStock as e:
+            return render(request, 'store/sell_product.html', {
+                'error': f'لا يوجد كمية كافية من {e.product.name}, لديك {e.product.quantity} قطع متبقية في المستودع .',
+                'products': products,
             })
-
-        except (ValueError, json.JSONDecodeError):
+        except (CheckoutError, json.JSONDecodeError):
             return render(request, 'store/sell_product.html', {
                 'error': 'Invalid input.',
                 'products': products
             })
 
+        return render(request, 'store/sell_success.html', {
+            'cart': cart,
+            'payablePrice':payable_price,
+            'serial_number':result['sale_id'],
+            'total_price': result['total_price'],
+            'total_syp_price': result['total_syp_price']
+        })
+
     return render(request, 'store/sell_product.html', {'products': products})
 
 
@@ -428,10 +518,15 @@ def sell_product(request):
 # =======================================================================================
 
 
-def list_sales(request):
-    sales_message = ""
-    current_year = datetime.now().year
-    months = [(i, f"{i:02d}") for i in range(1, 13)]  # List of tuples
+SALES_PAGE_SIZE = 50
+SALES_ORDERING = ('-date', '-id')
+
+
+def _filtered_sales(request):
+    """
+    Apply the sales history filters (sale id, date range or single date)
+    from the query string. Returns the queryset and the message shown above the table.
+    """
     sales = Sale.objects.all()
 
     # Get the date range from the request
@@ -446,64 +541,94 @@ def list_sales(request):
             sale_id_int = int(sale_id)
             sales = sales.filter(id=sale_id_int)
             if sales.exists():
-                sales_message = f'نتائج البحث عن العملية رقم {sale_id}'
-            else:
-                sales_message = f'لا توجد عملية بيع بالرقم {sale_id}'
+                return sales, f'نتائج البحث عن العملية رقم {sale_id}'
+            return sales, f'لا توجد عملية بيع بالرقم {sale_id}'
         except ValueError:
-            sales_message = 'رقم العملية غير صالح'
-            sales = Sale.objects.none()
-    
-    # If no sale_id search, apply date filters
-    elif start_date and end_date:
-        # Convert string dates to datetime objects using the correct format
-        start_date = datetime.strptime(start_date, '%Y-%m-%d')
-        end_date = datetime.strptime(end_date, '%Y-%m-%d')
+            return Sale.objects.none(), 'رقم العملية غير صالح'
 
-        # Include the end date by setting the time to the end of the day
-        end_date = end_date.replace(hour=23, minute=59, second=59)
+    # If no sale_id search, apply date filters
+    if start_date and end_date:
+        # Convert string dates to date objects using the correct format
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
 
-        sales_message = f'المبيعات من تاريخ {start_date.strftime("%d/%m/%Y")} إلى تاريخ {end_date.strftime("%d/%m/%Y")}'
-        # Filter sales within the date range
+        # Filter sales within the date range (both ends included)
         sales = sales.filter(date__range=[start_date, end_date])
-    elif single_date:
-        # Convert single date to datetime object using the correct format
-        single_date = datetime.strptime(single_date, '%Y-%m-%d')
+        return sales, f'المبيعات من تاريخ {start_date.strftime("%d/%m/%Y")} إلى تاريخ {end_date.strftime("%d/%m/%Y")}'
+
+    if single_date:
+        # Convert single date to date object using the correct format
+        single_date = datetime.strptime(single_date, '%Y-%m-%d').date()
         sales = sales.filter(date=single_date)
-        sales_message = f'المبيعات في تاريخ {single_date.strftime("%d/%m/%Y")}'
-    
-    # If no filters applied, show latest 20 sales
-    elif not start_date and not end_date and not single_date and not sale_id:
-        sales = sales.order_by('-date', '-id')[:20]
-        sales_message = 'اخر عمليات البيع'
-
-    sales_data = []
-
-    for sale in sales:
-        total_items = SaleItem.objects.filter(sale=sale).aggregate(total=Sum('quantity'))['total'] or 0
-        total_price=0
-        total_price_syp=0
-        for item in SaleItem.objects.filter(sale=sale):
-            if item.product.is_weight:
-                total_price+=item.price_at_sale * item.quantity/1000
-                total_price_syp+=item.price_at_sale * item.quantity/1000 * item.dollar_rate_at_sale
-            else:
-                total_price+=item.price_at_sale * item.quantity
-                total_price_syp+=item.price_at_sale * item.quantity * item.dollar_rate_at_sale
-        # total_price = sum(item.price_at_sale * item.quantity for item in SaleItem.objects.filter(sale=sale))
-        # total_price_syp = sum(item.price_at_sale * item.quantity * item.dollar_rate_at_sale for item in SaleItem.objects.filter(sale=sale))
-        sales_data.append({
+        return sales, f'المبيعات في تاريخ {single_date.strftime("%d/%m/%Y")}'
+
+    # If no filters applied, show the latest sales
+    return sales, 'اخر عمليات البيع'
+
+
+def _sales_data(sales):
+    # The totals are stored on Sale by the checkout, no per-sale queries needed
+    return [
+        {
             'sale': sale,
-            'total_items': total_items,
-            'total_price': total_price,
-            'total_price_syp': total_price_syp
-        })
+            'total_items': sale.total_items or 0,
+            'total_price': sale.total_usd or 0,
+            'total_price_syp': sale.total_syp or 0,
+        }
+        for sale in sales
+    ]
+
+
+def list_sales(request):
+    current_year = datetime.now().year
+    months = [(i, f"{i:02d}") for i in range(1, 13)]  # List of tuples
+    sales, sales_message = _filtered_sales(request)
+
+    # Only the first page is rendered, "load more" fetches the next ones from list_sales_page
+    sales, next_cursor = keyset_page(sales, SALES_ORDERING, page_size=SALES_PAGE_SIZE)
 
     return render(request, 'store/list_sales.html', {
         'sales_message': sales_message,
-        'sales_data': sales_data,
+        'sales_data': _sales_data(sales),
+        'next_cursor': next_cursor,
         'current_year': current_year,
         'months': months
     })
+
+
+def list_sales_page(request):
+    """
+    Return the page of sales after ``cursor`` (newest first) as JSON: the rendered
+    table rows for "load more" and the same rows as data.
+    """
+    sales, _ = _filtered_sales(request)
+    try:
+        sales, next_cursor = keyset_page(
+            sales,
+            SALES_ORDERING,
+            cursor=request.GET.get('cursor'),
+            page_size=SALES_PAGE_SIZE,
+        )
+    except InvalidCursor:
+        return _invalid_cursor()
+    sales_data = _sales_data(sales)
+    html = render_to_string('store/snippets/sales_rows.html', {'sales_data': sales_data}, request=request)
+    return JsonResponse({
+        'html': html,
+        'next_cursor': next_cursor,
+        'count': len(sales_data),
+        'results': [
+            {
+                'id': data['sale'].id,
+                'date': data['sale'].date.isoformat(),
+                'total_items': data['total_items'],
+                'total_price': str(data['total_price']),
+                'total_price_syp': str(data['total_price_syp']),
+                'total_payable_price': data['sale'].total_payable_price,
+            }
+            for data in sales_data
+        ],
+    })
 # =======================================================================================
 # =======================================================================================
 # =======================================================================================
@@ -515,39 +640,26 @@ def sale_detail(request, sale_id):
     #     sale = get_object_or_404(Sale, id=sale_id)
     # except Http404:
     #     return render(request, '404.html', status=404)  # Render your custom 404 page
-    sale_items = SaleItem.objects.filter(sale=sale)
-    
-    # Calculate all_items_price with is_weight check
-    all_items_price = 0
-    for item in sale_items:
-        if item.product.is_weight:
-            all_items_price += item.price_at_sale * item.quantity / 1000
-        else:
-            all_items_price += item.price_at_sale * item.quantity
 
-    # all_items_price = sum(item.price_at_sale * item.quantity for item in SaleItem.objects.filter(sale=sale))
+    # One query: products joined and weight-aware line totals computed in SQL
+    sale_items = SaleItem.objects.filter(sale=sale).with_line_totals()
 
     total_payable_syp=sale.total_payable_price
     # Calculate total prices for each item
     sale_item_details = []
+    all_items_price = 0
     all_items_price_syp = 0
     for item in sale_items:
-        is_weight = item.product.is_weight
-        total_price=0
-        if is_weight:
-            total_price = item.price_at_sale * item.quantity/1000
-        else:
-            total_price = item.price_at_sale * item.quantity 
-
-        all_items_price_syp += total_price * item.dollar_rate_at_sale
+        all_items_price += item.line_total
+        all_items_price_syp += item.line_total_syp
         sale_item_details.append({
             'id':item.id,
             'product': item.product,
             'quantity': item.quantity,
             'price_per_item': item.price_at_sale,  # Use the captured price
             'dollar_rate_at_sale': item.dollar_rate_at_sale,
-            'total_price': total_price,
-            'total_syp_price': total_price * item.dollar_rate_at_sale
+            'total_price': item.line_total,
+            'total_syp_price': item.line_total_syp
         })
 
     return render(request, 'store/sale_detail.html', {
@@ -630,6 +742,10 @@ def product_detail(request, product_id):
 # =======================================================================================
 
 def generate_pdf(request):
+    """
+    Queue a sales report of the posted date range (``format``: pdf or csv)
+    and return its job as JSON; the page polls ``report_job_status`` until it can download it.
+    """
     if request.method == 'POST':
         start_date_str = request.POST.get('start_date')
         end_date_str = request.POST.get('end_date')
@@ -638,137 +754,38 @@ def generate_pdf(request):
             start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
             end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
         except (TypeError, ValueError):
-            return HttpResponse("Invalid dates", status=400)
+            return JsonResponse({'error': 'Invalid dates'}, status=400)
 
-        # 1. SALES DATA PROCESSING 
-        sales_data = []
-        sales = Sale.objects.filter(date__range=(start_date, end_date)).order_by('date')
-        
-        total_sell_sum = 0
-        total_buy_sum = 0
-        total_profit_sum = 0
-        total_quantity_sum = 0
-
-        for sale in sales:
-            items = SaleItem.objects.filter(sale=sale)
-
-            total_items = items.aggregate(total=Sum('quantity'))['total'] or 0
-
-            # total_sell_price_syp = 0
-            total_sell_price_syp = sale.total_payable_price
-            total_buy_price_syp = 0
-
-            for item in items:
-                # sell_price_syp = item.price_at_sale * item.quantity * item.dollar_rate_at_sale
-                # buy_price_syp = item.product.price * item.quantity * item.dollar_rate_at_sale
-                buy_price_syp = 0
-                if item.product.is_weight:
-                    buy_price_syp = item.product.price * item.quantity/1000 * item.dollar_rate_at_sale
-                else:
-                    buy_price_syp = item.product.price * item.quantity * item.dollar_rate_at_sale
-                    
-                # total_sell_price_syp += sell_price_syp
-                total_buy_price_syp += buy_price_syp
-
-            profit = total_sell_price_syp - total_buy_price_syp
-
-            data = {
-                'sale_id': sale.id,
-                'date': sale.date.strftime("%Y-%m-%d"),
-                'total_items': total_items,
-                'total_price_sell_syp': total_sell_price_syp,
-                'total_price_buy_syp': total_buy_price_syp,
-                'total_profit': profit,
-            }
-            sales_data.append(data)
-
-            total_sell_sum += data['total_price_sell_syp']
-            total_buy_sum += data['total_price_buy_syp']
-            total_profit_sum += data['total_profit']
-            total_quantity_sum += data['total_items']
-            
-
-
-        # 4. PREPARE PDF RESPONSE (Modified)
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="Sales Report ( {start_date} to {end_date} ).pdf"'
+        kind = ReportJob.Kind.SALES_CSV if request.POST.get('format') == 'csv' else ReportJob.Kind.SALES_PDF
+        job = jobs.request_report(kind, start_date, end_date)
+        return JsonResponse(jobs.job_json(job), status=202)
+    
+    return HttpResponse("This view only accepts POST requests with date parameters.", status=405)
 
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        elements = []
-        styles = getSampleStyleSheet()
 
-        # Title
-        title_text = f"Sales Report: {start_date} to {end_date}"
-        title = Paragraph(title_text, styles['Title'])
-        elements.append(title)
-        elements.append(Spacer(1, 12))
-        
-        # Sales Table Title
-        sales_title = Paragraph("Sales Summary", styles['h2'])
-        elements.append(sales_title)
+def report_job_status(request, job_id):
+    job = get_object_or_404(ReportJob, id=job_id)
+    return JsonResponse(jobs.job_json(job))
 
-        # Sales Table Data (Table 1)
-        sales_table_data = [['Sale ID', 'Date', 'Price (Buy)', 'Price (Sell)', 'Profit']]
 
-        if not sales_data:
-            sales_table_data.append(['No Sales Found', '', '', '', '', ''])
-        else:
-            for data in sales_data:
-                sales_table_data.append([
-                    data['sale_id'],
-                    data['date'],
-                    # data['total_items'],
-                    f"{data['total_price_buy_syp']:,.0f}",
-                    f"{data['total_price_sell_syp']:,.0f}",
-                    f"{data['total_profit']:,.0f}",
-                ])
-
-            # Add totals row
-            sales_table_data.append([
-                # Paragraph("<b>Total</b>", styles['Normal']), '',
-                '',
-                '',
-                # f"{total_quantity_sum}",
-                f"{total_buy_sum:,.0f}",
-                f"{total_sell_sum:,.0f}",
-                f"{total_profit_sum:,.0f}",
-            ])
-
-        sales_table = Table(sales_table_data, colWidths=[90, 60, 100, 100, 100])
-
-        # Sales Table Styling (Unchanged)
-        sales_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#1E3A8A")),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10), # Reduced font size for better fit
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('TOPPADDING', (0, 0), (-1, 0), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 9), # Reduced font size for better fit
-            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor("#F8FAFC")]),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#D1D5DB")),
-            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor("#F3F4F6")),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('ALIGN', (0, -1), (1, -1), 'LEFT'),
-            ('BACKGROUND', (-1, -1), (-1, -1), colors.HexColor("#DCFCE7")),
-            ('TEXTCOLOR', (-1, -1), (-1, -1), colors.HexColor("#166534")),
-            ('SPAN', (0, -1), (1, -1)),
-        ]))
-        
-        elements.append(sales_table)
-        elements.append(Spacer(1, 24))
-
-        # Build the PDF
-        doc.build(elements)
-        pdf = buffer.getvalue()
-        buffer.close()
-        response.write(pdf)
-        return response
-    
-    return HttpResponse("This view only accepts POST requests with date parameters.", status=405)
+def report_job_download(request, job_id):
+    job = get_object_or_404(ReportJob, id=job_id, status=ReportJob.Status.DONE)
+    try:
+        report = open(jobs.report_path(job), 'rb')
+    except FileNotFoundError:
+        # Replaced by a newer version of the same report, the page asks for it again
+        return HttpResponse("This report is no longer available.", status=410)
+    extension = jobs.REPORTS[job.kind][1]
+    if job.kind in jobs.CATALOG_REPORTS:
+        filename = f"products_{job.start_date}.{extension}"
+    else:
+        filename = f"Sales Report ( {job.start_date} to {job.end_date} ).{extension}"
+    return FileResponse(
+        report,
+        as_attachment=True,
+        filename=filename,
+        content_type=jobs.content_type(job),
+    )
 
 
 # =======================================================================================
@@ -798,44 +815,44 @@ def import_products(request):
         excel_file = request.FILES.get('excel_file')
         
         if not excel_file:
-            context['error'] = 'الرجاء تحميل ملف Excel.'
+            context['error'] = 'الرجاء تحميل ملف Excel أو CSV.'
             return render(request, 'store/import_products.html', context)
 
-        context['file_received'] = True
-        print("File received:", excel_file.name)  # Debugging
+        # The file is spooled to disk and imported in the background, the page follows its progress
+        job = jobs.request_import(excel_file)
+        return redirect(f"{reverse('import_products')}?job={job.id}")
 
-        try:
-            # Read the Excel file
-            df = pd.read_excel(excel_file)
-
-            # Check if required columns exist
-            required_columns = ['name', 'price', 'quantity']
-            if not all(column in df.columns for column in required_columns):
-                context['error'] = f'الملف يجب أن يحتوي على الأعمدة التالية : ({" - ".join(required_columns)}) و عمود للوصف : description (اختياري)'
-                return render(request, 'store/import_products.html', context)
-
-            # Iterate over rows and create Product objects
-            for index, row in df.iterrows():
-                try:
-                    # Create a new Product object
-                    product = Product(
-                        name=row['name'],
-                        description=row.get('description', ''),
-                        price=float(row['price']),  # Ensure price is a float
-                        quantity=int(row['quantity'])  # Ensure quantity is an integer
-                    )
-                    product.save()  # Save the product to the database
-                    print(f"Product saved: {product.name}")  # Debugging
-                except Exception as e:
-                    print(f"Error processing row {index}: {e}")  # Debugging
-
-            context['success'] = True
-        except Exception as e:
-            context['error'] = f'حدث خطأ أثناء استيراد المنتجات: {str(e)}'
+    job_id = request.GET.get('job')
+    if job_id and job_id.isdigit():
+        job = ImportJob.objects.filter(id=job_id).first()
+        if job is not None:
+            context['file_received'] = True
+            context['job'] = jobs.import_job_json(job)
 
     return render(request, 'store/import_products.html', context)
 
 
+def import_job_status(request, job_id):
+    job = get_object_or_404(ImportJob, id=job_id)
+    return JsonResponse(jobs.import_job_json(job))
+
+
+def export_products(request):
+    """
+    The whole catalog in the columns of the import: CSV streamed row by row,
+    or XLSX (a zip container, it cannot be streamed) made by a report job
+    whose JSON the page polls until it can download the file.
+    """
+    if request.GET.get('format') == 'xlsx':
+        today = timezone.localdate()
+        job = jobs.request_report(ReportJob.Kind.PRODUCTS_XLSX, today, today)
+        return JsonResponse(jobs.job_json(job), status=202)
+    file_name = f"products_{timezone.localdate()}"
+    response = StreamingHttpResponse(exporter.stream_csv(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{file_name}.csv"'
+    return response
+
+
 # =======================================================================================
 # =======================================================================================
 # =======================================================================================
@@ -843,7 +860,6 @@ def import_products(request):
 
 def sales_statistics(request):
     form = DateRangeForm(request.GET or None)
-    sales = Sale.objects.none()  # Empty queryset by default
     total_income = 0
     total_revenue = 0
     total_products_sold = 0
@@ -857,44 +873,30 @@ def sales_statistics(request):
         start_date = form.cleaned_data['start_date']
         end_date = form.cleaned_data['end_date']
 
-        # Filter sales within the date range
-        # sales = Sale.objects.filter(date__range=(start_date, end_date))
-        sales = Sale.objects.filter(date__gte=start_date, date__lte=end_date)
-
-        # Calculate total income (including quantity)
-        total_income = SaleItem.objects.filter(sale__in=sales).annotate(
-            total_item_income=F('price_at_sale') * F('quantity')
-        ).aggregate(
-            total_income=Sum('total_item_income')
-        )['total_income'] or 0
-
-        # Calculate total revenue (net profit, including quantity)
-        total_revenue = SaleItem.objects.filter(sale__in=sales).annotate(
-            net_profit=(F('price_at_sale') - F('product__price')) * F('quantity')
-        ).aggregate(
-            total_revenue=Sum('net_profit')
-        )['total_revenue'] or 0
-
-        # Calculate total products sold
-        total_products_sold = SaleItem.objects.filter(sale__in=sales).aggregate(
-            total_products_sold=Sum('quantity')
-        )['total_products_sold'] or 0
+        # Everything is read from the daily rollup: a few rows per day instead of every sale item
+        days = DailySalesRollup.objects.filter(day__gte=start_date, day__lte=end_date)
+
+        totals = days.aggregate(
+            total_income=Sum('income_usd'),
+            total_revenue=Sum(F('income_usd') - F('cost_usd')),
+            total_products_sold=Sum('quantity'),
+        )
+        total_income = totals['total_income'] or 0  # Income (weight-aware, USD)
+        total_revenue = totals['total_revenue'] or 0  # Net profit against the cost at the time of sale
+        total_products_sold = totals['total_products_sold'] or 0
 
         # Find the most sold product
-        most_sold_product = SaleItem.objects.filter(sale__in=sales).values(
+        most_sold_product = days.values(
             'product__name'
         ).annotate(
             total_sold=Sum('quantity')
         ).order_by('-total_sold').first()
 
         # Prepare data for the chart
-        # sales_over_time = Sale.objects.filter(date__range=(start_date, end_date)).annotate(
-        sales_over_time = Sale.objects.filter(date__gte=start_date, date__lte=end_date).annotate(
-            day=TruncDay('date')
-        ).values('day').annotate(
-            total_income=Sum(F('saleitem__price_at_sale') * F('saleitem__quantity')),  # Multiply by quantity
-            total_products=Sum('saleitem__quantity'),
-            total_revenue=Sum((F('saleitem__price_at_sale') - F('saleitem__product__price')) * F('saleitem__quantity'))  # Multiply by quantity
+        sales_over_time = days.values('day').annotate(
+            total_income=Sum('income_usd'),
+            total_products=Sum('quantity'),
+            total_revenue=Sum(F('income_usd') - F('cost_usd')),
         ).order_by('day')
 
         for entry in sales_over_time:
@@ -923,6 +925,68 @@ def sales_statistics(request):
 # =======================================================================================
 # =======================================================================================
 
+def _restock_products(rows):
+    """
+    Add the formset rows to the stock in a few set-based queries, atomically:
+    existing products (matched by case-insensitive name) get their quantity
+    increased by one UPDATE, the others are created with one bulk INSERT.
+    Rows with the same name are merged.
+    """
+    merged = {}
+    for row in rows:
+        key = row['name'].lower()
+        if key in merged:
+            merged[key]['quantity'] += row.get('quantity') or 0
+        else:
+            merged[key] = dict(row, quantity=row.get('quantity') or 0)
+
+    with transaction.atomic():
+        # One query, served by the LOWER(name) index; the oldest product wins on a case clash.
+        # Locked in id order (like the checkout): the valuation deltas use the values read here
+        existing = {}
+        for product_id, name, *values in (
+            Product.objects.select_for_update()
+            .alias(name_lower=Lower('name'))
+            .filter(name_lower__in=list(merged))
+            .order_by('id')
+            .values_list('id', 'name', *inventory.VALUE_FIELDS)
+        ):
+            existing.setdefault(name.lower(), (product_id, values))
+
+        increments = {existing[key][0]: row['quantity'] for key, row in merged.items() if key in existing and row['quantity']}
+        if increments:
+            Product.objects.filter(id__in=increments).update(
+                quantity=Case(
+                    *[When(id=product_id, then=F('quantity') + quantity) for product_id, quantity in increments.items()],
+                    default=F('quantity'),
+                    output_field=PositiveIntegerField(),
+                ),
+                updated_at=timezone.now(),
+            )
+
+        new_products = Product.objects.bulk_create([
+            Product(
+                name=row['name'],
+                price=row['price'],
+                quantity=row['quantity'],
+                description=row.get('description'),
+                classification=row.get('classification'),
+                retail_sale_percent=row.get('retail_sale_percent'),
+                whole_sale_percent=row.get('whole_sale_percent'),
+                search_text=build_search_text(row['name'], row.get('description')),
+            )
+            for key, row in merged.items() if key not in existing
+        ])
+
+        stock_deltas = inventory.deltas([inventory.values_of(product) for product in new_products])
+        for key, row in merged.items():
+            if key in existing and row['quantity']:
+                classification_id, is_weight, is_active, price, _ = existing[key][1]
+                if is_active:
+                    inventory.add_quantity(stock_deltas, classification_id, is_weight, price, row['quantity'])
+        inventory.apply(stock_deltas)
+
+
 def add_bulk_products(request):
     
     # أضف can_delete=True
@@ -932,27 +996,14 @@ def add_bulk_products(request):
         formset = ProductFormSet(request.POST, prefix='products')
         
         if formset.is_valid():
-            for form in formset:
-                
-                # --- أضف هذا التحقق ---
-                # إذا كان المربع "DELETE" محدداً، تجاهل هذا الصف
-                if form.cleaned_data.get('DELETE'):
-                    continue  # اذهب إلى الصف التالي
-                # --- نهاية التحقق ---
-
-                # التحقق أن الصف ليس فارغاً
-                if form.has_changed() and form.cleaned_data.get('name'):
-                    
-                    product_name = form.cleaned_data.get('name')
-                    quantity_to_add = form.cleaned_data.get('quantity', 0) 
-                    
-                    try:
-                        product = Product.objects.get(name__iexact=product_name)
-                        product.quantity += quantity_to_add
-                        product.save(update_fields=['quantity'])
-                    
-                    except Product.DoesNotExist:
-                        new_product = form.save() 
+            rows = [
+                form.cleaned_data
+                for form in formset
+                # إذا كان المربع "DELETE" محدداً، تجاهل هذا الصف , و تجاهل الصفوف الفارغة
+                if not form.cleaned_data.get('DELETE') and form.has_changed() and form.cleaned_data.get('name')
+            ]
+            if rows:
+                _restock_products(rows)
 
             return redirect('product_list') 
 
@@ -989,18 +1040,76 @@ def add_trader(request):
     }
     return render(request, 'store/traders/add_trader.html', context)
 
+LEDGER_PAGE_SIZE = 50
+LEDGER_ORDERING = ('-date', '-id')
+
+
+def _trader_ledger(request, trader):
+    """
+    The trader's transactions with their running balance, limited to the
+    optional ``start_date`` / ``end_date`` (YYYY-MM-DD, both included) of the
+    query string. Returns the queryset, the opening balance and the dates.
+    """
+    transactions = Transaction.objects.filter(trader=trader)
+    opening = Decimal(0)
+    start_date = end_date = None
+    try:
+        if request.GET.get('start_date'):
+            start_date = datetime.strptime(request.GET['start_date'], '%Y-%m-%d').date()
+        if request.GET.get('end_date'):
+            end_date = datetime.strptime(request.GET['end_date'], '%Y-%m-%d').date()
+    except ValueError:
+        start_date = end_date = None
+
+    # Bounds as datetimes (not date__ lookups) so the (trader, date) index is used
+    if start_date:
+        start = timezone.make_aware(datetime.combine(start_date, datetime.min.time()))
+        opening = transactions.opening_balance(start)
+        transactions = transactions.filter(date__gte=start)
+    if end_date:
+        end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+        transactions = transactions.filter(date__lt=end)
+    return transactions.with_running_balance(opening), opening, start_date, end_date
+
+
 def trader_detail(request, pk):
-    """Displays details and all transactions for a specific trader."""
+    """Displays a trader and the first page of its ledger (newest first), for a date range if given."""
     trader = get_object_or_404(Trader, pk=pk)
-    transactions = trader.transactions.all()
-    
+    transactions, opening, start_date, end_date = _trader_ledger(request, trader)
+    transactions, next_cursor = keyset_page(transactions, LEDGER_ORDERING, page_size=LEDGER_PAGE_SIZE)
+
     context = {
         'trader': trader,
         'transactions': transactions,
+        'next_cursor': next_cursor,
+        'opening_balance': opening,
+        'start_date': start_date,
+        'end_date': end_date,
     }
     return render(request, 'store/traders/trader_detail.html', context)
 
 
+def trader_ledger_page(request, pk):
+    """Return the ledger rows after ``cursor`` as JSON for "load more"."""
+    trader = get_object_or_404(Trader, pk=pk)
+    transactions, _, _, _ = _trader_ledger(request, trader)
+    try:
+        transactions, next_cursor = keyset_page(
+            transactions,
+            LEDGER_ORDERING,
+            cursor=request.GET.get('cursor'),
+            page_size=LEDGER_PAGE_SIZE,
+        )
+    except InvalidCursor:
+        return _invalid_cursor()
+    html = render_to_string('store/snippets/ledger_rows.html', {'transactions': transactions}, request=request)
+    return JsonResponse({
+        'html': html,
+        'next_cursor': next_cursor,
+        'count': len(transactions),
+    })
+
+
 # --- Transaction Management Views ---
 
 def add_transaction(request, trader_pk):
@@ -1010,31 +1119,16 @@ def add_transaction(request, trader_pk):
     if request.method == 'POST':
         form = TransactionForm(request.POST)
         if form.is_valid():
-            transaction = form.save(commit=False)
-            transaction.trader = trader
-            transaction.save() # The save method updates the trader balance
-# ⭐️ NEW BOX UPDATE LOGIC ⭐️
-            
-            # Check if the transaction is a PAYMENT (Cash is leaving the store)
-            if transaction.transaction_type == Transaction.TransactionType.PAYMENT:
-                try:
-                    # Retrieve the single FinancialBox instance
-                    box = FinancialBox.objects.get() 
-                    
-                    # Atomically decrease the box amount by the transaction amount
-                    # Using F() is crucial to prevent race conditions.
-                    box.current_amount = F('current_amount') - transaction.amount
-                    box.save(update_fields=['current_amount'])
-                    
-                    # Optional: Check if the amount went negative (cash shortage)
-                    # For simple logic, we rely on the database, but a proper check 
-                    # should be done client-side or before saving to prevent overdrawing.
-                    
-                except FinancialBox.DoesNotExist:
-                    # Log or handle the error if the FinancialBox object is missing
-                    print("Error: FinancialBox object not found.")
-                
-            # ⭐️ END BOX UPDATE LOGIC ⭐️
+            trader_transaction = form.save(commit=False)
+            trader_transaction.trader = trader
+            with transaction.atomic():
+                trader_transaction.save()  # The save method updates the trader balance
+                # A payment takes the cash out of the box
+                if trader_transaction.transaction_type == Transaction.TransactionType.PAYMENT:
+                    cashbox.record(
+                        CashMovement.Kind.PAYMENT, -trader_transaction.amount,
+                        trader_transaction=trader_transaction, note=trader.name,
+                    )
             return redirect('trader_detail', pk=trader.pk)
     else:
         form = TransactionForm()
@@ -1051,67 +1145,13 @@ def add_transaction(request, trader_pk):
 # =======================================================================================
 
 # from django.contrib import messages
-from .printer_utils import print_receipt_usb 
+from . import spooler
 
 def print_receipt(request, serial_number):
-    # 1. Fetch the Sale
-    sale = get_object_or_404(Sale, id=serial_number)
-    # 2. Fetch the Items associated with this sale
-    sale_items = SaleItem.objects.filter(sale=sale)
-    # 3. Prepare data for the printer
-    printer_items = []
-    
-    for item in sale_items:
-        isWeight=item.product.is_weight
-        # Calculate Total SYP for each printer item : 
-        syp_unit_price = item.price_at_sale * item.dollar_rate_at_sale
-        total_syp_line=0
-        # handle weight and quantity products 
-        if isWeight:
-            total_syp_line = syp_unit_price * item.quantity/1000
-        else:
-            total_syp_line = syp_unit_price * item.quantity 
-        
-        if isWeight:
-            # Convert from grams to Kg with 2 decimal places
-            display_quantity = item.quantity / 1000
-            display_quantity_str = f"{display_quantity:.2f} كغ" 
-        else:
-            # For non-weight products, just show the quantity
-            display_quantity = item.quantity
-            display_quantity_str = str(display_quantity)
-
-        printer_items.append({
-            'product_name': item.product.name,
-            'quantity': display_quantity_str,  # Formatted quantity for display
-            'total_price': total_syp_line,
-        })
-
-    # Format the final payable price
-    payable_display = sale.total_payable_price
-    date_display = datetime.now().strftime("%Y-%m-%d %I:%M %p")
-    # print(printer_items) #Debug
-
-    # for item in printer_items:
-    #     print(item["product_name"],item["quantity"],item["total_price"])
-    
-    # 4. Trigger the Printer
-    success, msg = print_receipt_usb(
-        serial_number=serial_number,
-        cart_items=printer_items,
-        total_payable=payable_display,
-        date_str=date_display
-    )
-
-    # if success:
-    #     messages.success(request, "تمت الطباعة بنجاح")
-    # else:
-    #     messages.error(request, f"خطأ في الطباعة: {msg}")
-    
-    if success:
-        print(request, "تمت الطباعة بنجاح")
-    else:
-        print(request, f"خطأ في الطباعة: {msg}")
+    # The receipt was snapshotted by the checkout: one row to read, printed as the cashier saw it
+    sale = get_object_or_404(Sale.objects.only('id', 'receipt', 'total_payable_price'), id=serial_number)
+    # Queued, the print spooler thread prints it (see store/spooler.py)
+    spooler.enqueue(sale, dict(sale_receipt(sale), serial_number=sale.id))
     return redirect('home')
 
 # =======================================================================================
@@ -1120,39 +1160,38 @@ def print_receipt(request, serial_number):
 # =======================================================================================
 
 
+BOX_MOVEMENTS = 30
+
+
 def financial_box(request):
     # products = Product.objects.filter(is_active=True)
-    box = FinancialBox.objects.all().first()
-    current_box_value=box.current_amount
+    current_box_value, _ = cashbox.balance()
+    movements = CashMovement.objects.select_related('sale', 'trader_transaction')[:BOX_MOVEMENTS]
     today = timezone.localdate()
-    total_sales_today = Sale.objects.filter(
-        date=today
+    total_sales_today = int(DailySalesRollup.objects.filter(
+        day=today
     ).aggregate(
-        total=Sum('total_payable_price')
-    )['total'] or 0
-
-    dollar_rate = Settings.objects.filter(key='dollar_rate').first().value
-    # needs to take care of weight elements :  
-    # store_products_price = products.aggregate(
-    #     total=Sum(F('quantity') * F('price'))
-    # )['total'] or 0
-
-    store_products_price=0
-
-    weight_products_price = Product.objects.filter(
-        is_weight=True, 
-        is_active=True
-    ).aggregate(
-        total=Sum(F('quantity')/1000 * F('price'))
-    )['total'] or 0 
+        total=Sum('payable_syp')
+    )['total'] or 0)
+
+    dollar_rate = settings_cache.dollar_rate()
+
+    # Stock value from the maintained buckets (store.inventory), a few rows
+    buckets = {key: bucket for key, bucket in inventory.current_buckets().items() if bucket[0] > 0}
+    names = dict(Classification.objects.filter(
+        id__in={classification_key for classification_key, _ in buckets}
+    ).values_list('id', 'category'))
+    weight_products_price = sum((value for (_, is_weight), (_, _, value) in buckets.items() if is_weight), Decimal(0))
+    normal_products_price = sum((value for (_, is_weight), (_, _, value) in buckets.items() if not is_weight), Decimal(0))
+    by_classification = {}
+    for (classification_key, _), (_, _, value) in buckets.items():
+        name = names.get(classification_key, 'بدون تصنيف')
+        by_classification[name] = by_classification.get(name, Decimal(0)) + value
+    inventory_rows = [
+        {'classification': name, 'value_usd': value, 'value_syp': value * dollar_rate}
+        for name, value in sorted(by_classification.items(), key=lambda item: -item[1])
+    ]
 
-    normal_products_price = Product.objects.filter(
-        is_weight=False, 
-        is_active=True
-    ).aggregate(
-        total=Sum(F('quantity') * F('price'))
-    )['total'] or 0
-    
     store_products_price=weight_products_price+normal_products_price
 
     store_products_price_syp=store_products_price*dollar_rate
@@ -1161,8 +1200,12 @@ def financial_box(request):
         'store/financial_box.html',
         {
             'current_box_value':current_box_value,
+            'movements':movements,
             'store_products_price':store_products_price,
             'store_products_price_syp':store_products_price_syp,
+            'weight_products_price':weight_products_price,
+            'normal_products_price':normal_products_price,
+            'inventory_rows':inventory_rows,
             'total_sales_today':total_sales_today,
         },
     )
@@ -138,6 +138,26 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / "staticfiles"  # For collectstatic command
 
+# Bulk add posts about 12 fields per product row: allow deliveries of several hundred lines
+DATA_UPLOAD_MAX_NUMBER_FIELDS = 10000
+
+# Store settings cache (store/settings_cache.py): seconds before the values are read again,
+# so a change made from another process (shell, management command) is picked up
+SETTINGS_CACHE_MAX_AGE = 60
+
+# Background jobs (store/jobs.py): cached report files and spooled import uploads
+REPORT_CACHE_DIR = BASE_DIR / "report_cache"
+IMPORT_SPOOL_DIR = BASE_DIR / "import_spool"
+REPORT_WORKERS = 2
+IMPORT_WORKERS = 1
+
+# Receipt printer (store/printer_utils.py): 'usb', 'file' (device path below) or 'dummy'
+RECEIPT_PRINTER_BACKEND = "usb"
+RECEIPT_PRINTER_FILE = ""
+# Receipt text (store/receipt.py): False sends Windows-1256 and lets the printer join the Arabic letters;
+# True shapes them and sends PC864 for printers that print them unjoined or reversed (check with a test print)
+RECEIPT_ARABIC_SHAPING = False
+
 # STATICFILES_DIRS = [BASE_DIR / 'store' / 'static']  # Only your app's static files
 
 